@@ -1,6 +1,19 @@
 from django.contrib import admin
 from .models import User, Job, Connection
 
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'connection', 'status', 'created_at')
+    list_filter = ('status',)
+    # Job.__str__ and the list columns read user/connection; avoid a query per row
+    list_select_related = ('user', 'connection')
+
+
+@admin.register(Connection)
+class ConnectionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'bucket_name', 'created_at')
+    list_select_related = ('user',)
+
+
 admin.site.register(User)
-admin.site.register(Job)
-admin.site.register(Connection)
\ No newline at end of file
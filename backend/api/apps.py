@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from api.middleware import install_query_recorder
+
+        connection_created.connect(install_query_recorder, dispatch_uid="api.metrics.query_recorder")
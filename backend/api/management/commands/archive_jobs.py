@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.services.job_archive import archivable_jobs, archive_cutoff, archive_jobs
+
+
+class Command(BaseCommand):
+    help = "Move COMPLETED and FAILED_PERMANENT jobs past the retention window from Job to ArchivedJob."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.JOB_ARCHIVE_AFTER_DAYS,
+            help="Archive jobs finished more than this many days ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Jobs moved per transaction.")
+        parser.add_argument("--limit", type=int, help="Stop after moving this many jobs.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the jobs that are due.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options["days"])
+        if options["dry_run"]:
+            self.stdout.write(f"{archivable_jobs(cutoff).count()} jobs finished before {cutoff:%Y-%m-%d %H:%M} are due")
+            return
+
+        moved = 0
+        limit = options["limit"]
+        while limit is None or moved < limit:
+            batch_size = options["batch_size"] if limit is None else min(options["batch_size"], limit - moved)
+            archived = archive_jobs(cutoff, batch_size)
+            moved += archived
+            if archived < batch_size:
+                break
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} jobs finished before {cutoff:%Y-%m-%d %H:%M}"))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services.outbox import dispatch_outbox_batch, get_outbox_lag
+from api.services.queue_backends import get_queue_backend
+
+
+class Command(BaseCommand):
+    help = "Drain the job outbox into the processing queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages claimed per batch.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument("--max-attempts", type=int, default=10, help="Send attempts before a message is failed.")
+        parser.add_argument("--once", action="store_true", help="Drain what is due now and exit.")
+        parser.add_argument("--stats", action="store_true", help="Print pending count, dispatch lag and queue depth, then exit.")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            lag = get_outbox_lag()
+            backend = get_queue_backend()
+            self.stdout.write(
+                f"pending={lag['pending']} oldest_pending_age_seconds={lag['oldest_pending_age_seconds']} "
+                f"queue_backend={backend.name} queue_depth={backend.depth()}"
+            )
+            return
+
+        self.stdout.write("Outbox dispatcher started")
+        while True:
+            result = dispatch_outbox_batch(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+            )
+            handled = result["dispatched"] + result["retried"] + result["failed"]
+            if handled:
+                self.stdout.write(
+                    f"dispatched={result['dispatched']} retried={result['retried']} "
+                    f"failed={result['failed']} max_lag_seconds={result['max_lag_seconds']:.3f}"
+                )
+
+            # A full batch means more is probably waiting; go again without sleeping
+            if handled >= options["batch_size"]:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
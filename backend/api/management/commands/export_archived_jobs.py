@@ -0,0 +1,40 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api.services.job_archive import export_archived_jobs
+
+
+class Command(BaseCommand):
+    help = "Export archived jobs to gzip-compressed NDJSON (local path or s3://bucket/key), optionally purging them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Destination file, e.g. jobs-2026-q1.ndjson.gz or s3://bucket/archive/jobs.ndjson.gz.")
+        parser.add_argument("--archived-before", help="Only jobs archived before this date (YYYY-MM-DD).")
+        parser.add_argument("--user", action="append", dest="users", help="Only this user ID (repeatable).")
+        parser.add_argument("--purge", action="store_true", help="Delete the exported jobs from the archive.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows read and purged per query.")
+
+    def handle(self, *args, **options):
+        archived_before = None
+        if options["archived_before"]:
+            day = parse_date(options["archived_before"])
+            if day is None:
+                raise CommandError("--archived-before must be a date (YYYY-MM-DD).")
+            archived_before = timezone.make_aware(datetime.combine(day, time.min))
+
+        try:
+            exported = export_archived_jobs(
+                options["output"],
+                archived_before=archived_before,
+                user_ids=options["users"],
+                purge=options["purge"],
+                batch_size=options["batch_size"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        action = "Exported and purged" if options["purge"] else "Exported"
+        self.stdout.write(self.style.SUCCESS(f"{action} {exported} archived jobs to {options['output']}"))
@@ -0,0 +1,30 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.services.s3_prescan import build_manifest, claim_jobs_for_prescan
+
+
+class Command(BaseCommand):
+    help = "Pre-scan the source prefix of newly submitted jobs and store their manifests."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=4, help="Jobs claimed per pass.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when nothing is waiting.")
+        parser.add_argument("--stale-after", type=int, default=900, help="Seconds before an unfinished scan is retaken.")
+        parser.add_argument("--once", action="store_true", help="Scan what is waiting now and exit.")
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options["stale_after"])
+        self.stdout.write("Pre-scanner started")
+        while True:
+            jobs = claim_jobs_for_prescan(options["batch_size"], stale_after)
+            for job in jobs:
+                build_manifest(job)
+
+            if jobs:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
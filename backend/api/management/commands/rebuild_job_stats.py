@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.services.job_stats import rebuild_job_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the job statistics summary tables from the Job and ArchivedJob tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", help="Only rebuild this user ID (repeatable).")
+
+    def handle(self, *args, **options):
+        rows = rebuild_job_stats(user_ids=options["users"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily job stats rows"))
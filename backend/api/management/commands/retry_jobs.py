@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.services.retry_scheduler import retry_due_jobs, schedule_retries
+
+
+class Command(BaseCommand):
+    help = "Schedule and re-queue FAILED_RETRYABLE jobs with exponential backoff. Safe to run in several processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Jobs claimed per batch.")
+        parser.add_argument("--interval", type=float, default=10.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument(
+            "--max-attempts", type=int, default=settings.JOB_RETRY_MAX_ATTEMPTS,
+            help="Retries before a job is marked FAILED_PERMANENT.",
+        )
+        parser.add_argument("--once", action="store_true", help="Handle what is due now and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Retry scheduler started")
+        while True:
+            scheduled = schedule_retries(limit=options["batch_size"])
+            result = retry_due_jobs(limit=options["batch_size"], max_attempts=options["max_attempts"])
+            handled = result["retried"] + result["exhausted"]
+            if scheduled or handled:
+                self.stdout.write(
+                    f"scheduled={scheduled} retried={result['retried']} exhausted={result['exhausted']}"
+                )
+
+            # A full batch means more is probably waiting; go again without sleeping
+            if scheduled >= options["batch_size"] or handled >= options["batch_size"]:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,132 @@
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from api.services.metrics import REGISTRY, REQUEST_DB_QUERIES, REQUEST_DB_TIME, REQUEST_LATENCY
+from core.log import CORRELATION_ID_PATTERN, bind_correlation_id, new_correlation_id, unbind_correlation_id
+
+CORRELATION_ID_HEADER = "X-Request-ID"
+
+# [query count, query seconds] for the request being handled. Context variables follow
+# the request into sync_to_async threads, so the async views' ORM calls are counted too.
+_request_db = ContextVar("request_db", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper, installed on every connection, that adds to the current request's totals.
+    """
+    totals = _request_db.get()
+    if totals is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    connection_created receiver (connected in ApiConfig.ready).
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class MetricsMiddleware:
+    """
+    Records latency per route, method and status, plus database queries and
+    query time per request. Routes are labelled by URL name (e.g. "job-list"),
+    so the label set stays small. Streaming responses are timed to their headers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        totals, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        self.finish(request, response, totals, started)
+        return response
+
+    async def __acall__(self, request):
+        totals, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        self.finish(request, response, totals, started)
+        return response
+
+    def start(self):
+        REGISTRY.ensure_flusher()
+        totals = [0, 0.0]
+        return totals, _request_db.set(totals), time.perf_counter()
+
+    def finish(self, request, response, totals, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else "unmatched"
+        REQUEST_LATENCY.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        REQUEST_DB_QUERIES.observe(totals[0], route=route)
+        REQUEST_DB_TIME.observe(totals[1], route=route)
+
+
+class CorrelationIdMiddleware:
+    """
+    Gives every request a correlation ID: the caller's X-Request-ID if it looks valid
+    (workers echo a job's correlationId here), else a new one. Every log record written
+    while handling the request carries it, new jobs put it in their queue message,
+    and it is returned in the X-Request-ID response header.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        correlation_id, token = self.bind(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            unbind_correlation_id(token)
+        response[CORRELATION_ID_HEADER] = correlation_id
+        return response
+
+    async def __acall__(self, request):
+        correlation_id, token = self.bind(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            unbind_correlation_id(token)
+        response[CORRELATION_ID_HEADER] = correlation_id
+        return response
+
+    def bind(self, request):
+        supplied = request.headers.get(CORRELATION_ID_HEADER, "")
+        correlation_id = supplied if CORRELATION_ID_PATTERN.match(supplied) else new_correlation_id()
+        request.correlation_id = correlation_id
+        return correlation_id, bind_correlation_id(correlation_id)
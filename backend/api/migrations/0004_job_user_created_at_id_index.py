@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_job_outbox"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="api_job_user_id_19ed32_idx"
+            ),
+        ),
+    ]
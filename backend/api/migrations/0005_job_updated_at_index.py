@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_job_user_created_at_id_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["updated_at"], name="api_job_updated_eee4d1_idx"
+            ),
+        ),
+    ]
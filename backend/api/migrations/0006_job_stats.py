@@ -0,0 +1,85 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_job_updated_at_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobDurationHistogram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("bucket", models.SmallIntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="job_duration_histogram",
+                        to="api.user",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "day", "bucket"),
+                        name="unique_job_duration_bucket",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="JobStatsDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("pending", models.IntegerField(default=0)),
+                ("processing", models.IntegerField(default=0)),
+                ("completed", models.IntegerField(default=0)),
+                ("failed_retryable", models.IntegerField(default=0)),
+                ("failed_permanent", models.IntegerField(default=0)),
+                ("files_processed", models.BigIntegerField(default=0)),
+                ("duration_count", models.IntegerField(default=0)),
+                ("duration_sum_seconds", models.FloatField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="job_stats",
+                        to="api.user",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "day"), name="unique_job_stats_user_day"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_job_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="total_bytes",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="joboutbox",
+            name="requires_manifest",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="JobManifest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("SCANNING", "Scanning"),
+                            ("READY", "Ready"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="SCANNING",
+                        max_length=20,
+                    ),
+                ),
+                ("data", models.BinaryField(blank=True, null=True)),
+                ("file_count", models.IntegerField(default=0)),
+                ("total_bytes", models.BigIntegerField(default=0)),
+                ("error_message", models.TextField(blank=True, null=True)),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "job",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="manifest",
+                        to="api.job",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "started_at"],
+                        name="api_jobmani_status_ef8546_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_job_manifest"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="joboutbox",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "Pending"),
+                    ("DISPATCHED", "Dispatched"),
+                    ("FAILED", "Failed"),
+                    ("SUPERSEDED", "Superseded"),
+                ],
+                default="PENDING",
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="JobShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("index", models.IntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("PROCESSING", "Processing"),
+                            ("COMPLETED", "Completed"),
+                            ("FAILED_RETRYABLE", "Failed (Retryable)"),
+                            ("FAILED_PERMANENT", "Failed (Permanent)"),
+                        ],
+                        default="PENDING",
+                        max_length=20,
+                    ),
+                ),
+                ("data", models.BinaryField(blank=True, null=True)),
+                ("file_count", models.IntegerField(default=0)),
+                ("total_bytes", models.BigIntegerField(default=0)),
+                ("first_key", models.CharField(max_length=1024)),
+                ("last_key", models.CharField(max_length=1024)),
+                ("files_processed", models.IntegerField(default=0)),
+                ("retry_count", models.IntegerField(default=0)),
+                ("error_message", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shards",
+                        to="api.job",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["job", "index"],
+            },
+        ),
+        migrations.AddField(
+            model_name="joboutbox",
+            name="shard",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="outbox_messages",
+                to="api.jobshard",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="jobshard",
+            constraint=models.UniqueConstraint(
+                fields=("job", "index"), name="unique_job_shard_index"
+            ),
+        ),
+    ]
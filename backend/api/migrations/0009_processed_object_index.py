@@ -0,0 +1,77 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_job_shard"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="files_skipped",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="force_full",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="ProcessedObject",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("options", models.SmallIntegerField()),
+                ("key_digest", models.CharField(max_length=64)),
+                ("source_key", models.CharField(max_length=1024)),
+                (
+                    "destination_prefix",
+                    models.CharField(blank=True, default="", max_length=512),
+                ),
+                ("etag", models.CharField(max_length=128)),
+                (
+                    "processed_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "connection",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="processed_objects",
+                        to="api.connection",
+                    ),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="api.job",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("connection", "options", "key_digest"),
+                        name="unique_processed_object",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_processed_object_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="next_retry_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["status", "next_retry_at"], name="api_job_status_56fd81_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_job_next_retry_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QueueMessage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("queue", models.CharField(default="jobs", max_length=64)),
+                ("body", models.JSONField()),
+                ("visible_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("receipt", models.UUIDField(blank=True, null=True, unique=True)),
+                ("receive_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["queue", "visible_at", "id"],
+                        name="api_queueme_queue_17113f_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+
+def admit_in_flight_jobs(apps, schema_editor):
+    # Jobs already handed to the queue count against fair-share limits from the start
+    Job = apps.get_model("api", "Job")
+    JobOutbox = apps.get_model("api", "JobOutbox")
+    dispatched = JobOutbox.objects.filter(job_id=models.OuterRef("id"), status="DISPATCHED")
+    Job.objects.filter(status__in=["PENDING", "PROCESSING"]).filter(models.Exists(dispatched)).update(
+        admitted_at=models.F("created_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0011_queue_message"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="admitted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="max_inflight_files",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="max_inflight_jobs",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(admit_in_flight_jobs, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 import uuid
 
 class User(models.Model):
@@ -15,6 +16,10 @@ class User(models.Model):
     display_name = models.CharField(max_length=255, blank=True, null=True)
     role = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default="OTHER")
     
+    # Per-user overrides of the role's fair-share limits (settings.JOB_FAIR_SHARE_POLICIES)
+    max_inflight_jobs = models.IntegerField(blank=True, null=True)
+    max_inflight_files = models.IntegerField(blank=True, null=True)
+
     onboarding_complete = models.BooleanField(default=False)
     dummy = models.BooleanField(default=True)
 
@@ -33,6 +38,17 @@ class Job(models.Model):
         ("FAILED_PERMANENT", "Failed (Permanent)"),
     ]
 
+    # Status changes a worker may report; anything else is rejected
+    STATUS_TRANSITIONS = {
+        "PENDING": {"PROCESSING", "COMPLETED", "FAILED_RETRYABLE", "FAILED_PERMANENT"},
+        "PROCESSING": {"COMPLETED", "FAILED_RETRYABLE", "FAILED_PERMANENT"},
+        "FAILED_RETRYABLE": {"PENDING", "PROCESSING", "FAILED_PERMANENT"},
+        "COMPLETED": set(),
+        "FAILED_PERMANENT": set(),
+    }
+    # Statuses that end a processing run (completed_at is set on entry)
+    FINISHED_STATUSES = {"COMPLETED", "FAILED_RETRYABLE", "FAILED_PERMANENT"}
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='jobs')
     connection = models.ForeignKey('Connection', on_delete=models.CASCADE, related_name='jobs', null=True, blank=True)
@@ -43,6 +59,8 @@ class Job(models.Model):
     ocr_requested = models.BooleanField(default=False)
     tag_removal_requested = models.BooleanField(default=False)
     ai_inference_requested = models.BooleanField(default=False)
+    # Reprocess every object even if the processed-object index says it is unchanged
+    force_full = models.BooleanField(default=False)
 
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
 
@@ -56,9 +74,16 @@ class Job(models.Model):
 
     error_message = models.TextField(blank=True, null=True)
     retry_count = models.IntegerField(default=0)
+    # When the retry scheduler (manage.py retry_jobs) will re-queue a FAILED_RETRYABLE job
+    next_retry_at = models.DateTimeField(blank=True, null=True)
+    # When the job was admitted by the fair-share scheduler; cleared when it is re-queued
+    admitted_at = models.DateTimeField(blank=True, null=True)
 
     files_processed = models.IntegerField(default=0)
     total_files = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    # Objects left out because an earlier job already processed them with the same options
+    files_skipped = models.IntegerField(default=0)
 
     class Meta:
         ordering = ['-created_at']
@@ -66,6 +91,9 @@ class Job(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['connection']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['user', 'created_at', 'id']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['status', 'next_retry_at']),
         ]
 
     def __str__(self):
@@ -112,6 +140,252 @@ class Connection(models.Model):
     def __str__(self):
         return f"{self.user.email} - {self.name} ({self.bucket_name})"
 
+class JobOutbox(models.Model):
+    """
+    Queue messages written in the same transaction as their Job and delivered
+    to the processing queue by the outbox dispatcher (manage.py dispatch_outbox).
+    The auto-increment id gives the dispatch order.
+    """
+    STATUS_CHOICES = [
+        ("PENDING", "Pending"),
+        ("DISPATCHED", "Dispatched"),
+        ("FAILED", "Failed"),
+        ("SUPERSEDED", "Superseded"),  # Replaced by per-shard messages
+    ]
+
+    job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='outbox_messages')
+    # Set for per-shard messages, which are ordered per shard rather than per job
+    shard = models.ForeignKey('JobShard', on_delete=models.CASCADE, related_name='outbox_messages', null=True, blank=True)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="PENDING")
+    # Held back by the dispatcher until the job's pre-scan manifest is ready (or has failed)
+    requires_manifest = models.BooleanField(default=False)
+
+    attempts = models.IntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+
+    def __str__(self):
+        return f"Outbox {self.id} ({self.status}) for job {self.job_id}"
+
+class QueueMessage(models.Model):
+    """
+    Message in the Postgres job queue backend (api.services.queue_backends).
+    Claimed with SELECT ... FOR UPDATE SKIP LOCKED; a claimed message is hidden until
+    visible_at and deleted when the consumer acks it with its receipt.
+    """
+    queue = models.CharField(max_length=64, default="jobs")
+    body = models.JSONField()
+    visible_at = models.DateTimeField(default=timezone.now)
+    receipt = models.UUIDField(blank=True, null=True, unique=True)
+    receive_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['queue', 'visible_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Queue message {self.id} on {self.queue}"
+
+class JobManifest(models.Model):
+    """
+    Result of pre-scanning a job's source prefix: every object's key, size and ETag,
+    stored as gzip-compressed NDJSON ([key, size, etag] per line).
+    """
+    STATUS_CHOICES = [
+        ("SCANNING", "Scanning"),
+        ("READY", "Ready"),
+        ("FAILED", "Failed"),
+    ]
+
+    job = models.OneToOneField('Job', on_delete=models.CASCADE, related_name='manifest')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="SCANNING")
+
+    data = models.BinaryField(blank=True, null=True)
+    file_count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+
+    started_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'started_at']),
+        ]
+
+    def __str__(self):
+        return f"Manifest for job {self.job_id} ({self.status}, {self.file_count} files)"
+
+
+class JobShard(models.Model):
+    """
+    A slice of a large job's manifest processed as its own queue message.
+    Shard progress and status roll up into the parent Job (api.services.sharding).
+    """
+    job = models.ForeignKey('Job', on_delete=models.CASCADE, related_name='shards')
+    index = models.IntegerField()
+    status = models.CharField(max_length=20, choices=Job.STATUS_CHOICES, default="PENDING")
+
+    # gzip-compressed NDJSON of this shard's [key, size, etag] entries
+    data = models.BinaryField(blank=True, null=True)
+    file_count = models.IntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    first_key = models.CharField(max_length=1024)
+    last_key = models.CharField(max_length=1024)
+
+    files_processed = models.IntegerField(default=0)
+    retry_count = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['job', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'index'], name='unique_job_shard_index'),
+        ]
+
+    def __str__(self):
+        return f"Shard {self.index} of job {self.job_id} ({self.status})"
+
+
+class ProcessedObject(models.Model):
+    """
+    Index of source objects already processed per connection, destination and option set,
+    used to send only new or changed objects on a re-run (api.services.processed_index).
+    Lookups go through the unique index on (connection, options, key_digest).
+    """
+    connection = models.ForeignKey('Connection', on_delete=models.CASCADE, related_name='processed_objects')
+    # Bitmask of the job options the object was processed with (see processed_index.option_set)
+    options = models.SmallIntegerField()
+    # sha256 of destination_prefix and source_key; keeps the unique index small for long keys
+    key_digest = models.CharField(max_length=64)
+    source_key = models.CharField(max_length=1024)
+    destination_prefix = models.CharField(max_length=512, blank=True, default="")
+    etag = models.CharField(max_length=128)
+
+    job = models.ForeignKey('Job', on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    processed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['connection', 'options', 'key_digest'], name='unique_processed_object'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.source_key} ({self.etag}) on connection {self.connection_id}"
+
+
+class RateLimitBucket(models.Model):
+    """
+    Token bucket state for request throttling (api.throttling.DatabaseBucketStore).
+    updated_at is a Unix timestamp so refills can be computed in portable SQL.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.FloatField()
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
+
+
+class JobStatsDaily(models.Model):
+    """
+    Per-user, per-day (by job created_at, UTC) job counters, maintained incrementally
+    by api.services.job_stats as jobs are created and change status or progress.
+    Rebuild with manage.py rebuild_job_stats if it drifts.
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='job_stats')
+    day = models.DateField()
+
+    pending = models.IntegerField(default=0)
+    processing = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    failed_retryable = models.IntegerField(default=0)
+    failed_permanent = models.IntegerField(default=0)
+
+    files_processed = models.BigIntegerField(default=0)
+    duration_count = models.IntegerField(default=0)
+    duration_sum_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_job_stats_user_day'),
+        ]
+
+    def __str__(self):
+        return f"Job stats for {self.user_id} on {self.day}"
+
+
+class JobDurationHistogram(models.Model):
+    """
+    Completed-job duration histogram per user and day; bucket indexes
+    api.services.job_stats.DURATION_BUCKETS. Used for percentile estimates.
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='job_duration_histogram')
+    day = models.DateField()
+    bucket = models.SmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'bucket'], name='unique_job_duration_bucket'),
+        ]
+
+    def __str__(self):
+        return f"Duration bucket {self.bucket} for {self.user_id} on {self.day}"
+
+
+class ArchivedJob(models.Model):
+    """
+    Cold storage for finished jobs moved out of Job once past JOB_ARCHIVE_AFTER_DAYS
+    (manage.py archive_jobs), so the hot table and its indexes only hold recent jobs.
+    The job's API representation is kept as gzip-compressed JSON in data; the columns
+    are what per-user lookups and rebuild_job_stats need. Exported to compressed NDJSON
+    and purged with manage.py export_archived_jobs.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)  # The Job's id
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='archived_jobs')
+    # Not a foreign key: archived jobs outlive their connection
+    connection_id = models.UUIDField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=Job.STATUS_CHOICES)
+    files_processed = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField()
+    started_at = models.DateTimeField(blank=True, null=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+            models.Index(fields=['archived_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived job {self.id} ({self.status})"
+
 # class CreditTransaction(models.Model):
 
 #     TRANSACTION_TYPES = [
@@ -0,0 +1,126 @@
+import base64
+import json
+import uuid
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class JobKeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over (created_at, id), newest first.
+    Each page is a single indexed range scan regardless of how deep the client pages,
+    unlike OFFSET pagination. The total count is only computed when
+    ?include_total=true is passed, since it costs a separate COUNT query.
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    include_total_query_param = 'include_total'
+
+    def encode_cursor(self, job):
+        # Rows may be model instances or dicts from the values() fast path
+        if isinstance(job, dict):
+            created_at, job_id = job['created_at'], job['id']
+        else:
+            created_at, job_id = job.created_at, job.id
+        raw = json.dumps([created_at.isoformat(), str(job_id)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, job_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError
+            return created_at, uuid.UUID(job_id)
+        except (ValueError, TypeError):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor."})
+
+    def get_query_params(self, request):
+        # DRF requests expose query_params; the async views pass a plain Django request
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        value = self.get_query_params(request).get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            size = int(value)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "Must be an integer."})
+        return max(1, min(size, self.max_page_size))
+
+    def wants_total(self, request):
+        return self.get_query_params(request).get(self.include_total_query_param) in ('1', 'true', 'True')
+
+    def page_queryset(self, queryset, request):
+        """
+        The filtered, ordered slice for the requested page, one row longer than the page.
+        """
+        self.request = request
+        self.page_size_for_request = self.get_page_size(request)
+
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = self.get_query_params(request).get(self.cursor_query_param)
+        if cursor:
+            created_at, job_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=job_id)
+            )
+        # Fetch one extra row to know whether there is a next page
+        return queryset[:self.page_size_for_request + 1]
+
+    def finish_page(self, page):
+        page_size = self.page_size_for_request
+        self.next_cursor = self.encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total = queryset.order_by().count() if self.wants_total(request) else None
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        paginate_queryset for async views, using the async ORM.
+        """
+        self.total = await queryset.order_by().acount() if self.wants_total(request) else None
+        return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_payload(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        }
+        if self.total is not None:
+            payload['count'] = self.total
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_payload(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'count': {'type': 'integer'},
+                'results': schema,
+            },
+        }
@@ -1,3 +1,6 @@
+import hmac
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 from api.services import get_user_id_from_request_token
 
@@ -9,4 +12,18 @@ class TokenRequired(BasePermission):
         
         # Store user_id on request for later use
         request.token_user_id = user_id
-        return True
\ No newline at end of file
+        return True
+
+class WorkerTokenRequired(BasePermission):
+    """
+    Allows anonymization workers calling back with the shared WORKER_API_TOKEN,
+    sent as "Authorization: Worker <token>".
+    """
+    def has_permission(self, request, view):
+        expected = settings.WORKER_API_TOKEN
+        auth_header = request.headers.get("Authorization", "")
+        if not expected or not auth_header.startswith("Worker "):
+            return False
+
+        token = auth_header[len("Worker "):]
+        return hmac.compare_digest(token.encode(), expected.encode())
@@ -1,5 +1,6 @@
+from django.db.models import F
 from rest_framework import serializers
-from .models import User, Job, Connection
+from .models import User, Job, Connection, JobShard
 
 
 from rest_framework import serializers
@@ -41,11 +42,11 @@ class JobSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'user_email', 'connection', 'connection_name',
             'source_prefix', 'destination_prefix', 'ocr_requested',
-            'tag_removal_requested', 'ai_inference_requested', 'status',
+            'tag_removal_requested', 'ai_inference_requested', 'force_full', 'status',
             's3_cleaned_result_key', 's3_audit_log_key',
             'created_at', 'updated_at', 'started_at', 'completed_at',
             'error_message', 'retry_count',
-            'files_processed', 'total_files',
+            'files_processed', 'total_files', 'files_skipped',
             'is_failed', 'can_retry', 'requires_resubmission', 'duration',
             'progress_percentage'
         ]
@@ -53,12 +54,129 @@ class JobSerializer(serializers.ModelSerializer):
             'id', 'user', 'user_email', 'connection_name',
             's3_cleaned_result_key', 's3_audit_log_key',
             'created_at', 'updated_at', 'started_at', 'completed_at',
-            'error_message', 'retry_count',
+            'error_message', 'retry_count', 'files_skipped',
             'is_failed', 'can_retry', 'requires_resubmission', 'duration',
             'progress_percentage'
         ]
 
     def get_progress_percentage(self, obj):
-        if obj.total_files > 0:
-            return round((obj.files_processed / obj.total_files) * 100, 2)
-        return 0
\ No newline at end of file
+        return progress_percentage(obj.files_processed, obj.total_files)
+
+
+def progress_percentage(files_processed, total_files):
+    if total_files > 0:
+        return round((files_processed / total_files) * 100, 2)
+    return 0
+
+
+class JobRowSerializer:
+    """
+    Fast-path list serializer for jobs.
+    Works on plain dict rows from values() (see with_list_values), so a page of jobs
+    costs one query with no model instances or per-field DRF serializer overhead.
+    Output matches JobSerializer field for field.
+    """
+    model_fields = [
+        'id', 'user', 'connection',
+        'source_prefix', 'destination_prefix', 'ocr_requested',
+        'tag_removal_requested', 'ai_inference_requested', 'force_full', 'status',
+        's3_cleaned_result_key', 's3_audit_log_key',
+        'created_at', 'updated_at', 'started_at', 'completed_at',
+        'error_message', 'retry_count',
+        'files_processed', 'total_files', 'files_skipped',
+    ]
+    _datetime = serializers.DateTimeField()
+
+    @classmethod
+    def with_list_values(cls, queryset):
+        return queryset.values(
+            *cls.model_fields,
+            user_email=F('user__email'),
+            connection_name=F('connection__name'),
+        )
+
+    @classmethod
+    def to_representation(cls, row):
+        to_datetime = cls._datetime.to_representation
+        status = row['status']
+        created_at, updated_at = row['created_at'], row['updated_at']
+        started_at, completed_at = row['started_at'], row['completed_at']
+
+        return {
+            'id': str(row['id']),
+            'user': row['user'],
+            'user_email': row['user_email'],
+            'connection': row['connection'],
+            'connection_name': row['connection_name'],
+            'source_prefix': row['source_prefix'],
+            'destination_prefix': row['destination_prefix'],
+            'ocr_requested': row['ocr_requested'],
+            'tag_removal_requested': row['tag_removal_requested'],
+            'ai_inference_requested': row['ai_inference_requested'],
+            'force_full': row['force_full'],
+            'status': status,
+            's3_cleaned_result_key': row['s3_cleaned_result_key'],
+            's3_audit_log_key': row['s3_audit_log_key'],
+            'created_at': to_datetime(created_at) if created_at else None,
+            'updated_at': to_datetime(updated_at) if updated_at else None,
+            'started_at': to_datetime(started_at) if started_at else None,
+            'completed_at': to_datetime(completed_at) if completed_at else None,
+            'error_message': row['error_message'],
+            'retry_count': row['retry_count'],
+            'files_processed': row['files_processed'],
+            'total_files': row['total_files'],
+            'files_skipped': row['files_skipped'],
+            'is_failed': status in ("FAILED_RETRYABLE", "FAILED_PERMANENT"),
+            'can_retry': status == "FAILED_RETRYABLE",
+            'requires_resubmission': status == "FAILED_PERMANENT",
+            'duration': completed_at - started_at if started_at and completed_at else None,
+            'progress_percentage': progress_percentage(row['files_processed'], row['total_files']),
+        }
+
+    @classmethod
+    def many(cls, rows):
+        return [cls.to_representation(row) for row in rows]
+
+class JobBatchItemSerializer(serializers.Serializer):
+    """
+    Validates one entry of a POST /jobs/batch/ request without touching the database.
+    Connection ownership is checked for the whole batch in a single query by the view.
+    """
+    connection = serializers.UUIDField()
+    source_prefix = serializers.CharField(max_length=512, required=False, allow_blank=True, allow_null=True)
+    destination_prefix = serializers.CharField(max_length=512, required=False, allow_blank=True, allow_null=True)
+    ocr_requested = serializers.BooleanField(required=False, default=False)
+    tag_removal_requested = serializers.BooleanField(required=False, default=False)
+    ai_inference_requested = serializers.BooleanField(required=False, default=False)
+    force_full = serializers.BooleanField(required=False, default=False)
+
+
+class JobShardSerializer(serializers.ModelSerializer):
+    progress_percentage = serializers.SerializerMethodField()
+
+    class Meta:
+        model = JobShard
+        fields = [
+            'index', 'status', 'file_count', 'total_bytes', 'first_key', 'last_key',
+            'files_processed', 'retry_count', 'error_message',
+            'created_at', 'updated_at', 'started_at', 'completed_at',
+            'progress_percentage'
+        ]
+        read_only_fields = fields
+
+    def get_progress_percentage(self, obj):
+        return progress_percentage(obj.files_processed, obj.file_count)
+
+
+class JobProgressEventSerializer(serializers.Serializer):
+    """
+    One progress event from an anonymization worker.
+    files_processed is an increment since the worker's previous report, not a total.
+    """
+    job_id = serializers.UUIDField()
+    # Set by workers processing one shard of a sharded job
+    shard_index = serializers.IntegerField(min_value=0, required=False)
+    files_processed = serializers.IntegerField(min_value=0, required=False, default=0)
+    total_files = serializers.IntegerField(min_value=0, required=False)
+    status = serializers.ChoiceField(choices=Job.STATUS_CHOICES, required=False)
+    error_message = serializers.CharField(required=False, allow_blank=True)
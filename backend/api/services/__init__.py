@@ -1,2 +1,9 @@
-from .auth_service import get_user_id_from_request_token
-from .health_check import health_check
\ No newline at end of file
+from .auth_service import (
+    aget_user_id_from_request_token,
+    check_jwks,
+    get_user_id_from_request_token,
+    get_token_cache_stats,
+    get_jwks_stats,
+    warm_jwks,
+)
+from .health_check import health_check, liveness, readiness, start_health_monitor
\ No newline at end of file
@@ -2,100 +2,235 @@
 # This module provides utility functions for verifying Cognito JWT tokens
 # and extracting user information from incoming HTTP requests in a Django app.
 
-import jwt
-import requests
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.http import JsonResponse
 
-# Cognito configuration from settings.py
-COGNITO_REGION = settings.COGNITO_REGION
-USER_POOL_ID = settings.COGNITO_USER_POOL_ID
-APP_CLIENT_ID = settings.COGNITO_APP_CLIENT_ID
+from .jwks_store import JWKSKeyStore
+from .metrics import TOKEN_VERIFY_LATENCY
+from .token_cache import VerifiedTokenCache
+
+logger = logging.getLogger(__name__)
+
+# The JWKS store and token cache are built from settings on first use, in the process
+# that serves requests: a gunicorn master preloading the app never holds keys its
+# forked workers would share (see reset_auth_state).
+_jwks_store = None
+_token_cache = None
+_state_lock = threading.Lock()
+
 
-JWKS_URL = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-ISSUER = f"https://cognito-idp.{COGNITO_REGION}.amazonaws.com/{USER_POOL_ID}"
-AUDIENCE = APP_CLIENT_ID
+def cognito_issuer():
+    return f"https://cognito-idp.{settings.COGNITO_REGION}.amazonaws.com/{settings.COGNITO_USER_POOL_ID}"
 
-_cached_jwks = None
+
+def cognito_jwks_url():
+    return settings.COGNITO_JWKS_URL or f"{cognito_issuer()}/.well-known/jwks.json"
+
+
+def get_jwks_store():
+    """
+    Rotation-aware JWKS cache, refreshed on TTL expiry and on unknown kids.
+    """
+    global _jwks_store
+    if _jwks_store is None:
+        with _state_lock:
+            if _jwks_store is None:
+                _jwks_store = JWKSKeyStore(
+                    cognito_jwks_url(),
+                    ttl=settings.JWKS_CACHE_TTL,
+                    min_refresh_interval=settings.JWKS_MIN_REFRESH_INTERVAL,
+                    timeout=settings.JWKS_FETCH_TIMEOUT,
+                    backoff_max=settings.JWKS_BACKOFF_MAX,
+                )
+    return _jwks_store
+
+
+def get_token_cache():
+    """
+    Verified tokens, so repeated requests with the same bearer token skip RS256 verification.
+    """
+    global _token_cache
+    if _token_cache is None:
+        with _state_lock:
+            if _token_cache is None:
+                _token_cache = VerifiedTokenCache(
+                    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+                    ttl=settings.AUTH_TOKEN_CACHE_TTL,
+                )
+    return _token_cache
+
+
+def reset_auth_state():
+    """
+    Forget the JWKS store and token cache, e.g. in a worker forked from a preloaded master.
+    """
+    global _jwks_store, _token_cache, _state_lock
+    _state_lock = threading.Lock()
+    _jwks_store = _token_cache = None
 
 
 def get_cognito_public_keys():
     """
-    Fetch and cache Cognito JWKS public keys.
+    Return the cached Cognito JWKS keys, refreshing them when stale.
     """
-    global _cached_jwks
-    if _cached_jwks:
-        return _cached_jwks
+    return get_jwks_store().get_jwks()
 
-    try:
-        response = requests.get(JWKS_URL, timeout=5)
-        response.raise_for_status()
-        _cached_jwks = response.json().get("keys", [])
-        return _cached_jwks
-    except requests.RequestException as e:
-        print(f"❗ Failed to fetch Cognito JWKS: {e}")
-        return None
+
+def get_public_key(kid):
+    """
+    Return the parsed public key for a kid from the JWKS store.
+    """
+    public_key = get_jwks_store().get_public_key(kid)
+    if public_key is None:
+        logger.warning("Matching JWK not found for kid", extra={"kid": kid})
+    return public_key
+
+
+def warm_jwks():
+    """
+    Fetch and parse the JWKS ahead of the first request (called at worker boot).
+    """
+    return get_jwks_store().warm()
+
+
+def check_jwks():
+    """
+    Refresh the JWKS if it is stale and report whether tokens can be verified (readiness probe).
+    """
+    store = get_jwks_store()
+    store.refresh()
+    stats = store.stats()
+    if not stats["kids"]:
+        raise RuntimeError(stats["last_error"] or "No JWKS keys loaded")
+    return {"keys": len(stats["kids"]), "age_seconds": stats["age_seconds"], "last_error": stats["last_error"]}
+
+
+def get_jwks_stats():
+    """
+    Key IDs, age, refresh and failure counters for the JWKS store.
+    """
+    return get_jwks_store().stats()
+
+
+def get_token_cache_stats():
+    """
+    Hit rate, size and eviction counters for the verified-token cache.
+    """
+    return get_token_cache().stats()
+
+
+def cached_token_user_id(token):
+    """
+    The user ID of an already verified, unexpired token, or None. Never verifies.
+    """
+    return get_token_cache().peek(token)
 
 
 def cognito_token_verification(token):
     """
     Verify JWT access token issued by AWS Cognito and extract the user ID (sub).
+    Previously verified tokens are served from the token cache until they expire.
     """
-    try:
-        keys = get_cognito_public_keys()
-        if not keys:
-            print("❗ No JWKS keys available.")
-            return None
+    started = time.perf_counter()
+    user_id = get_token_cache().get(token)
+    if user_id:
+        TOKEN_VERIFY_LATENCY.observe(time.perf_counter() - started, result="cached")
+        return user_id
+
+    user_id = _verify_token(token)
+    TOKEN_VERIFY_LATENCY.observe(time.perf_counter() - started, result="verified" if user_id else "invalid")
+    return user_id
+
 
+def _verify_token(token):
+    import jwt
+
+    try:
         header = jwt.get_unverified_header(token)
-        key = next((k for k in keys if k["kid"] == header.get("kid")), None)
-        if not key:
-            print("❗ Matching JWK not found for kid.")
+        public_key = get_public_key(header.get("kid"))
+        if public_key is None:
             return None
 
-        public_key = jwt.algorithms.RSAAlgorithm.from_jwk(key)
         payload = jwt.decode(
             token,
             public_key,
             algorithms=["RS256"],
-            issuer=ISSUER
+            issuer=cognito_issuer()
         )
 
-        if payload.get("client_id") != APP_CLIENT_ID:
-            print("❗ Invalid client_id")
+        if payload.get("client_id") != settings.COGNITO_APP_CLIENT_ID:
+            logger.warning("Invalid client_id in token")
             return None
 
         user_id = payload.get("sub")
-        print(f"✅ Verified Cognito User ID: {user_id}")
+        logger.info("Verified Cognito token", extra={"user_id": user_id})
+        if user_id:
+            get_token_cache().set(token, user_id, exp=payload.get("exp"))
         return user_id
 
     except jwt.ExpiredSignatureError:
-        print("❗ Token expired")
+        logger.info("Token expired")
     except jwt.InvalidAudienceError:
-        print("❗ Invalid audience")
+        logger.warning("Invalid token audience")
     except jwt.InvalidIssuerError:
-        print("❗ Invalid issuer")
+        logger.warning("Invalid token issuer")
     except Exception as e:
-        print(f"❗ Token verification error: {e}")
+        logger.warning("Token verification error: %s", e)
 
     return None
 
 
-def get_user_id_from_request_token(request):
+def _bearer_token(request):
     """
-    Extract and verify the Authorization header in an incoming request.
+    Return (token, error response) for the request's Authorization header.
     """
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         return None, JsonResponse({"error": "Missing or malformed Authorization header"}, status=401)
 
     try:
-        token = auth_header.split(" ")[1]
+        return auth_header.split(" ")[1], None
     except IndexError:
         return None, JsonResponse({"error": "Malformed Authorization header"}, status=401)
 
+
+def get_user_id_from_request_token(request):
+    """
+    Extract and verify the Authorization header in an incoming request.
+    """
+    token, error_response = _bearer_token(request)
+    if error_response:
+        return None, error_response
+
     user_id = cognito_token_verification(token)
     if not user_id:
         return None, JsonResponse({"error": "Invalid or expired token"}, status=401)
 
-    return user_id, None
\ No newline at end of file
+    return user_id, None
+
+
+async def aget_user_id_from_request_token(request):
+    """
+    Async get_user_id_from_request_token for ASGI views.
+    Cached tokens are answered on the event loop; verification, which may fetch
+    the JWKS over HTTP, runs in a thread pool so it never blocks the loop.
+    """
+    token, error_response = _bearer_token(request)
+    if error_response:
+        return None, error_response
+
+    started = time.perf_counter()
+    user_id = get_token_cache().get(token)
+    if user_id:
+        TOKEN_VERIFY_LATENCY.observe(time.perf_counter() - started, result="cached")
+    else:
+        user_id = await sync_to_async(cognito_token_verification, thread_sensitive=False)(token)
+    if not user_id:
+        return None, JsonResponse({"error": "Invalid or expired token"}, status=401)
+
+    return user_id, None
@@ -0,0 +1,150 @@
+# fair_share.py
+# Weighted fair admission of jobs to the processing queue.
+# A job's queue messages stay in the outbox (the ready list) until the job is admitted.
+# Each dispatcher pass admits waiting jobs one at a time from the user with the least
+# in-flight work relative to their role's weight, within per-user / per-role limits on
+# in-flight jobs and files, so one large batch cannot starve everyone else.
+# A job is in flight from admission until it leaves PENDING / PROCESSING.
+
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Min, Sum
+
+from api.models import Job, User
+
+ACTIVE_STATUSES = ("PENDING", "PROCESSING")
+
+
+def user_policy(role, max_inflight_jobs=None, max_inflight_files=None):
+    """
+    Weight and limits for a user: per-user overrides, else their role's, else DEFAULT.
+    """
+    policies = settings.JOB_FAIR_SHARE_POLICIES
+    policy = dict(policies.get(role) or policies["DEFAULT"])
+    if max_inflight_jobs is not None:
+        policy["max_jobs"] = max_inflight_jobs
+    if max_inflight_files is not None:
+        policy["max_files"] = max_inflight_files
+    return policy
+
+
+def get_in_flight(user_ids=None):
+    """
+    {user_id: (jobs, files)} for admitted jobs that have not finished.
+    """
+    jobs = Job.objects.filter(status__in=ACTIVE_STATUSES, admitted_at__isnull=False)
+    if user_ids is not None:
+        jobs = jobs.filter(user_id__in=user_ids)
+    return {
+        row['user_id']: (row['jobs'], row['files'] or 0)
+        for row in jobs.order_by().values('user_id').annotate(jobs=Count('id'), files=Sum('total_files'))
+    }
+
+
+def _policies(user_ids):
+    return {
+        row['user_id']: user_policy(row['role'], row['max_inflight_jobs'], row['max_inflight_files'])
+        for row in User.objects.filter(user_id__in=user_ids).values(
+            'user_id', 'role', 'max_inflight_jobs', 'max_inflight_files'
+        )
+    }
+
+
+def _has_capacity(policy, jobs, files, job_files):
+    if jobs >= policy["max_jobs"]:
+        return False
+    # A user with nothing in flight may always run one job, however large
+    return jobs == 0 or files + job_files <= policy["max_files"]
+
+
+def waiting_jobs_by_user(ready_messages):
+    """
+    {user_id: [(job_id, total_files), ...]} oldest first, from a queryset of ready outbox messages.
+    """
+    waiting = {}
+    rows = (
+        ready_messages.order_by()
+        .values('job_id', 'job__user_id', 'job__total_files')
+        .annotate(first_message=Min('id'))
+        .order_by('first_message')
+    )
+    for row in rows:
+        waiting.setdefault(row['job__user_id'], []).append((row['job_id'], row['job__total_files']))
+    return waiting
+
+
+def _admission_order(waiting, in_flight, policies):
+    """
+    Yield waiting job ids in the order weighted fair share admits them, assuming nothing
+    in flight finishes meanwhile. A user's remaining jobs are skipped once the next one
+    would exceed their limits. Consumes the lists in waiting.
+    """
+    heap = []
+    for order, user_id in enumerate(waiting):
+        jobs, files = in_flight.get(user_id, (0, 0))
+        policy = policies.get(user_id) or user_policy(None)
+        # Users are ordered by in-flight jobs per unit of weight; ties go to the oldest waiting job
+        heapq.heappush(heap, (jobs / policy["weight"], order, user_id, jobs, files))
+
+    while heap:
+        _, order, user_id, jobs, files = heapq.heappop(heap)
+        policy = policies.get(user_id) or user_policy(None)
+        job_id, job_files = waiting[user_id][0]
+        if not _has_capacity(policy, jobs, files, job_files):
+            continue
+
+        yield job_id
+        waiting[user_id].pop(0)
+        if waiting[user_id]:
+            jobs, files = jobs + 1, files + job_files
+            heapq.heappush(heap, (jobs / policy["weight"], order, user_id, jobs, files))
+
+
+def plan_admissions(ready_messages, slots):
+    """
+    Pick up to slots waiting jobs to admit, by weighted fair share.
+    ready_messages is a queryset of outbox messages whose jobs are not admitted yet.
+    Returns job ids in admission order.
+    """
+    if slots <= 0:
+        return []
+    waiting = waiting_jobs_by_user(ready_messages)
+    if not waiting:
+        return []
+
+    in_flight = get_in_flight(waiting.keys())
+    policies = _policies(waiting.keys())
+    return list(islice(_admission_order(waiting, in_flight, policies), slots))
+
+
+def queue_positions(user, ready_messages):
+    """
+    The user's waiting jobs with their estimated admission position, plus current
+    in-flight usage and limits. ready_messages holds every user's messages whose jobs are
+    not admitted yet: the position is the job's 1-based rank in the order plan_admissions
+    would admit all of them if nothing running finished first, so it accounts for other
+    users' jobs and weights. It is None for a job that waits until some of the user's
+    in-flight work finishes.
+    """
+    policy = user_policy(user.role, user.max_inflight_jobs, user.max_inflight_files)
+    waiting = waiting_jobs_by_user(ready_messages)
+    own = list(waiting.get(user.user_id, []))
+    in_flight = get_in_flight(set(waiting) | {user.user_id})
+    jobs, files = in_flight.get(user.user_id, (0, 0))
+
+    positions = {}
+    if own:
+        for position, job_id in enumerate(_admission_order(waiting, in_flight, _policies(waiting.keys())), start=1):
+            positions[job_id] = position
+
+    return {
+        "in_flight": {"jobs": jobs, "files": files},
+        "limits": {"jobs": policy["max_jobs"], "files": policy["max_files"], "weight": policy["weight"]},
+        "at_limit": bool(own) and not _has_capacity(policy, jobs, files, own[0][1]),
+        "waiting": [
+            {"job_id": str(job_id), "position": positions.get(job_id), "total_files": total_files}
+            for job_id, total_files in own
+        ],
+    }
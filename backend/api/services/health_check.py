@@ -1,4 +1,162 @@
+# health_check.py
+# Liveness and readiness endpoints for load balancers and container runtimes.
+#
+# GET /api/health/live/ (and the legacy /api/health/) answers from memory: if the
+# process can run a view, it is alive. GET /api/health/ready/ reports the database,
+# JWKS and job queue as last seen by background probe threads, one per dependency,
+# each running every HEALTH_PROBE_INTERVAL seconds. A readiness request never waits
+# on a dependency, so probe traffic costs microseconds however often it arrives.
+# Only the checks in HEALTH_REQUIRED_CHECKS decide the status code; a result older
+# than HEALTH_PROBE_STALE_AFTER seconds (a probe stuck on a hung dependency) counts as failed.
+# Probe errors can name hosts and URLs, so they are logged, never returned.
+# A probe may return a sample (the queue probe returns the queue depth) that other
+# readers, such as the metrics scrape, take from the monitor instead of asking again.
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
 from django.http import JsonResponse
 
-def health_check(request):
-    return JsonResponse({"status": "healthy"})
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+
+def probe_database():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except Exception:
+        # Reconnect on the next probe instead of reusing a broken connection
+        connection.close()
+        raise
+
+
+def probe_jwks():
+    from .auth_service import check_jwks
+
+    check_jwks()
+
+
+def probe_queue():
+    from .queue_backends import get_queue_backend
+
+    backend = get_queue_backend()
+    return {"backend": backend.name, "depth": backend.depth()}
+
+
+class HealthMonitor:
+    """
+    Runs each probe in its own daemon thread and keeps the latest result per probe.
+    Threads are started lazily once per process (again after a fork).
+    """
+
+    def __init__(self, probes):
+        self.probes = dict(probes)
+        self._results = {}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._results = {}
+            self._pid = os.getpid()
+        for name in self.probes:
+            threading.Thread(target=self._probe_forever, args=(name,), name=f"health-{name}", daemon=True).start()
+
+    def run_probe(self, name):
+        started = time.perf_counter()
+        result = {"ok": True, "error": None, "value": None}
+        try:
+            result["value"] = self.probes[name]()
+        except Exception as e:
+            result.update(ok=False, error=str(e)[:200])
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        result["checked_at"] = time.time()
+        with self._lock:
+            previous = self._results.get(name)
+            self._results[name] = result
+        if previous is None or previous["ok"] != result["ok"]:
+            if result["ok"]:
+                logger.info("Health check %s is passing", name, extra={"check": name})
+            else:
+                logger.warning("Health check %s is failing: %s", name, result["error"],
+                               extra={"check": name, "error": result["error"]})
+        return result
+
+    def _probe_forever(self, name):
+        while True:
+            self.run_probe(name)
+            time.sleep(settings.HEALTH_PROBE_INTERVAL)
+
+    def results(self):
+        with self._lock:
+            return dict(self._results)
+
+    def latest_value(self, name):
+        """
+        What probe `name` last returned, or None if it has not passed recently.
+        """
+        result = self.results().get(name)
+        if result is None or not result["ok"] or time.time() - result["checked_at"] > settings.HEALTH_PROBE_STALE_AFTER:
+            return None
+        return result["value"]
+
+
+MONITOR = HealthMonitor({
+    "database": probe_database,
+    "jwks": probe_jwks,
+    "queue": probe_queue,
+})
+
+
+def start_health_monitor():
+    """
+    Start the probe threads (called at worker boot so the first readiness request has results).
+    """
+    MONITOR.ensure_started()
+
+
+def liveness(request):
+    return JsonResponse({"status": "alive"})
+
+
+# Kept for the original /api/health/ route
+health_check = liveness
+
+
+def readiness(request):
+    """
+    Public, so each check reports only ok, latency and age; probe errors (which can name
+    hosts and URLs) go to the log when a check starts failing.
+    """
+    MONITOR.ensure_started()
+    results = MONITOR.results()
+    now = time.time()
+    required = settings.HEALTH_REQUIRED_CHECKS
+    ready = True
+    starting = False
+    checks = {}
+
+    for name in MONITOR.probes:
+        result = results.get(name)
+        is_required = name in required
+        if result is None:
+            checks[name] = {"ok": False}
+            starting = starting or is_required
+            ready = ready and not is_required
+            continue
+
+        age = now - result["checked_at"]
+        ok = result["ok"] and age <= settings.HEALTH_PROBE_STALE_AFTER
+        checks[name] = {"ok": ok, "latency_ms": result["latency_ms"], "age_seconds": round(age, 1)}
+        ready = ready and (ok or not is_required)
+
+    status = "ready" if ready else "starting" if starting else "unavailable"
+    return JsonResponse({"status": status, "checks": checks}, status=200 if ready else 503)
@@ -0,0 +1,160 @@
+# job_archive.py
+# Hot/cold split of job storage. Job (hot) holds active and recently finished jobs;
+# COMPLETED and FAILED_PERMANENT jobs finished more than JOB_ARCHIVE_AFTER_DAYS ago are
+# moved to ArchivedJob (cold) in batches by manage.py archive_jobs, so the Job table and
+# its indexes stay the size of recent traffic and the list / status queries never scan
+# old rows. An archived job keeps its API representation as gzip-compressed JSON and is
+# still returned by GET /api/jobs/<id>/ (looked up only after the hot table misses).
+# manage.py export_archived_jobs writes archived jobs to gzip-compressed NDJSON on disk
+# or S3 and can purge them afterwards.
+
+import gzip
+import json
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.models import ArchivedJob, Job
+from api.serializers import JobRowSerializer
+
+ARCHIVE_STATUSES = ("COMPLETED", "FAILED_PERMANENT")
+
+
+def archive_cutoff(days=None, now=None):
+    """
+    Jobs finished before this moment are due for archiving.
+    """
+    days = settings.JOB_ARCHIVE_AFTER_DAYS if days is None else days
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archivable_jobs(cutoff):
+    # completed_at is set on entering a finished status; updated_at covers rows from before that
+    return Job.objects.filter(status__in=ARCHIVE_STATUSES).filter(
+        Q(completed_at__lt=cutoff) | Q(completed_at__isnull=True, updated_at__lt=cutoff)
+    )
+
+
+def encode_job(representation):
+    return gzip.compress(
+        json.dumps(representation, cls=JSONEncoder, separators=(",", ":")).encode("utf-8"), compresslevel=6
+    )
+
+
+def decode_job(data):
+    return json.loads(gzip.decompress(bytes(data)))
+
+
+def archive_jobs(cutoff, batch_size=500):
+    """
+    Move up to batch_size jobs finished before cutoff from Job to ArchivedJob, oldest
+    first, in one transaction. Returns the number of jobs moved.
+    """
+    with transaction.atomic():
+        rows = list(JobRowSerializer.with_list_values(archivable_jobs(cutoff).order_by('created_at'))[:batch_size])
+        if not rows:
+            return 0
+
+        now = timezone.now()
+        ArchivedJob.objects.bulk_create(
+            [
+                ArchivedJob(
+                    id=row['id'],
+                    user_id=row['user'],
+                    connection_id=row['connection'],
+                    status=row['status'],
+                    files_processed=row['files_processed'],
+                    created_at=row['created_at'],
+                    started_at=row['started_at'],
+                    completed_at=row['completed_at'],
+                    archived_at=now,
+                    data=encode_job(JobRowSerializer.to_representation(row)),
+                )
+                for row in rows
+            ],
+            ignore_conflicts=True,
+        )
+        # Cascades to the job's outbox messages, manifest and shards
+        Job.objects.filter(id__in=[row['id'] for row in rows], status__in=ARCHIVE_STATUSES).delete()
+    return len(rows)
+
+
+def _archived_job_data(user_id, job_id):
+    return ArchivedJob.objects.filter(id=job_id, user_id=user_id).values_list('data', flat=True)
+
+
+def get_archived_job(user_id, job_id):
+    """
+    API representation of one of user_id's archived jobs, or None.
+    """
+    try:
+        job_id = uuid.UUID(str(job_id))
+    except ValueError:
+        return None
+    data = _archived_job_data(user_id, job_id).first()
+    return decode_job(data) if data is not None else None
+
+
+async def aget_archived_job(user_id, job_id):
+    data = await _archived_job_data(user_id, job_id).afirst()
+    return decode_job(data) if data is not None else None
+
+
+@contextmanager
+def _ndjson_output(output):
+    """
+    A gzip file object writing to a local path or, for s3://bucket/key, to a temporary
+    file uploaded when the with block exits without an error.
+    """
+    if not output.startswith("s3://"):
+        with gzip.open(output, "wb") as f:
+            yield f
+        return
+
+    import boto3
+
+    bucket, _, key = output[len("s3://"):].partition("/")
+    if not bucket or not key:
+        raise ValueError(f"Expected s3://bucket/key, got {output!r}")
+    with tempfile.NamedTemporaryFile(suffix=".ndjson.gz") as tmp:
+        with gzip.GzipFile(fileobj=tmp, mode="wb") as f:
+            yield f
+        tmp.flush()
+        tmp.seek(0)
+        s3 = boto3.client("s3", endpoint_url=settings.AWS_S3_ENDPOINT_URL or None)
+        s3.upload_fileobj(tmp, bucket, key)
+
+
+def export_archived_jobs(output, archived_before=None, user_ids=None, purge=False, batch_size=1000):
+    """
+    Write archived jobs (oldest first) as gzip-compressed NDJSON, one job representation
+    per line, to a local path or s3://bucket/key. With purge, the exported rows are
+    deleted once the file is complete. Returns the number of jobs exported.
+    """
+    queryset = ArchivedJob.objects.all()
+    if archived_before is not None:
+        queryset = queryset.filter(archived_at__lt=archived_before)
+    if user_ids:
+        queryset = queryset.filter(user_id__in=user_ids)
+
+    exported = []
+    with _ndjson_output(output) as f:
+        rows = queryset.order_by('created_at').values_list('id', 'data').iterator(chunk_size=batch_size)
+        for job_id, data in rows:
+            # Stored JSON is already one line; no need to parse and re-encode it
+            f.write(gzip.decompress(bytes(data)))
+            f.write(b"\n")
+            exported.append(job_id)
+
+    if purge:
+        for start in range(0, len(exported), batch_size):
+            ArchivedJob.objects.filter(id__in=exported[start:start + batch_size]).delete()
+    return len(exported)
+
@@ -0,0 +1,171 @@
+# job_events.py
+# Per-process fan-out of job status changes for the SSE stream.
+# A single poller task per event loop reads recently updated jobs for the users that
+# currently have a stream open and hands each change to their subscriber queues, so
+# database load is one query per poll interval no matter how many streams are idle.
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Fields pushed to the dashboard; only the ones that changed are sent
+STREAM_FIELDS = ("status", "files_processed", "completed_at")
+ROW_FIELDS = ('id', 'user_id', 'created_at', 'updated_at', *STREAM_FIELDS)
+
+# Rows can commit slightly after the updated_at they were stamped with, so every poll
+# looks back this far; duplicates are dropped by the per-subscriber diff.
+POLL_LOOKBACK = timedelta(seconds=2)
+
+# Resume more than this many changes and the client is told to reload instead
+CATCH_UP_LIMIT = 500
+
+
+def encode_cursor(updated_at, job_id):
+    return f"{updated_at.isoformat()}_{job_id}"
+
+
+def decode_cursor(cursor):
+    """
+    Return the updated_at timestamp a cursor points at, or None if it is malformed.
+    """
+    updated_at, _, _ = (cursor or "").rpartition("_")
+    try:
+        return parse_datetime(updated_at) if updated_at else None
+    except ValueError:
+        return None
+
+
+class Subscriber:
+    """
+    One open stream. Remembers what it last sent per job so only changed fields go out.
+    Jobs created after `since` (the resume cursor, or the time the stream opened) are
+    announced with a "created" event, since the client's job list cannot contain them.
+    """
+
+    def __init__(self, user_id, since=None, maxsize=1000):
+        self.user_id = str(user_id)
+        self.since = since or timezone.now() - POLL_LOOKBACK
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.sent = {}
+        self.overflowed = False
+
+    def diff(self, row):
+        """
+        Return (event_id, changed_fields, event) for a job row, or None if nothing changed.
+        """
+        job_id = str(row["id"])
+        previous = self.sent.get(job_id)
+        event = "created" if previous is None and row["created_at"] >= self.since else "job"
+        changed = {field: row[field] for field in STREAM_FIELDS if (previous or {}).get(field) != row[field]}
+        if not changed and event == "job":
+            return None
+        self.sent[job_id] = {field: row[field] for field in STREAM_FIELDS}
+        changed["id"] = job_id
+        return encode_cursor(row["updated_at"], job_id), changed, event
+
+    def offer(self, row):
+        change = self.diff(row)
+        if change is None:
+            return
+        try:
+            self.queue.put_nowait(change)
+        except asyncio.QueueFull:
+            # Slow consumer: end the stream; the client reconnects and resumes from its cursor
+            self.overflowed = True
+
+
+def _fetch_changes(user_ids, since):
+    try:
+        return list(
+            Job.objects
+            .filter(user_id__in=user_ids, updated_at__gte=since)
+            .order_by('updated_at', 'id')
+            .values(*ROW_FIELDS)
+        )
+    except Exception:
+        # Drop a broken connection so the next poll reconnects
+        connection.close()
+        raise
+    finally:
+        close_old_connections()
+
+
+def fetch_catch_up(user_id, since):
+    """
+    Changes for one user's jobs since a resume cursor, oldest first.
+    """
+    return list(
+        Job.objects
+        .filter(user_id=user_id, updated_at__gte=since - POLL_LOOKBACK)
+        .order_by('updated_at', 'id')
+        .values(*ROW_FIELDS)[:CATCH_UP_LIMIT + 1]
+    )
+
+
+class JobStatusBroadcaster:
+    """
+    Polls for job changes while at least one subscriber is connected.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.JOB_STREAM_POLL_INTERVAL
+        self.subscribers = {}
+        self.watermark = None
+        self._task = None
+
+    def subscribe(self, subscriber):
+        self.subscribers.setdefault(subscriber.user_id, set()).add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, subscriber):
+        group = self.subscribers.get(subscriber.user_id)
+        if group is not None:
+            group.discard(subscriber)
+            if not group:
+                del self.subscribers[subscriber.user_id]
+
+    async def _run(self):
+        self.watermark = timezone.now()
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            user_ids = list(self.subscribers)
+            if not user_ids:
+                break
+            try:
+                # Not thread-sensitive: this task outlives the request that started it
+                rows = await sync_to_async(_fetch_changes, thread_sensitive=False)(
+                    user_ids, self.watermark - POLL_LOOKBACK
+                )
+            except Exception as e:
+                logger.warning("Job stream poll failed: %s", e)
+                continue
+
+            for row in rows:
+                self.watermark = max(self.watermark, row["updated_at"])
+                for subscriber in list(self.subscribers.get(str(row["user_id"]), ())):
+                    subscriber.offer(row)
+
+
+_broadcasters = {}
+
+
+def get_broadcaster():
+    """
+    Return the broadcaster bound to the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = JobStatusBroadcaster()
+    return broadcaster
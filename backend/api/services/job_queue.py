@@ -0,0 +1,49 @@
+# job_queue.py
+# Helpers for building job messages and enqueueing them on the processing queue
+# (SQS, Postgres or in-memory; see queue_backends.py).
+
+import time
+
+from core.log import get_correlation_id, new_correlation_id
+
+from .metrics import QUEUE_ENQUEUE_LATENCY, QUEUE_ENQUEUED
+from .queue_backends import get_queue_backend
+
+
+def build_job_payload(job, data):
+    """
+    Build the queue message body for a job from the submitted request data.
+    correlationId ties the message (and the worker's callbacks, which send it back
+    as X-Request-ID) to the API request that created the job.
+    """
+    return {
+        "jobId": str(job.id),
+        "userBucket": data.get('user_bucket'),
+        "uploadPrefix": data.get('upload_prefix'),
+        "resultPrefix": data.get('result_prefix'),
+        "userRoleArn": data.get('user_role_arn'),
+        "ocrRequested": bool(data.get("ocr_requested", False)),
+        "ocrRenderBoxes": bool(data.get("ocr_render_boxes", False)),  # Always true for now
+        "tagRemovalRequested": bool(data.get("tag_removal_requested", False)),
+        "aiInferenceRequested": bool(data.get("ai_inference_requested", False)),
+        "forceFull": job.force_full,
+        "sagemakerEndpoint": data.get('model_endpoint', 'yolov5-inference-endpoint-v4'),
+        "correlationId": get_correlation_id() or new_correlation_id(),
+    }
+
+
+def send_messages_batch(payloads):
+    """
+    Enqueue job messages on the configured queue backend.
+    Returns a list aligned with payloads: None for each sent message, else the error message.
+    """
+    backend = get_queue_backend()
+    started = time.perf_counter()
+    errors = backend.enqueue_batch(payloads)
+    QUEUE_ENQUEUE_LATENCY.observe(time.perf_counter() - started, backend=backend.name)
+
+    failed = sum(1 for error in errors if error is not None)
+    QUEUE_ENQUEUED.inc(len(errors) - failed, backend=backend.name, outcome="sent")
+    if failed:
+        QUEUE_ENQUEUED.inc(failed, backend=backend.name, outcome="failed")
+    return errors
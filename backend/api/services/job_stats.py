@@ -0,0 +1,223 @@
+# job_stats.py
+# Incrementally maintained per-user job statistics.
+# Every code path that creates a job or changes its status or progress records a
+# delta here, keyed on (user, day of job creation). GET /jobs/stats/ then reads a
+# handful of summary rows per window instead of scanning Job.
+
+import bisect
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.models import ArchivedJob, Job, JobDurationHistogram, JobStatsDaily
+
+# Upper bounds (seconds) of the duration histogram buckets; the last bucket is open-ended
+DURATION_BUCKETS = [1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400, 43200, 86400, 259200]
+
+# Supported ?window= values, in days (None = all time)
+WINDOWS = {"1d": 1, "7d": 7, "30d": 30, "90d": 90, "all": None}
+
+STATUS_FIELDS = {status: status.lower() for status, _ in Job.STATUS_CHOICES}
+
+
+def stats_day(created_at):
+    return timezone.localtime(created_at, dt_timezone.utc).date()
+
+
+def duration_bucket(seconds):
+    return bisect.bisect_left(DURATION_BUCKETS, seconds)
+
+
+class StatsDelta:
+    """
+    Collects counter changes for many jobs so they can be written with one
+    UPDATE per (user, day) when the batch is applied.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(Counter)
+        self.durations = Counter()
+
+    def created(self, user_id, day, status="PENDING"):
+        self.counters[(user_id, day)][STATUS_FIELDS[status]] += 1
+
+    def status_changed(self, user_id, day, old_status, new_status):
+        if old_status == new_status:
+            return
+        self.counters[(user_id, day)][STATUS_FIELDS[old_status]] -= 1
+        self.counters[(user_id, day)][STATUS_FIELDS[new_status]] += 1
+
+    def files_processed(self, user_id, day, delta):
+        if delta:
+            self.counters[(user_id, day)]["files_processed"] += delta
+
+    def completed(self, user_id, day, started_at, completed_at):
+        # Jobs that never recorded a start have no duration, as in rebuild_job_stats
+        if started_at is None or completed_at is None:
+            return
+        seconds = max(0.0, (completed_at - started_at).total_seconds())
+        self.counters[(user_id, day)]["duration_count"] += 1
+        self.counters[(user_id, day)]["duration_sum_seconds"] += seconds
+        self.durations[(user_id, day, duration_bucket(seconds))] += 1
+
+    def apply(self):
+        """
+        Write the collected deltas. Call inside the transaction that made the job changes.
+        """
+        for (user_id, day), counter in self.counters.items():
+            increments = {field: value for field, value in counter.items() if value}
+            if increments:
+                _increment(JobStatsDaily, {"user_id": user_id, "day": day}, increments)
+        for (user_id, day, bucket), count in self.durations.items():
+            _increment(JobDurationHistogram, {"user_id": user_id, "day": day, "bucket": bucket}, {"count": count})
+
+
+def _increment(model, keys, increments):
+    """
+    Atomically add increments to the row identified by keys, creating it if missing.
+    """
+    updates = {field: F(field) + value for field, value in increments.items()}
+    if model.objects.filter(**keys).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **increments)
+    except IntegrityError:
+        # Another transaction created the row first
+        model.objects.filter(**keys).update(**updates)
+
+
+def record_jobs_created(jobs):
+    delta = StatsDelta()
+    for job in jobs:
+        delta.created(job.user_id, stats_day(job.created_at), job.status)
+    delta.apply()
+
+
+def _percentile(bucket_counts, fraction):
+    """
+    Estimate a percentile from histogram bucket counts by linear interpolation within the bucket.
+    """
+    total = sum(bucket_counts.values())
+    if not total:
+        return None
+
+    target = fraction * total
+    seen = 0
+    for bucket in sorted(bucket_counts):
+        count = bucket_counts[bucket]
+        if seen + count >= target:
+            lower = DURATION_BUCKETS[bucket - 1] if bucket > 0 else 0
+            if bucket >= len(DURATION_BUCKETS):
+                return float(DURATION_BUCKETS[-1])
+            upper = DURATION_BUCKETS[bucket]
+            return round(lower + (upper - lower) * ((target - seen) / count), 2)
+        seen += count
+    return float(DURATION_BUCKETS[-1])
+
+
+def get_job_stats(user_id, windows):
+    """
+    Per-status counts, files processed, and average / p95 duration for each window.
+    """
+    today = timezone.localdate(timezone=dt_timezone.utc)
+    result = {}
+
+    for window in windows:
+        days = WINDOWS[window]
+        rows = JobStatsDaily.objects.filter(user_id=user_id)
+        histogram = JobDurationHistogram.objects.filter(user_id=user_id)
+        if days is not None:
+            since = today - timedelta(days=days - 1)
+            rows = rows.filter(day__gte=since)
+            histogram = histogram.filter(day__gte=since)
+
+        sums = rows.aggregate(
+            **{field: Sum(field) for field in STATUS_FIELDS.values()},
+            files_processed=Sum('files_processed'),
+            duration_count=Sum('duration_count'),
+            duration_sum_seconds=Sum('duration_sum_seconds'),
+        )
+        bucket_counts = dict(
+            histogram.order_by().values_list('bucket').annotate(n=Sum('count'))
+        )
+
+        counts = {status: sums[field] or 0 for status, field in STATUS_FIELDS.items()}
+        total = sum(counts.values())
+        finished = counts["COMPLETED"] + counts["FAILED_PERMANENT"]
+        duration_count = sums['duration_count'] or 0
+
+        result[window] = {
+            "jobs": total,
+            "by_status": counts,
+            "success_rate": round(counts["COMPLETED"] / finished, 4) if finished else None,
+            "files_processed": sums['files_processed'] or 0,
+            "avg_duration_seconds": (
+                round(sums['duration_sum_seconds'] / duration_count, 2) if duration_count else None
+            ),
+            "p95_duration_seconds": _percentile(bucket_counts, 0.95),
+        }
+
+    return result
+
+
+def rebuild_job_stats(user_ids=None):
+    """
+    Recompute the summary tables from Job and ArchivedJob, for all users or only user_ids.
+    Jobs exported and purged from the archive are no longer counted.
+    """
+    sources = [Job.objects.all(), ArchivedJob.objects.all()]
+    stats = JobStatsDaily.objects.all()
+    histogram = JobDurationHistogram.objects.all()
+    if user_ids is not None:
+        sources = [jobs.filter(user_id__in=user_ids) for jobs in sources]
+        stats = stats.filter(user_id__in=user_ids)
+        histogram = histogram.filter(user_id__in=user_ids)
+
+    rows = defaultdict(Counter)
+    durations = Counter()
+    day_expr = TruncDate('created_at', tzinfo=dt_timezone.utc)
+
+    for jobs in sources:
+        for entry in (
+            jobs.order_by()
+            .annotate(day=day_expr)
+            .values('user_id', 'day', 'status')
+            .annotate(n=Count('id'), files=Sum('files_processed'))
+        ):
+            counter = rows[(entry['user_id'], entry['day'])]
+            counter[STATUS_FIELDS[entry['status']]] += entry['n']
+            counter['files_processed'] += entry['files'] or 0
+
+        completed = (
+            jobs.filter(status="COMPLETED", started_at__isnull=False, completed_at__isnull=False)
+            .order_by()
+            .annotate(day=day_expr)
+            .values_list('user_id', 'day', 'started_at', 'completed_at')
+        )
+        for user_id, day, started_at, completed_at in completed.iterator(chunk_size=5000):
+            seconds = max(0.0, (completed_at - started_at).total_seconds())
+            rows[(user_id, day)]['duration_count'] += 1
+            rows[(user_id, day)]['duration_sum_seconds'] += seconds
+            durations[(user_id, day, duration_bucket(seconds))] += 1
+
+    with transaction.atomic():
+        stats.delete()
+        histogram.delete()
+        JobStatsDaily.objects.bulk_create(
+            [JobStatsDaily(user_id=user_id, day=day, **counter) for (user_id, day), counter in rows.items()],
+            batch_size=1000,
+        )
+        JobDurationHistogram.objects.bulk_create(
+            [
+                JobDurationHistogram(user_id=user_id, day=day, bucket=bucket, count=count)
+                for (user_id, day, bucket), count in durations.items()
+            ],
+            batch_size=1000,
+        )
+
+    return len(rows)
@@ -0,0 +1,35 @@
+# job_submission.py
+# Creating a job: the Job row, its queue message in the outbox and the stats delta
+# are written in one transaction. Shared by the DRF viewset and the async job views.
+
+import logging
+
+from django.db import transaction
+
+from .job_queue import build_job_payload
+from .job_stats import record_jobs_created
+from .outbox import add_to_outbox
+
+logger = logging.getLogger(__name__)
+
+
+def create_job(serializer, user, connection, data):
+    """
+    Save a validated JobSerializer as a PENDING job and record its queue message.
+    The outbox dispatcher delivers the message once the transaction commits.
+    """
+    with transaction.atomic():
+        job = serializer.save(
+            user=user,
+            connection=connection,
+            status="PENDING"
+        )
+        logger.info("Job created", extra={"job_id": str(job.id), "user_id": str(user.user_id)})
+
+        # Build payload for SQS (new schema)
+        payload = build_job_payload(job, data)
+        logger.debug("Queue payload built", extra={"job_id": str(job.id), "payload": payload})
+
+        add_to_outbox(job, payload)
+        record_jobs_created([job])
+    return job
@@ -0,0 +1,176 @@
+# jwks_store.py
+# Rotation-aware store for Cognito JWKS public keys.
+# Keys are refreshed when they go stale (TTL) or when a token arrives with a kid we
+# have not seen. Only one refresh runs at a time per process, and failed fetches are
+# negatively cached with exponential backoff so an outage does not turn every request
+# into a blocking HTTP call.
+
+import logging
+import threading
+import time
+
+from .metrics import JWKS_FETCH_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class JWKSKeyStore:
+    """
+    Fetches, parses and caches the RSA public keys published at a JWKS URL.
+    """
+
+    def __init__(
+        self,
+        url,
+        ttl=3600,
+        min_refresh_interval=30,
+        timeout=5,
+        backoff_base=1,
+        backoff_max=300,
+        fetch=None,
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Injectable so the store can be pointed at a local JWKS stand-in
+        self._fetch_jwks = fetch or self._http_fetch
+
+        self._cond = threading.Condition()
+        self._jwks = []
+        self._public_keys = {}
+        self._fetched_at = None
+        self._last_attempt_at = None
+        self._retry_at = 0.0
+        self._refreshing = False
+        self._consecutive_failures = 0
+
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def _http_fetch(self):
+        import requests
+
+        response = requests.get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get("keys", [])
+
+    def _is_fresh(self, now):
+        return self._fetched_at is not None and now - self._fetched_at < self.ttl
+
+    @staticmethod
+    def _parse_keys(jwks):
+        from jwt.algorithms import RSAAlgorithm
+
+        public_keys = {}
+        for key in jwks:
+            kid = key.get("kid")
+            if not kid or key.get("kty") != "RSA":
+                continue
+            try:
+                public_keys[kid] = RSAAlgorithm.from_jwk(key)
+            except Exception as e:
+                logger.warning("Skipping unparseable JWK %s: %s", kid, e)
+        return public_keys
+
+    def refresh(self, force=False):
+        """
+        Refresh the key set. Concurrent callers wait for the refresh already in flight
+        instead of starting their own. Returns True if keys are available afterwards.
+        """
+        with self._cond:
+            if self._refreshing:
+                self._cond.wait(timeout=self.timeout + 1)
+                return bool(self._public_keys)
+
+            now = time.monotonic()
+            if now < self._retry_at:
+                # Negative cache: a recent fetch failed and we are still backing off
+                return bool(self._public_keys)
+            if not force and self._is_fresh(now):
+                return True
+
+            self._refreshing = True
+            self._last_attempt_at = now
+
+        started = time.perf_counter()
+        try:
+            jwks = self._fetch_jwks()
+            public_keys = self._parse_keys(jwks)
+            if not public_keys:
+                raise ValueError("JWKS response contained no usable RSA keys")
+        except Exception as e:
+            JWKS_FETCH_LATENCY.observe(time.perf_counter() - started, outcome="error")
+            with self._cond:
+                self._consecutive_failures += 1
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(
+                    self.backoff_max,
+                    self.backoff_base * (2 ** (self._consecutive_failures - 1)),
+                )
+                self._retry_at = time.monotonic() + backoff
+                self._refreshing = False
+                self._cond.notify_all()
+                has_keys = bool(self._public_keys)
+            logger.warning("Failed to fetch Cognito JWKS (retrying in %ss): %s", backoff, e)
+            return has_keys
+
+        JWKS_FETCH_LATENCY.observe(time.perf_counter() - started, outcome="ok")
+        with self._cond:
+            self._jwks = jwks
+            self._public_keys = public_keys
+            self._fetched_at = time.monotonic()
+            self._retry_at = 0.0
+            self._consecutive_failures = 0
+            self.refreshes += 1
+            self.last_error = None
+            self._refreshing = False
+            self._cond.notify_all()
+        return True
+
+    def warm(self):
+        """
+        Populate the store eagerly, e.g. when a worker process boots.
+        """
+        return self.refresh(force=True)
+
+    def get_jwks(self):
+        """
+        Return the raw JWKS key list, refreshing it if stale.
+        """
+        if not self._is_fresh(time.monotonic()):
+            self.refresh()
+        return self._jwks or None
+
+    def get_public_key(self, kid):
+        """
+        Return the parsed public key for a kid, or None if it is unknown.
+        An unknown kid triggers a refresh (rate limited by min_refresh_interval)
+        so rotated keys are picked up without restarting the worker.
+        """
+        now = time.monotonic()
+        if not self._is_fresh(now):
+            self.refresh()
+        elif kid not in self._public_keys:
+            last_attempt = self._last_attempt_at
+            if last_attempt is None or now - last_attempt >= self.min_refresh_interval:
+                self.refresh(force=True)
+
+        return self._public_keys.get(kid)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "kids": sorted(self._public_keys),
+                "age_seconds": round(now - self._fetched_at, 1) if self._fetched_at is not None else None,
+                "fresh": self._is_fresh(now),
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "backoff_remaining": round(max(0.0, self._retry_at - now), 1),
+                "last_error": self.last_error,
+            }
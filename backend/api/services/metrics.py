@@ -0,0 +1,360 @@
+# metrics.py
+# In-process Prometheus metrics: counters, histograms and scrape-time gauges,
+# rendered in the Prometheus text exposition format by GET /api/metrics/.
+# Recording is a dict lookup and a few additions under a per-metric lock.
+#
+# Gunicorn runs several worker processes and a scrape reaches only one of them.
+# With METRICS_MULTIPROC_DIR set, every process writes a snapshot of its counters
+# and histograms there every METRICS_FLUSH_INTERVAL seconds, and a scrape adds up
+# all snapshots (those of exited workers included, so totals never go backwards).
+# The directory is emptied when gunicorn starts (see gunicorn.conf.py).
+# Request metrics are recorded by api.middleware.MetricsMiddleware.
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from a cached token check up to a slow AWS call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): value for key, value in self._values.items()}
+
+    @staticmethod
+    def merge(total, other):
+        for key, value in other.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, json.loads(key))} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [count per bucket (non-cumulative) ..., +Inf count, sum]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Observe the duration of the with block. Labels may be changed inside the block
+        (e.g. labels["outcome"] = "error"), since the dict is read on exit.
+        """
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {json.dumps(key): list(entry) for key, entry in self._values.items()}
+
+    @staticmethod
+    def merge(total, other):
+        for key, entry in other.items():
+            if key in total:
+                total[key] = [a + b for a, b in zip(total[key], entry)]
+            else:
+                total[key] = list(entry)
+
+    def render(self, values):
+        bounds = self.buckets + (float("inf"),)
+        for key, entry in sorted(values.items()):
+            label_values = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(bounds, entry):
+                cumulative += count
+                labels = _format_labels(self.labelnames, label_values, [("le", _format_value(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(entry[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    """
+    Read at scrape time by calling collect(), which returns {(label values...): value}.
+    Gauges are never merged across processes: they describe either shared state (queue
+    depth) or the process that answered the scrape (token cache size).
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render_live(self):
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.warning("Metrics gauge %s failed: %s", self.name, e)
+            return
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def snapshot(self):
+        return {
+            name: metric.snapshot()
+            for name, metric in self._metrics.items()
+            if metric.kind != "gauge"
+        }
+
+    # Multi-process support
+
+    def _snapshot_path(self, directory, pid):
+        return os.path.join(directory, f"metrics-{pid}.json")
+
+    def flush(self):
+        """
+        Write this process's snapshot to METRICS_MULTIPROC_DIR (no-op when unset).
+        """
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory:
+            return
+        path = self._snapshot_path(directory, os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def ensure_flusher(self):
+        """
+        Start the background flush thread once per process (again after a fork).
+        """
+        if not settings.METRICS_MULTIPROC_DIR or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        def flush_forever():
+            while True:
+                time.sleep(settings.METRICS_FLUSH_INTERVAL)
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning("Could not write metrics snapshot: %s", e)
+
+        threading.Thread(target=flush_forever, name="metrics-flush", daemon=True).start()
+
+    def collect(self):
+        """
+        Merged counter and histogram values: this process's live values plus the
+        snapshots other processes left in METRICS_MULTIPROC_DIR.
+        """
+        merged = self.snapshot()
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory or not os.path.isdir(directory):
+            return merged
+
+        own = self._snapshot_path(directory, os.getpid())
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(".json") or entry.path == own:
+                continue
+            try:
+                with open(entry.path) as f:
+                    other = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, values in other.items():
+                metric = self._metrics.get(name)
+                if metric is not None and metric.kind != "gauge":
+                    metric.merge(merged.setdefault(name, {}), values)
+        return merged
+
+    def render(self):
+        merged = self.collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == "gauge":
+                lines.extend(metric.render_live())
+            else:
+                lines.extend(metric.render(merged.get(name, {})))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Requests
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency by route, method and status.",
+    ("route", "method", "status"),
+)
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "Database queries issued per request, by route.",
+    ("route",), buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = REGISTRY.histogram(
+    "http_request_db_duration_seconds", "Total time spent in database queries per request, by route.",
+    ("route",),
+)
+
+# Dependencies
+JWKS_FETCH_LATENCY = REGISTRY.histogram(
+    "jwks_fetch_duration_seconds", "Cognito JWKS fetch latency by outcome (ok, error).", ("outcome",),
+)
+TOKEN_VERIFY_LATENCY = REGISTRY.histogram(
+    "token_verify_duration_seconds", "Access token verification latency by result (cached, verified, invalid).",
+    ("result",),
+)
+TOKEN_CACHE_EVENTS = REGISTRY.counter(
+    "token_cache_events_total", "Verified-token cache lookups and removals by event (hit, miss, eviction, expiration).",
+    ("event",),
+)
+QUEUE_ENQUEUE_LATENCY = REGISTRY.histogram(
+    "queue_enqueue_duration_seconds", "Latency of one enqueue_batch call by queue backend.", ("backend",),
+)
+QUEUE_ENQUEUED = REGISTRY.counter(
+    "queue_enqueued_messages_total", "Messages handed to the queue backend, by outcome (sent, failed).",
+    ("backend", "outcome"),
+)
+
+
+def _queue_depth():
+    # Sampled by the health monitor's queue probe; with SQS a live depth() is a network
+    # call, so a scrape only reads the last sample and reports nothing if it is missing or stale
+    from .health_check import MONITOR
+
+    MONITOR.ensure_started()
+    sample = MONITOR.latest_value("queue")
+    return {(sample["backend"],): sample["depth"]} if sample else {}
+
+
+def _token_cache_entries():
+    from .auth_service import get_token_cache_stats
+
+    return {(): get_token_cache_stats()["size"]}
+
+
+def _jwks_keys():
+    from .auth_service import get_jwks_stats
+
+    return {(): len(get_jwks_stats()["kids"])}
+
+
+def _jwks_age():
+    from .auth_service import get_jwks_stats
+
+    age = get_jwks_stats()["age_seconds"]
+    return {(): age} if age is not None else {}
+
+
+def _outbox_messages():
+    from django.db.models import Count
+
+    from api.models import JobOutbox
+
+    rows = JobOutbox.objects.filter(status="PENDING").values("requires_manifest").annotate(n=Count("id"))
+    counts = {("ready",): 0, ("awaiting_manifest",): 0}
+    for row in rows:
+        counts[("awaiting_manifest",) if row["requires_manifest"] else ("ready",)] += row["n"]
+    return counts
+
+
+REGISTRY.gauge(
+    "job_queue_depth", "Messages in the job queue, visible or in flight (approximate for SQS), as last probed.",
+    ("backend",), collect=_queue_depth,
+)
+REGISTRY.gauge(
+    "token_cache_entries", "Verified tokens cached in the scraped process.", collect=_token_cache_entries,
+)
+REGISTRY.gauge(
+    "jwks_keys", "Cognito public keys loaded in the scraped process.", collect=_jwks_keys,
+)
+REGISTRY.gauge(
+    "jwks_age_seconds", "Seconds since the scraped process last fetched the JWKS.", collect=_jwks_age,
+)
+REGISTRY.gauge(
+    "job_outbox_pending_messages", "Outbox messages not yet dispatched, by state.",
+    ("state",), collect=_outbox_messages,
+)
@@ -0,0 +1,213 @@
+# outbox.py
+# Transactional outbox for job queue messages.
+# Job creation writes an outbox row in the same transaction as the Job, so the API
+# never waits on the queue. The dispatcher (manage.py dispatch_outbox) drains pending rows
+# in id order, sends them in batches with a reused client and retries failures
+# with exponential backoff.
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from api.models import Job, JobManifest, JobOutbox, JobShard
+from .job_queue import send_messages_batch
+from .fair_share import plan_admissions
+from .job_stats import StatsDelta, stats_day
+from .sharding import rollup_jobs
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BACKOFF_BASE_SECONDS = 2
+OUTBOX_BACKOFF_MAX_SECONDS = 300
+
+
+def add_to_outbox(job, payload):
+    """
+    Record a queue message for a job. Call inside the transaction that saves the job.
+    With JOB_PRESCAN_ENABLED the message waits for the job's pre-scan manifest.
+    """
+    return JobOutbox.objects.create(job=job, payload=payload, requires_manifest=settings.JOB_PRESCAN_ENABLED)
+
+
+def bulk_add_to_outbox(jobs_and_payloads):
+    """
+    Record queue messages for many jobs with a single INSERT.
+    """
+    return JobOutbox.objects.bulk_create([
+        JobOutbox(job=job, payload=payload, requires_manifest=settings.JOB_PRESCAN_ENABLED)
+        for job, payload in jobs_and_payloads
+    ])
+
+
+def _with_manifest_summary(messages):
+    """
+    Add the pre-scan totals to each message payload, read for the whole batch in one query.
+    """
+    manifests = {
+        job_id: (file_count, total_bytes, skipped)
+        for job_id, file_count, total_bytes, skipped in JobManifest.objects.filter(
+            job_id__in={m.job_id for m in messages}, status="READY"
+        ).values_list('job_id', 'file_count', 'total_bytes', 'job__files_skipped')
+    }
+    payloads = []
+    for message in messages:
+        payload = message.payload
+        if message.job_id in manifests:
+            file_count, total_bytes, skipped = manifests[message.job_id]
+            # skippedFiles > 0 means workers must process only the manifest's objects
+            payload = {
+                **payload,
+                "manifest": {"totalFiles": file_count, "totalBytes": total_bytes, "skippedFiles": skipped},
+            }
+        payloads.append(payload)
+    return payloads
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS ** attempts))
+
+
+def ready_messages(now=None):
+    """
+    Pending messages that could be sent now: due, with their job's pre-scan finished
+    (if required), and with no earlier message for the same job or shard still pending.
+    """
+    now = now or timezone.now()
+    # Shard messages only wait on earlier job-level messages and on earlier
+    # messages for the same shard, so a job's shards go out together
+    earlier_pending = JobOutbox.objects.filter(
+        Q(shard__isnull=True) | Q(shard_id=OuterRef('shard_id')),
+        job_id=OuterRef('job_id'),
+        status="PENDING",
+        id__lt=OuterRef('id'),
+    )
+    finished_manifest = JobManifest.objects.filter(job_id=OuterRef('job_id'), status__in=["READY", "FAILED"])
+    return (
+        JobOutbox.objects
+        .filter(status="PENDING", available_at__lte=now)
+        .filter(Q(requires_manifest=False) | Q(Exists(finished_manifest)))
+        .exclude(Exists(earlier_pending))
+    )
+
+
+def dispatch_outbox_batch(batch_size=100, max_attempts=10):
+    """
+    Claim up to batch_size due messages, send them, and record the outcome.
+    Messages for the same job (or shard) are delivered in the order they were written:
+    a message is not claimed while an earlier one for its job is still pending.
+    Messages that require a manifest wait until the job's pre-scan has finished.
+    With JOB_FAIR_SHARE_ENABLED, jobs not yet admitted wait for fair-share admission.
+    Returns a dict with dispatched/retried/failed counts and the max dispatch lag.
+    """
+    now = timezone.now()
+    result = {"dispatched": 0, "retried": 0, "failed": 0, "max_lag_seconds": 0.0}
+
+    with transaction.atomic():
+        ready = ready_messages(now)
+        if settings.JOB_FAIR_SHARE_ENABLED:
+            # Messages of admitted jobs (later shards, retries of a running job) go out
+            # first; the remaining slots go to newly admitted jobs by fair share
+            messages = list(
+                ready.filter(job__admitted_at__isnull=False)
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('id')[:batch_size]
+            )
+            slots = batch_size - len(messages)
+            admit = plan_admissions(ready.filter(job__admitted_at__isnull=True), slots)
+            if admit:
+                messages += list(
+                    ready.filter(job_id__in=admit)
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .order_by('id')[:slots]
+                )
+        else:
+            messages = list(ready.select_for_update(skip_locked=True, of=('self',)).order_by('id')[:batch_size])
+        if not messages:
+            return result
+
+        errors = send_messages_batch(_with_manifest_summary(messages))
+        sent_at = timezone.now()
+
+        dispatched_ids = []
+        exhausted_jobs = {}
+        exhausted_shards = {}
+        for message, error in zip(messages, errors):
+            # Logged under the correlation ID of the request that created the job
+            context = {
+                "job_id": str(message.job_id),
+                "shard_id": message.shard_id,
+                "correlation_id": message.payload.get("correlationId"),
+            }
+            if error is None:
+                dispatched_ids.append(message.id)
+                lag = (sent_at - message.created_at).total_seconds()
+                result["max_lag_seconds"] = max(result["max_lag_seconds"], lag)
+                logger.info("Job message enqueued", extra={**context, "lag_seconds": round(lag, 3)})
+                continue
+
+            logger.warning("Job message enqueue failed: %s", error, extra={**context, "attempts": message.attempts + 1})
+
+            message.attempts += 1
+            message.last_error = error
+            if message.attempts >= max_attempts:
+                message.status = "FAILED"
+                if message.shard_id:
+                    exhausted_shards[message.shard_id] = error
+                else:
+                    exhausted_jobs[message.job_id] = error
+                result["failed"] += 1
+            else:
+                message.available_at = sent_at + _backoff(message.attempts)
+                result["retried"] += 1
+            message.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+
+        if dispatched_ids:
+            JobOutbox.objects.filter(id__in=dispatched_ids).update(status="DISPATCHED", dispatched_at=sent_at)
+            # The job counts against its user's fair-share limits from now on
+            dispatched = set(dispatched_ids)
+            dispatched_jobs = {m.job_id for m in messages if m.id in dispatched}
+            Job.objects.filter(id__in=dispatched_jobs, admitted_at__isnull=True).update(admitted_at=sent_at)
+            result["dispatched"] = len(dispatched_ids)
+
+        if exhausted_shards:
+            stats = StatsDelta()
+            for shard_id, error in exhausted_shards.items():
+                JobShard.objects.filter(id=shard_id, status="PENDING").update(
+                    status="FAILED_PERMANENT",
+                    error_message=f"Failed to enqueue shard: {error}",
+                    completed_at=sent_at,
+                    updated_at=sent_at,
+                )
+            shard_jobs = {m.job_id for m in messages if m.shard_id in exhausted_shards}
+            rollup_jobs(shard_jobs, stats, sent_at)
+            stats.apply()
+
+        if exhausted_jobs:
+            stats = StatsDelta()
+            pending_jobs = Job.objects.filter(id__in=exhausted_jobs, status="PENDING").values_list('id', 'user_id', 'created_at')
+            for job_id, user_id, created_at in pending_jobs:
+                if Job.objects.filter(id=job_id, status="PENDING").update(
+                    status="FAILED_PERMANENT",
+                    error_message=f"Failed to enqueue job: {exhausted_jobs[job_id]}",
+                    updated_at=sent_at,
+                ):
+                    stats.status_changed(user_id, stats_day(created_at), "PENDING", "FAILED_PERMANENT")
+            stats.apply()
+
+    return result
+
+
+def get_outbox_lag():
+    """
+    Number of undelivered messages and the age of the oldest one, in seconds.
+    """
+    pending = JobOutbox.objects.filter(status="PENDING")
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        "pending": pending.count(),
+        "oldest_pending_age_seconds": round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0.0,
+    }
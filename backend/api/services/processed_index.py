@@ -0,0 +1,133 @@
+# processed_index.py
+# Per-connection index of objects already processed, for incremental re-runs.
+# When a job or shard completes, every object in its manifest is upserted keyed on
+# (connection, option set, destination + source key) with its ETag. A later job over
+# the same prefix with the same options then keeps only objects that are new or whose
+# ETag changed, unless it was submitted with force_full.
+
+import hashlib
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from api.models import Job, JobManifest, JobOutbox, JobShard, ProcessedObject
+from .job_stats import StatsDelta, stats_day
+
+# Bits of ProcessedObject.options
+OPTION_FLAGS = {
+    "ocr_requested": 1,
+    "tag_removal_requested": 2,
+    "ai_inference_requested": 4,
+}
+
+# Keys per IN (...) lookup against the unique index
+LOOKUP_CHUNK_SIZE = 1000
+
+
+def option_set(ocr_requested, tag_removal_requested, ai_inference_requested):
+    flags = {
+        "ocr_requested": ocr_requested,
+        "tag_removal_requested": tag_removal_requested,
+        "ai_inference_requested": ai_inference_requested,
+    }
+    return sum(bit for name, bit in OPTION_FLAGS.items() if flags[name])
+
+
+def key_digest(destination_prefix, source_key):
+    return hashlib.sha256(f"{destination_prefix or ''}\0{source_key}".encode("utf-8")).hexdigest()
+
+
+def filter_unprocessed(job, objects):
+    """
+    Drop objects the index already has with the same ETag for this job's connection,
+    destination and options. Returns (remaining objects, skipped count).
+    """
+    options = option_set(job.ocr_requested, job.tag_removal_requested, job.ai_inference_requested)
+    remaining = []
+    for start in range(0, len(objects), LOOKUP_CHUNK_SIZE):
+        chunk = objects[start:start + LOOKUP_CHUNK_SIZE]
+        digests = [key_digest(job.destination_prefix, key) for key, _, _ in chunk]
+        known = dict(
+            ProcessedObject.objects.filter(
+                connection_id=job.connection_id, options=options, key_digest__in=digests
+            ).values_list('key_digest', 'etag')
+        )
+        remaining.extend(obj for obj, digest in zip(chunk, digests) if known.get(digest) != obj[2])
+    return remaining, len(objects) - len(remaining)
+
+
+def record_processed(connection_id, destination_prefix, options, objects, job_id=None):
+    """
+    Upsert objects into the index, replacing the ETag of objects seen before.
+    """
+    now = timezone.now()
+    ProcessedObject.objects.bulk_create(
+        [
+            ProcessedObject(
+                connection_id=connection_id,
+                options=options,
+                key_digest=key_digest(destination_prefix, key),
+                source_key=key,
+                destination_prefix=destination_prefix or "",
+                etag=etag,
+                job_id=job_id,
+                processed_at=now,
+            )
+            for key, _, etag in objects
+        ],
+        batch_size=LOOKUP_CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['connection', 'options', 'key_digest'],
+        update_fields=['etag', 'job', 'processed_at'],
+    )
+
+
+def record_completed(job_ids=(), shard_ids=()):
+    """
+    Index the manifest objects of completed unsharded jobs and completed shards.
+    Jobs without a READY manifest (pre-scan off or failed) are not indexed.
+    """
+    # Imported here: s3_prescan imports this module
+    from .s3_prescan import decode_manifest
+
+    job_fields = (
+        'job_id', 'data', 'job__connection_id', 'job__destination_prefix',
+        'job__ocr_requested', 'job__tag_removal_requested', 'job__ai_inference_requested',
+    )
+    sources = []
+    if job_ids:
+        sources.append(
+            JobManifest.objects
+            .filter(job_id__in=job_ids, status="READY")
+            .exclude(Exists(JobShard.objects.filter(job_id=OuterRef('job_id'))))
+            .values_list(*job_fields)
+        )
+    if shard_ids:
+        sources.append(JobShard.objects.filter(id__in=shard_ids).values_list(*job_fields))
+
+    for rows in sources:
+        for job_id, data, connection_id, destination_prefix, ocr, tag_removal, ai_inference in rows:
+            objects = decode_manifest(data)
+            if objects:
+                record_processed(
+                    connection_id, destination_prefix, option_set(ocr, tag_removal, ai_inference), objects, job_id
+                )
+
+
+def complete_unchanged_job(job):
+    """
+    Finish a job whose whole prefix was already processed, without queueing it.
+    Call inside the transaction that stores its manifest.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if not Job.objects.filter(id=job.id, status="PENDING").update(
+            status="COMPLETED", completed_at=now, updated_at=now
+        ):
+            return False
+        JobOutbox.objects.filter(job=job, status="PENDING").update(status="SUPERSEDED")
+        stats = StatsDelta()
+        stats.status_changed(job.user_id, stats_day(job.created_at), "PENDING", "COMPLETED")
+        stats.apply()
+    return True
@@ -0,0 +1,251 @@
+# progress.py
+# Applies progress events reported by the anonymization workers.
+# Any number of events for the same job in one callback are coalesced into a single
+# UPDATE, and jobs whose only change is the same file-count increment share one
+# UPDATE, so write volume scales with jobs per callback rather than files processed.
+# Workers are expected to buffer per-file progress and post it every few seconds.
+# Events carrying a shard_index update that shard and roll up into its parent job.
+# Completed jobs and shards add their manifest objects to the processed-object index.
+# An event with an invalid status change, or progress for an already finished job or
+# shard, is rejected whole: none of its counters are applied.
+
+from collections import Counter, defaultdict
+
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import Job, JobShard
+from .job_stats import StatsDelta, stats_day
+from .processed_index import record_completed
+from .sharding import rollup_jobs
+
+LATE_EVENT_ERROR = "Already finished; late progress is ignored."
+
+
+def coalesce_events(events, key=lambda event: event["job_id"]):
+    """
+    Merge validated events per job (or per key), preserving the order of reported status changes.
+    """
+    merged = {}
+    for event in events:
+        update = merged.setdefault(key(event), {
+            "files_delta": 0,
+            "total_files": None,
+            "statuses": [],
+            "error_message": None,
+        })
+        update["files_delta"] += event.get("files_processed", 0)
+        if event.get("total_files") is not None:
+            update["total_files"] = event["total_files"]
+        if event.get("status"):
+            update["statuses"].append(event["status"])
+        if event.get("error_message"):
+            update["error_message"] = event["error_message"]
+    return merged
+
+
+def resolve_status(current, requested):
+    """
+    Walk the requested status changes from the current status.
+    Returns (final_status, error) where error is set on the first invalid transition.
+    """
+    status = current
+    for new_status in requested:
+        if new_status == status:
+            continue
+        if new_status not in Job.STATUS_TRANSITIONS[status]:
+            return status, f"Invalid status transition {status} -> {new_status}"
+        status = new_status
+    return status, None
+
+
+def apply_shard_events(merged, stats, now):
+    """
+    Apply coalesced progress keyed on (job_id, shard_index) and roll the result up
+    into the parent jobs. Call inside a transaction.
+    Returns (updated, rejected, ids of shards that completed).
+    """
+    shards = {
+        (shard['job_id'], shard['index']): shard
+        for shard in JobShard.objects.filter(
+            job_id__in={job_id for job_id, _ in merged},
+            index__in={index for _, index in merged},
+        ).values('id', 'job_id', 'index', 'status', 'job__user_id', 'job__created_at')
+    }
+
+    rejected = []
+    updated = 0
+    job_deltas = Counter()
+    touched_jobs = set()
+    completed_shards = []
+
+    for (job_id, index), update in merged.items():
+        shard = shards.get((job_id, index))
+        if shard is None:
+            rejected.append({"job_id": str(job_id), "shard_index": index, "error": "Shard not found."})
+            continue
+        current = shard['status']
+
+        final_status, error = resolve_status(current, update["statuses"])
+        if error is None and final_status == current and current in Job.FINISHED_STATUSES:
+            error = LATE_EVENT_ERROR
+        if error:
+            # Nothing from a rejected update is applied, so resending it cannot double-count
+            rejected.append({"job_id": str(job_id), "shard_index": index, "error": error})
+            continue
+
+        fields = {
+            "files_processed": F('files_processed') + update["files_delta"],
+            "updated_at": now,
+        }
+        if update["error_message"]:
+            fields["error_message"] = update["error_message"]
+        if final_status != current:
+            fields["status"] = final_status
+            if "PROCESSING" in update["statuses"]:
+                fields["started_at"] = Coalesce(F('started_at'), Value(now, output_field=models.DateTimeField()))
+            if final_status in Job.FINISHED_STATUSES:
+                fields["completed_at"] = now
+
+        if JobShard.objects.filter(id=shard['id'], status=current).update(**fields):
+            updated += 1
+            job_deltas[job_id] += update["files_delta"]
+            stats.files_processed(shard['job__user_id'], stats_day(shard['job__created_at']), update["files_delta"])
+            if final_status != current:
+                touched_jobs.add(job_id)
+                if final_status == "COMPLETED":
+                    completed_shards.append(shard['id'])
+        else:
+            rejected.append({
+                "job_id": str(job_id),
+                "shard_index": index,
+                "error": "Shard status changed concurrently; resend the event.",
+            })
+
+    # Parent jobs with the same increment share one UPDATE, as for job-level progress
+    by_delta = defaultdict(list)
+    for job_id, delta in job_deltas.items():
+        if delta:
+            by_delta[delta].append(job_id)
+    for delta, job_ids in by_delta.items():
+        Job.objects.filter(id__in=job_ids).update(files_processed=F('files_processed') + delta, updated_at=now)
+
+    if touched_jobs:
+        rollup_jobs(touched_jobs, stats, now)
+
+    return updated, rejected, completed_shards
+
+
+def apply_progress_events(events):
+    """
+    Apply a batch of validated progress events with atomic F() increments.
+    Status changes are compare-and-set on the status read at the start of the batch,
+    so a concurrent change is reported back instead of being overwritten.
+    """
+    shard_events = [event for event in events if event.get("shard_index") is not None]
+    merged = coalesce_events([event for event in events if event.get("shard_index") is None])
+    current_jobs = {
+        job['id']: job
+        for job in Job.objects.filter(id__in=merged.keys()).values('id', 'status', 'user_id', 'created_at', 'started_at')
+    }
+    now = timezone.now()
+    stats = StatsDelta()
+
+    rejected = []
+    updated = 0
+    progress_only = defaultdict(list)
+    completed_jobs, completed_shards = [], []
+
+    with transaction.atomic():
+        for job_id, update in merged.items():
+            job = current_jobs.get(job_id)
+            if job is None:
+                rejected.append({"job_id": str(job_id), "error": "Job not found."})
+                continue
+            current = job['status']
+            user_id, day = job['user_id'], stats_day(job['created_at'])
+
+            final_status, error = resolve_status(current, update["statuses"])
+            if error is None and final_status == current and current in Job.FINISHED_STATUSES:
+                error = LATE_EVENT_ERROR
+            if error:
+                # Nothing from a rejected update is applied, so resending it cannot double-count
+                rejected.append({"job_id": str(job_id), "error": error})
+                continue
+
+            if final_status == current and not update["error_message"]:
+                if update["files_delta"] or update["total_files"] is not None:
+                    progress_only[(update["files_delta"], update["total_files"])].append((job_id, user_id, day))
+                continue
+
+            fields = {
+                "files_processed": F('files_processed') + update["files_delta"],
+                "updated_at": now,
+            }
+            if update["total_files"] is not None:
+                fields["total_files"] = update["total_files"]
+            if update["error_message"]:
+                fields["error_message"] = update["error_message"]
+            if final_status != current:
+                fields["status"] = final_status
+                if "PROCESSING" in update["statuses"]:
+                    # Also covers PENDING -> PROCESSING -> COMPLETED reported in one callback
+                    fields["started_at"] = Coalesce(F('started_at'), Value(now, output_field=models.DateTimeField()))
+                if final_status in Job.FINISHED_STATUSES:
+                    fields["completed_at"] = now
+                elif final_status == "PROCESSING":
+                    fields["completed_at"] = None
+
+            if Job.objects.filter(id=job_id, status=current).update(**fields):
+                updated += 1
+                stats.files_processed(user_id, day, update["files_delta"])
+                stats.status_changed(user_id, day, current, final_status)
+                if final_status == "COMPLETED" and final_status != current:
+                    # started_at is set to now above when this callback also reported PROCESSING
+                    started_at = job['started_at'] or (now if "PROCESSING" in update["statuses"] else None)
+                    stats.completed(user_id, day, started_at, now)
+                    completed_jobs.append(job_id)
+            else:
+                rejected.append({"job_id": str(job_id), "error": "Job status changed concurrently; resend the event."})
+
+        for (files_delta, total_files), jobs in progress_only.items():
+            fields = {
+                "files_processed": F('files_processed') + files_delta,
+                "updated_at": now,
+            }
+            if total_files is not None:
+                fields["total_files"] = total_files
+            job_ids = [job_id for job_id, _, _ in jobs]
+            count = Job.objects.filter(id__in=job_ids).exclude(status__in=Job.FINISHED_STATUSES).update(**fields)
+            applied = set(job_ids)
+            if count < len(job_ids):
+                # Some jobs finished after they were read; the UPDATE locked the rest
+                applied = set(
+                    Job.objects.filter(id__in=job_ids).exclude(status__in=Job.FINISHED_STATUSES).values_list('id', flat=True)
+                )
+            for job_id, user_id, day in jobs:
+                if job_id in applied:
+                    stats.files_processed(user_id, day, files_delta)
+                else:
+                    rejected.append({"job_id": str(job_id), "error": LATE_EVENT_ERROR})
+            updated += count
+
+        if shard_events:
+            shard_updates = coalesce_events(shard_events, key=lambda event: (event["job_id"], event["shard_index"]))
+            shard_updated, shard_rejected, completed_shards = apply_shard_events(shard_updates, stats, now)
+            updated += shard_updated
+            rejected.extend(shard_rejected)
+
+        if completed_jobs or completed_shards:
+            record_completed(job_ids=completed_jobs, shard_ids=completed_shards)
+
+        stats.apply()
+
+    return {
+        "events": len(events),
+        "jobs": len(merged) + len({event["job_id"] for event in shard_events}),
+        "updated": updated,
+        "rejected": rejected,
+    }
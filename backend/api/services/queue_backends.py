@@ -0,0 +1,329 @@
+# queue_backends.py
+# Job queue backends behind one interface: enqueue, batch enqueue, claim, ack and
+# visibility-timeout changes. The outbox dispatcher enqueues through whichever backend
+# JOB_QUEUE_BACKEND selects; workers that cannot reach the backend directly claim and
+# ack through /api/worker/queue/.
+#   sqs      - Amazon SQS (region and URL from settings)
+#   postgres - the app database, claimed with SELECT ... FOR UPDATE SKIP LOCKED
+#   memory   - process-local test double: only code running in the same process as the
+#              enqueue sees the messages, so it suits tests that dispatch and claim in
+#              one process, not a deployment where dispatch_outbox runs separately
+
+import abc
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import QueueMessage
+
+# SQS caps SendMessageBatch and ReceiveMessage at 10 messages per call
+SQS_MAX_BATCH_SIZE = 10
+
+
+class ReceivedMessage:
+    """
+    A claimed message. The receipt is what ack() and change_visibility() take.
+    """
+
+    def __init__(self, message_id, receipt, body, receive_count):
+        self.message_id = str(message_id)
+        self.receipt = str(receipt)
+        self.body = body
+        self.receive_count = receive_count
+
+    def to_dict(self):
+        return {
+            "message_id": self.message_id,
+            "receipt": self.receipt,
+            "body": self.body,
+            "receive_count": self.receive_count,
+        }
+
+
+class QueueBackend(abc.ABC):
+    """
+    Interface shared by the queue backends.
+    """
+    name = None
+
+    def enqueue(self, payload):
+        """
+        Enqueue one message. Raises on failure.
+        """
+        error = self.enqueue_batch([payload])[0]
+        if error is not None:
+            raise RuntimeError(error)
+
+    @abc.abstractmethod
+    def enqueue_batch(self, payloads):
+        """
+        Enqueue many messages. Returns a list aligned with payloads: None for each
+        enqueued message, else the error message.
+        """
+
+    @abc.abstractmethod
+    def claim(self, max_messages=1, visibility_timeout=None):
+        """
+        Take up to max_messages messages, hiding them from other consumers for
+        visibility_timeout seconds unless acked first.
+        """
+
+    @abc.abstractmethod
+    def ack(self, receipt):
+        """
+        Delete a claimed message. Returns False if the receipt is unknown or expired.
+        """
+
+    @abc.abstractmethod
+    def change_visibility(self, receipt, visibility_timeout):
+        """
+        Extend (or end, with 0) a claimed message's visibility timeout.
+        Returns False if the receipt is unknown or expired.
+        """
+
+    @abc.abstractmethod
+    def depth(self):
+        """
+        Number of messages in the queue, visible or not (approximate for SQS).
+        """
+
+
+class SQSQueueBackend(QueueBackend):
+    name = "sqs"
+
+    def __init__(self, queue_url=None, region=None, client=None):
+        self.region = region or settings.SQS_REGION
+        self.queue_url = queue_url or settings.SQS_QUEUE_URL or (
+            f"https://sqs.{self.region}.amazonaws.com/{settings.AWS_ACCOUNT_ID}/{settings.SQS_QUEUE_NAME}"
+        )
+        # Client construction is expensive, so one is kept per backend
+        if client is None:
+            import boto3
+
+            client = boto3.client("sqs", region_name=self.region)
+        self.client = client
+
+    def enqueue_batch(self, payloads):
+        errors = [None] * len(payloads)
+
+        for start in range(0, len(payloads), SQS_MAX_BATCH_SIZE):
+            chunk = payloads[start:start + SQS_MAX_BATCH_SIZE]
+            entries = [
+                {"Id": str(start + i), "MessageBody": json.dumps(payload)}
+                for i, payload in enumerate(chunk)
+            ]
+
+            try:
+                response = self.client.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except Exception as e:
+                for i in range(start, start + len(chunk)):
+                    errors[i] = str(e)
+                continue
+
+            for entry in response.get("Failed", []):
+                errors[int(entry["Id"])] = entry.get("Message") or entry.get("Code", "Unknown error")
+
+        return errors
+
+    def claim(self, max_messages=1, visibility_timeout=None):
+        response = self.client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=max(1, min(max_messages, SQS_MAX_BATCH_SIZE)),
+            VisibilityTimeout=int(visibility_timeout or settings.JOB_QUEUE_VISIBILITY_TIMEOUT),
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        return [
+            ReceivedMessage(
+                message["MessageId"],
+                message["ReceiptHandle"],
+                json.loads(message["Body"]),
+                int(message.get("Attributes", {}).get("ApproximateReceiveCount", 1)),
+            )
+            for message in response.get("Messages", [])
+        ]
+
+    def ack(self, receipt):
+        try:
+            self.client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+        except self.client.exceptions.ReceiptHandleIsInvalid:
+            return False
+        return True
+
+    def change_visibility(self, receipt, visibility_timeout):
+        try:
+            self.client.change_message_visibility(
+                QueueUrl=self.queue_url, ReceiptHandle=receipt, VisibilityTimeout=int(visibility_timeout)
+            )
+        except (self.client.exceptions.ReceiptHandleIsInvalid, self.client.exceptions.MessageNotInflight):
+            return False
+        return True
+
+    def depth(self):
+        attributes = self.client.get_queue_attributes(
+            QueueUrl=self.queue_url,
+            AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+        )["Attributes"]
+        return int(attributes["ApproximateNumberOfMessages"]) + int(attributes["ApproximateNumberOfMessagesNotVisible"])
+
+
+class PostgresQueueBackend(QueueBackend):
+    name = "postgres"
+
+    def __init__(self, queue="jobs"):
+        self.queue = queue
+
+    def enqueue_batch(self, payloads):
+        try:
+            QueueMessage.objects.bulk_create(
+                [QueueMessage(queue=self.queue, body=payload) for payload in payloads],
+                batch_size=500,
+            )
+        except Exception as e:
+            return [str(e)] * len(payloads)
+        return [None] * len(payloads)
+
+    def claim(self, max_messages=1, visibility_timeout=None):
+        now = timezone.now()
+        hidden_until = now + timedelta(seconds=visibility_timeout or settings.JOB_QUEUE_VISIBILITY_TIMEOUT)
+
+        with transaction.atomic():
+            messages = list(
+                QueueMessage.objects
+                .select_for_update(skip_locked=True)
+                .filter(queue=self.queue, visible_at__lte=now)
+                .order_by('visible_at', 'id')[:max_messages]
+            )
+            for message in messages:
+                message.receipt = uuid.uuid4()
+                message.visible_at = hidden_until
+                message.receive_count += 1
+            QueueMessage.objects.bulk_update(messages, ['receipt', 'visible_at', 'receive_count'])
+
+        return [
+            ReceivedMessage(message.id, message.receipt, message.body, message.receive_count)
+            for message in messages
+        ]
+
+    def _receipt(self, receipt):
+        try:
+            return uuid.UUID(str(receipt))
+        except ValueError:
+            return None
+
+    def ack(self, receipt):
+        receipt = self._receipt(receipt)
+        if receipt is None:
+            return False
+        deleted, _ = QueueMessage.objects.filter(queue=self.queue, receipt=receipt).delete()
+        return bool(deleted)
+
+    def change_visibility(self, receipt, visibility_timeout):
+        receipt = self._receipt(receipt)
+        if receipt is None:
+            return False
+        return bool(
+            QueueMessage.objects.filter(queue=self.queue, receipt=receipt).update(
+                visible_at=timezone.now() + timedelta(seconds=visibility_timeout)
+            )
+        )
+
+    def depth(self):
+        return QueueMessage.objects.filter(queue=self.queue).count()
+
+
+class InMemoryQueueBackend(QueueBackend):
+    """
+    Thread-safe, process-local queue for tests. Only the process that enqueued a message
+    can claim it, and messages are lost when that process exits.
+    """
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # message_id -> [body, visible_at (monotonic), receipt, receive_count], in enqueue order
+        self._messages = OrderedDict()
+        self._receipts = {}
+
+    def enqueue_batch(self, payloads):
+        with self._lock:
+            for payload in payloads:
+                self._messages[uuid.uuid4().hex] = [payload, 0.0, None, 0]
+        return [None] * len(payloads)
+
+    def claim(self, max_messages=1, visibility_timeout=None):
+        timeout = visibility_timeout or settings.JOB_QUEUE_VISIBILITY_TIMEOUT
+        now = time.monotonic()
+        claimed = []
+        with self._lock:
+            for message_id, entry in self._messages.items():
+                if len(claimed) >= max_messages:
+                    break
+                if entry[1] > now:
+                    continue
+                if entry[2] is not None:
+                    self._receipts.pop(entry[2], None)
+                receipt = uuid.uuid4().hex
+                entry[1], entry[2] = now + timeout, receipt
+                entry[3] += 1
+                self._receipts[receipt] = message_id
+                claimed.append(ReceivedMessage(message_id, receipt, entry[0], entry[3]))
+        return claimed
+
+    def ack(self, receipt):
+        with self._lock:
+            message_id = self._receipts.pop(receipt, None)
+            if message_id is None:
+                return False
+            del self._messages[message_id]
+        return True
+
+    def change_visibility(self, receipt, visibility_timeout):
+        with self._lock:
+            message_id = self._receipts.get(receipt)
+            if message_id is None:
+                return False
+            self._messages[message_id][1] = time.monotonic() + visibility_timeout
+        return True
+
+    def depth(self):
+        with self._lock:
+            return len(self._messages)
+
+
+QUEUE_BACKENDS = {
+    backend.name: backend
+    for backend in (SQSQueueBackend, PostgresQueueBackend, InMemoryQueueBackend)
+}
+
+_backend = None
+
+
+def get_queue_backend():
+    """
+    Return the process-wide backend selected by JOB_QUEUE_BACKEND.
+    """
+    global _backend
+    if _backend is None:
+        try:
+            backend_class = QUEUE_BACKENDS[settings.JOB_QUEUE_BACKEND]
+        except KeyError:
+            raise ValueError(
+                f"Unknown JOB_QUEUE_BACKEND {settings.JOB_QUEUE_BACKEND!r}; use one of {', '.join(QUEUE_BACKENDS)}"
+            )
+        _backend = backend_class()
+    return _backend
+
+
+def set_queue_backend(backend):
+    """
+    Replace the process-wide backend (e.g. an InMemoryQueueBackend in tests or benchmarks).
+    """
+    global _backend
+    _backend = backend
@@ -0,0 +1,141 @@
+# retry_scheduler.py
+# Automatic retries of FAILED_RETRYABLE jobs (manage.py retry_jobs).
+# Newly failed jobs are given a next_retry_at with exponential backoff and jitter;
+# due jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several schedulers can
+# run at once, and re-queued through the outbox in one batch. Sharded jobs only re-queue
+# their failed shards. Re-queued jobs go through fair-share admission again.
+# Jobs out of attempts become FAILED_PERMANENT.
+
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Job, JobOutbox, JobShard
+from .job_queue import build_job_payload
+from .job_stats import StatsDelta, stats_day
+from .sharding import jobs_with_running_shards, requeue_shards, rollup_jobs
+
+
+def retry_delay(retry_count):
+    """
+    Exponential backoff with "equal jitter": half the delay is fixed, half is random,
+    so jobs that failed together do not all come back at the same moment.
+    """
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** retry_count)
+    return timedelta(seconds=delay / 2 + random.uniform(0, delay / 2))
+
+
+def _unscheduled():
+    # A next_retry_at older than the latest failure belongs to an earlier failure
+    return Q(next_retry_at__isnull=True) | Q(next_retry_at__lt=F('completed_at'))
+
+
+def schedule_retries(limit=100):
+    """
+    Set next_retry_at on up to limit failed jobs that have none yet. Returns the count.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(_unscheduled(), status="FAILED_RETRYABLE")
+            .only('id', 'retry_count', 'completed_at')
+            .order_by('completed_at')[:limit]
+        )
+        for job in jobs:
+            job.next_retry_at = (job.completed_at or now) + retry_delay(job.retry_count)
+        Job.objects.bulk_update(jobs, ['next_retry_at'])
+    return len(jobs)
+
+
+def retry_due_jobs(limit=100, max_attempts=None):
+    """
+    Re-queue up to limit jobs whose next_retry_at has passed.
+    Returns a dict with retried and exhausted counts.
+    """
+    max_attempts = max_attempts or settings.JOB_RETRY_MAX_ATTEMPTS
+    now = timezone.now()
+    stats = StatsDelta()
+    result = {"retried": 0, "exhausted": 0}
+
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="FAILED_RETRYABLE", next_retry_at__lte=now)
+            .filter(Q(completed_at__isnull=True) | Q(next_retry_at__gte=F('completed_at')))
+            .order_by('next_retry_at')[:limit]
+        )
+        if not jobs:
+            return result
+
+        exhausted = [job for job in jobs if job.retry_count >= max_attempts]
+        due = [job for job in jobs if job.retry_count < max_attempts]
+
+        for job in exhausted:
+            if Job.objects.filter(id=job.id, status="FAILED_RETRYABLE").update(
+                status="FAILED_PERMANENT",
+                error_message=f"Gave up after {job.retry_count} retries: {job.error_message or 'unknown error'}",
+                next_retry_at=None,
+                updated_at=now,
+            ):
+                stats.status_changed(job.user_id, stats_day(job.created_at), "FAILED_RETRYABLE", "FAILED_PERMANENT")
+                result["exhausted"] += 1
+
+        failed_shards = defaultdict(list)
+        for shard in JobShard.objects.filter(job__in=due, status="FAILED_RETRYABLE").defer('data'):
+            failed_shards[shard.job_id].append(shard)
+        sharded_ids = set(
+            JobShard.objects.filter(job__in=due).values_list('job_id', flat=True).distinct()
+        )
+
+        # Sharded jobs: re-queue only the shards that failed
+        sharded = [job.id for job in due if job.id in sharded_ids]
+        # As in retry_shard, a job with a shard still in flight keeps its admission
+        running = jobs_with_running_shards(sharded)
+        for job in due:
+            if job.id in sharded_ids:
+                requeue_shards(job, failed_shards[job.id], stats, now)
+        if sharded:
+            Job.objects.filter(id__in=sharded).update(retry_count=F('retry_count') + 1, next_retry_at=None)
+            Job.objects.filter(id__in=sharded).exclude(id__in=running).update(admitted_at=None)
+            rollup_jobs(sharded, stats, now)
+            result["retried"] += len(sharded)
+
+        # Unsharded jobs run again from the start with their last queue message
+        whole = [job for job in due if job.id not in sharded_ids]
+        payloads = dict(
+            JobOutbox.objects
+            .filter(job__in=whole, shard__isnull=True)
+            .order_by('job_id', 'id')
+            .values_list('job_id', 'payload')
+        )
+        messages = []
+        for job in whole:
+            if not Job.objects.filter(id=job.id, status="FAILED_RETRYABLE").update(
+                status="PENDING",
+                retry_count=F('retry_count') + 1,
+                next_retry_at=None,
+                admitted_at=None,
+                files_processed=0,
+                error_message=None,
+                completed_at=None,
+                updated_at=now,
+            ):
+                continue
+            day = stats_day(job.created_at)
+            stats.status_changed(job.user_id, day, "FAILED_RETRYABLE", "PENDING")
+            stats.files_processed(job.user_id, day, -job.files_processed)
+            messages.append(JobOutbox(job=job, payload=payloads.get(job.id) or build_job_payload(job, {})))
+            result["retried"] += 1
+        JobOutbox.objects.bulk_create(messages)
+
+        stats.apply()
+
+    return result
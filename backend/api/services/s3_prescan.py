@@ -0,0 +1,215 @@
+# s3_prescan.py
+# Pre-scan of a job's source prefix at submission time.
+# The prefix is listed with the connection's IAM role, the key space is split on "/"
+# boundaries so sub-prefixes are listed in parallel with paginated ListObjectsV2, and
+# the result is stored as a compact manifest (key, size, ETag) that sets the job's
+# total_files / total_bytes before any worker starts. Jobs over the shard budget are
+# then split into per-shard queue messages (see sharding.py). Objects an earlier job
+# already processed with the same options are left out (see processed_index.py).
+
+import gzip
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from api.models import Job, JobManifest, JobOutbox
+from .processed_index import complete_unchanged_job, filter_unprocessed
+from .sharding import shard_job
+
+logger = logging.getLogger(__name__)
+
+
+def get_connection_s3_client(connection):
+    """
+    S3 client acting as the connection's IAM role.
+    AWS_S3_ENDPOINT_URL points the client at a local S3 stand-in; role assumption is
+    skipped when S3_PRESCAN_ASSUME_ROLE is off.
+    """
+    import boto3
+
+    region = connection.region or "us-east-1"
+    credentials = {}
+    if settings.S3_PRESCAN_ASSUME_ROLE:
+        sts = boto3.client("sts", region_name=region)
+        assumed = sts.assume_role(
+            RoleArn=connection.aws_role_arn,
+            RoleSessionName=f"dicomanon-prescan-{connection.id}"[:64],
+        )["Credentials"]
+        credentials = {
+            "aws_access_key_id": assumed["AccessKeyId"],
+            "aws_secret_access_key": assumed["SecretAccessKey"],
+            "aws_session_token": assumed["SessionToken"],
+        }
+
+    return boto3.client(
+        "s3",
+        region_name=region,
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+        **credentials,
+    )
+
+
+def _list_all(s3, bucket, prefix):
+    """
+    Recursively list every object under prefix with paginated ListObjectsV2.
+    """
+    objects = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, PaginationConfig={"PageSize": 1000}):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith("/"):
+                objects.append((obj["Key"], obj["Size"], obj["ETag"].strip('"')))
+    return objects
+
+
+def _split_prefix(s3, bucket, prefix, target_partitions, max_depth=2):
+    """
+    Split a prefix into sub-prefixes on "/" boundaries until there are at least
+    target_partitions of them (or max_depth is reached).
+    Returns (objects directly under the split levels, sub-prefixes to list recursively).
+    """
+    direct = []
+    partitions = [prefix]
+    for _ in range(max_depth):
+        if len(partitions) >= target_partitions:
+            break
+        next_partitions = []
+        paginator = s3.get_paginator("list_objects_v2")
+        for part in partitions:
+            for page in paginator.paginate(Bucket=bucket, Prefix=part, Delimiter="/"):
+                for obj in page.get("Contents", []):
+                    if not obj["Key"].endswith("/"):
+                        direct.append((obj["Key"], obj["Size"], obj["ETag"].strip('"')))
+                next_partitions.extend(p["Prefix"] for p in page.get("CommonPrefixes", []))
+        partitions = next_partitions
+        if not partitions:
+            break
+    return direct, partitions
+
+
+def scan_prefix(s3, bucket, prefix, workers=None):
+    """
+    List every object under bucket/prefix, fanning sub-prefixes out across a thread pool.
+    Returns [(key, size, etag), ...] sorted by key.
+    """
+    workers = workers or settings.S3_PRESCAN_WORKERS
+    direct, partitions = _split_prefix(s3, bucket, prefix or "", target_partitions=workers)
+
+    objects = list(direct)
+    if partitions:
+        # boto3 clients are thread-safe, so the pool shares one
+        with ThreadPoolExecutor(max_workers=min(workers, len(partitions))) as pool:
+            for listed in pool.map(lambda part: _list_all(s3, bucket, part), partitions):
+                objects.extend(listed)
+
+    objects.sort()
+    return objects
+
+
+def encode_manifest(objects):
+    lines = "\n".join(json.dumps([key, size, etag], separators=(",", ":")) for key, size, etag in objects)
+    return gzip.compress(lines.encode("utf-8"), compresslevel=6)
+
+
+def decode_manifest(data):
+    if not data:
+        return []
+    text = gzip.decompress(bytes(data)).decode("utf-8")
+    return [tuple(json.loads(line)) for line in text.splitlines() if line]
+
+
+def build_manifest(job, client_factory=None):
+    """
+    Scan a job's source prefix and store its manifest; sets total_files and total_bytes
+    (counting only objects not already processed, unless the job is force_full).
+    A failed scan, index lookup or shard split is recorded on the manifest so the job is
+    still dispatched (workers then list the prefix themselves, as before pre-scanning
+    existed) and the pre-scanner moves on to the next job.
+    """
+    started = time.monotonic()
+    try:
+        s3 = (client_factory or get_connection_s3_client)(job.connection)
+        objects = scan_prefix(s3, job.connection.bucket_name, job.source_prefix)
+        objects, skipped, total_bytes = _store_manifest(job, objects)
+    except Exception as e:
+        logger.warning("Pre-scan failed for job %s: %s", job.id, e, extra={"job_id": str(job.id)})
+        JobManifest.objects.filter(job=job).update(
+            status="FAILED",
+            data=None,
+            error_message=str(e),
+            completed_at=timezone.now(),
+        )
+        return None
+
+    logger.info(
+        "Pre-scanned job",
+        extra={
+            "job_id": str(job.id),
+            "files": len(objects),
+            "bytes": total_bytes,
+            "skipped": skipped,
+            "seconds": round(time.monotonic() - started, 2),
+        },
+    )
+    return objects
+
+
+def _store_manifest(job, objects):
+    skipped = 0
+    if not job.force_full:
+        objects, skipped = filter_unprocessed(job, objects)
+
+    total_bytes = sum(size for _, size, _ in objects)
+    with transaction.atomic():
+        JobManifest.objects.filter(job=job).update(
+            status="READY",
+            data=encode_manifest(objects),
+            file_count=len(objects),
+            total_bytes=total_bytes,
+            error_message=None,
+            completed_at=timezone.now(),
+        )
+        Job.objects.filter(id=job.id).update(
+            total_files=len(objects),
+            total_bytes=total_bytes,
+            files_skipped=skipped,
+            updated_at=timezone.now(),
+        )
+        if skipped and not objects:
+            complete_unchanged_job(job)
+        else:
+            shard_job(job, objects)
+    return objects, skipped, total_bytes
+
+
+def claim_jobs_for_prescan(limit, stale_after):
+    """
+    Claim up to limit jobs waiting on a manifest by creating (or re-taking stale)
+    SCANNING manifests. Safe to run in several processes at once.
+    """
+    now = timezone.now()
+    waiting_message = JobOutbox.objects.filter(job_id=OuterRef('id'), status="PENDING", requires_manifest=True)
+    manifest = JobManifest.objects.filter(job_id=OuterRef('id'))
+    stale_manifest = manifest.filter(status="SCANNING", started_at__lt=now - stale_after)
+
+    with transaction.atomic():
+        jobs = list(
+            Job.objects
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(Exists(waiting_message))
+            .filter(Q(~Exists(manifest)) | Q(Exists(stale_manifest)))
+            .select_related('connection')
+            .order_by('created_at')[:limit]
+        )
+        for job in jobs:
+            JobManifest.objects.update_or_create(
+                job=job,
+                defaults={"status": "SCANNING", "started_at": now, "data": None, "completed_at": None},
+            )
+    return jobs
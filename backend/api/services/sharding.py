@@ -0,0 +1,229 @@
+# sharding.py
+# Fan-out of large jobs into shards.
+# Once a job's manifest is ready, a job over the file-count or byte budget is split into
+# contiguous key ranges, each sent as its own queue message. Workers report progress per
+# shard; shard counters and statuses roll up into the parent Job, and a failed shard can
+# be re-queued on its own without redoing the rest of the job.
+
+import logging
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from api.models import Job, JobOutbox, JobShard
+from .job_stats import StatsDelta, stats_day
+
+logger = logging.getLogger(__name__)
+
+
+def plan_shards(objects, max_files=None, max_bytes=None):
+    """
+    Split a key-sorted manifest into contiguous slices within both budgets.
+    Returns [] when the whole job fits in one message.
+    """
+    max_files = max_files or settings.JOB_SHARD_MAX_FILES
+    max_bytes = max_bytes or settings.JOB_SHARD_MAX_BYTES
+    if len(objects) <= max_files and sum(size for _, size, _ in objects) <= max_bytes:
+        return []
+
+    shards = []
+    current, current_bytes = [], 0
+    for obj in objects:
+        # A single object larger than the byte budget still gets a shard of its own
+        if current and (len(current) >= max_files or current_bytes + obj[1] > max_bytes):
+            shards.append(current)
+            current, current_bytes = [], 0
+        current.append(obj)
+        current_bytes += obj[1]
+    if current:
+        shards.append(current)
+    return shards
+
+
+def shard_job(job, objects):
+    """
+    Replace a job's pending queue message with one message per shard.
+    Call inside the transaction that marks the job's manifest READY.
+    Returns the created shards ([] if the job was small enough to run whole).
+    """
+    # Imported here: s3_prescan imports this module
+    from .s3_prescan import encode_manifest
+
+    slices = plan_shards(objects)
+    if not slices:
+        return []
+
+    original = JobOutbox.objects.filter(job=job, status="PENDING").order_by('id').first()
+    if original is None:
+        return []
+
+    shards = JobShard.objects.bulk_create([
+        JobShard(
+            job=job,
+            index=index,
+            data=encode_manifest(chunk),
+            file_count=len(chunk),
+            total_bytes=sum(size for _, size, _ in chunk),
+            first_key=chunk[0][0],
+            last_key=chunk[-1][0],
+        )
+        for index, chunk in enumerate(slices)
+    ])
+    JobOutbox.objects.filter(id=original.id).update(status="SUPERSEDED")
+    JobOutbox.objects.bulk_create([
+        JobOutbox(job=job, shard=shard, payload=shard_payload(original.payload, shard, len(shards)))
+        for shard in shards
+    ])
+
+    logger.info("Split job into shards", extra={"job_id": str(job.id), "shards": len(shards)})
+    return shards
+
+
+def shard_payload(base_payload, shard, shard_count):
+    return {
+        **base_payload,
+        "shard": {
+            "index": shard.index,
+            "count": shard_count,
+            "totalFiles": shard.file_count,
+            "totalBytes": shard.total_bytes,
+            "firstKey": shard.first_key,
+            "lastKey": shard.last_key,
+        },
+    }
+
+
+def derive_job_status(counts):
+    """
+    Parent status from its shards' status counts.
+    A job is finished only when no shard is pending or running; any retryable shard
+    failure keeps the whole job retryable.
+    """
+    total = sum(counts.values())
+    if counts["COMPLETED"] == total:
+        return "COMPLETED"
+    if counts["PENDING"] + counts["PROCESSING"] == 0:
+        return "FAILED_RETRYABLE" if counts["FAILED_RETRYABLE"] else "FAILED_PERMANENT"
+    if counts["PENDING"] == total:
+        return "PENDING"
+    return "PROCESSING"
+
+
+def rollup_jobs(job_ids, stats, now):
+    """
+    Bring parent job statuses in line with their shards. Returns the number of jobs changed.
+    """
+    counts = defaultdict(Counter)
+    for row in (
+        JobShard.objects.filter(job_id__in=job_ids)
+        .order_by()
+        .values('job_id', 'status')
+        .annotate(n=Count('id'))
+    ):
+        counts[row['job_id']][row['status']] += row['n']
+
+    jobs = Job.objects.filter(id__in=counts).values('id', 'status', 'user_id', 'created_at', 'started_at')
+    changed = 0
+    for job in jobs:
+        job_counts = counts[job['id']]
+        new_status = derive_job_status(job_counts)
+        if new_status == job['status']:
+            continue
+
+        fields = {"status": new_status, "updated_at": now}
+        if new_status in Job.FINISHED_STATUSES:
+            fields["completed_at"] = now
+            failed = job_counts["FAILED_RETRYABLE"] + job_counts["FAILED_PERMANENT"]
+            fields["error_message"] = (
+                f"{failed} of {sum(job_counts.values())} shards failed" if failed else None
+            )
+        else:
+            fields["completed_at"] = None
+            if new_status == "PROCESSING":
+                fields["started_at"] = Coalesce(F('started_at'), Value(now, output_field=models.DateTimeField()))
+
+        if Job.objects.filter(id=job['id'], status=job['status']).update(**fields):
+            changed += 1
+            day = stats_day(job['created_at'])
+            stats.status_changed(job['user_id'], day, job['status'], new_status)
+            if new_status == "COMPLETED":
+                stats.completed(job['user_id'], day, job['started_at'], now)
+    return changed
+
+
+def requeue_shards(job, shards, stats, now):
+    """
+    Reset failed shards of one job to PENDING, take their processed files back off the
+    job and write a fresh queue message for each. Call inside a transaction.
+    Returns the number of shards re-queued; shards whose status changed meanwhile are skipped.
+    """
+    requeued = []
+    for shard in shards:
+        if JobShard.objects.filter(id=shard.id, status=shard.status).update(
+            status="PENDING",
+            files_processed=0,
+            retry_count=F('retry_count') + 1,
+            error_message=None,
+            started_at=None,
+            completed_at=None,
+            updated_at=now,
+        ):
+            requeued.append(shard)
+    if not requeued:
+        return 0
+
+    files_delta = sum(shard.files_processed for shard in requeued)
+    if files_delta:
+        Job.objects.filter(id=job.id).update(files_processed=F('files_processed') - files_delta)
+        stats.files_processed(job.user_id, stats_day(job.created_at), -files_delta)
+
+    # Re-send each shard's most recent message
+    payloads = {}
+    for shard_id, payload in (
+        JobOutbox.objects.filter(shard__in=requeued).order_by('shard_id', 'id').values_list('shard_id', 'payload')
+    ):
+        payloads[shard_id] = payload
+    JobOutbox.objects.bulk_create([
+        JobOutbox(job=job, shard=shard, payload=payloads[shard.id]) for shard in requeued
+    ])
+    return len(requeued)
+
+
+def jobs_with_running_shards(job_ids):
+    """
+    Ids of the given jobs with a shard still PENDING or PROCESSING. Such a job is still in
+    flight, so re-queueing another of its shards keeps its fair-share admission.
+    """
+    return set(
+        JobShard.objects.filter(job_id__in=job_ids, status__in=("PENDING", "PROCESSING"))
+        .values_list('job_id', flat=True)
+        .distinct()
+    )
+
+
+def retry_shard(shard):
+    """
+    Re-queue one failed shard without redoing the rest of its job.
+    Returns False if the shard is no longer failed.
+    """
+    now = timezone.now()
+    stats = StatsDelta()
+
+    with transaction.atomic():
+        job = shard.job
+        running = jobs_with_running_shards([job.id])
+        if not requeue_shards(job, [shard], stats, now):
+            return False
+        fields = {"retry_count": F('retry_count') + 1}
+        if not running:
+            # Nothing of the job is in flight: the shard waits for admission like a new job
+            fields["admitted_at"] = None
+        Job.objects.filter(id=job.id).update(**fields)
+        rollup_jobs([job.id], stats, now)
+        stats.apply()
+
+    return True
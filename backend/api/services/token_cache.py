@@ -0,0 +1,110 @@
+# token_cache.py
+# Bounded, TTL-aware in-process cache of already verified Cognito tokens.
+# Tokens are keyed on their SHA-256 digest so raw bearer tokens never sit in memory
+# as dictionary keys, and every entry expires no later than the token's own `exp`.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import TOKEN_CACHE_EVENTS
+
+
+class VerifiedTokenCache:
+    """
+    LRU cache mapping token digests to the verified user ID (sub).
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        """
+        Return the cached user ID for a token, or None on a miss or expired entry.
+        """
+        key = self.digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                TOKEN_CACHE_EVENTS.inc(event="miss")
+                return None
+
+            user_id, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                TOKEN_CACHE_EVENTS.inc(event="expiration")
+                TOKEN_CACHE_EVENTS.inc(event="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            TOKEN_CACHE_EVENTS.inc(event="hit")
+            return user_id
+
+    def peek(self, token):
+        """
+        Like get, but leaves the hit/miss counters and LRU order alone.
+        """
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def set(self, token, user_id, exp=None):
+        """
+        Cache a verified token until min(now + ttl, exp).
+        """
+        if self.maxsize <= 0:
+            return
+
+        now = time.time()
+        expires_at = now + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (user_id, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                TOKEN_CACHE_EVENTS.inc(event="eviction")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,91 @@
+# worker_startup.py
+# Worker cold start under gunicorn's preload mode (GUNICORN_PRELOAD=true, see gunicorn.conf.py).
+#
+# Heavy dependencies (boto3, requests, jwt) are imported on first use, so a worker that
+# boots on its own only pays for them when it needs them. With preload, the master
+# imports the application once, then preload() also imports those deferred modules and
+# the URL conf (DRF and every view), parses botocore's service models and freezes the
+# heap, so forked workers start with all of it shared copy-on-write.
+#
+# Nothing that holds sockets, locks, credentials or keys is created in the master.
+# reinitialize_after_fork() drops the JWKS store, token cache, queue backend and boto3
+# default session in each worker, which then rebuild them lazily. The rebuilt boto3
+# session reuses the master's parsed service models.
+
+import gc
+import importlib
+import sys
+
+from django.db import connections
+from django.urls import get_resolver
+
+# Deferred until first use in a worker, but worth sharing from a preloading master
+PRELOAD_MODULES = (
+    "boto3",
+    "botocore.client",
+    "jwt",
+    "jwt.algorithms",
+    "requests",
+    "rest_framework.authentication",
+    "rest_framework.negotiation",
+    "rest_framework.parsers",
+    "rest_framework.renderers",
+)
+
+# Services the backend creates boto3 clients for
+BOTO_SERVICES = ("sqs", "s3", "sts")
+
+_botocore_loader = None
+
+
+def _warm_botocore_loader():
+    """
+    Parse the botocore data client creation needs, without creating a client or credentials.
+    """
+    import botocore.session
+
+    session = botocore.session.get_session()
+    for service in BOTO_SERVICES:
+        session.get_service_model(service)
+    session.get_component("endpoint_resolver")
+    return session.get_component("data_loader")
+
+
+def preload():
+    """
+    Import and parse everything workers share. Runs in the gunicorn master before the first fork.
+    """
+    global _botocore_loader
+
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    _botocore_loader = _warm_botocore_loader()
+
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+
+    # Workers must open their own connections
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
+
+
+def reinitialize_after_fork():
+    """
+    Drop state inherited from the master that must be per process. Runs in each forked worker.
+    """
+    from .auth_service import reset_auth_state
+    from .queue_backends import set_queue_backend
+
+    reset_auth_state()
+    set_queue_backend(None)
+
+    if "boto3" in sys.modules:
+        import boto3
+        import botocore.session
+
+        session = botocore.session.get_session()
+        if _botocore_loader is not None:
+            session.register_component("data_loader", _botocore_loader)
+        boto3.setup_default_session(botocore_session=session)
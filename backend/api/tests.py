@@ -1,3 +1,1634 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import throttling
+from api.models import (
+    ArchivedJob,
+    Connection,
+    Job,
+    JobDurationHistogram,
+    JobManifest,
+    JobOutbox,
+    JobShard,
+    JobStatsDaily,
+    ProcessedObject,
+    RateLimitBucket,
+    User,
+)
+from api.services import s3_prescan
+from api.services import auth_service
+from api.services.auth_service import get_token_cache
+from api.services.jwks_store import JWKSKeyStore
+from api.services.token_cache import VerifiedTokenCache
+from api.services.health_check import HealthMonitor
+from api.services.job_events import Subscriber, get_broadcaster
+from api.services.job_archive import archive_cutoff, archive_jobs, export_archived_jobs, get_archived_job
+from api.services.job_stats import StatsDelta, rebuild_job_stats, record_jobs_created
+from api.services.outbox import OUTBOX_BACKOFF_BASE_SECONDS, add_to_outbox, dispatch_outbox_batch, ready_messages
+from api.services import processed_index
+from api.services.processed_index import complete_unchanged_job, filter_unprocessed, option_set, record_processed
+from api.services.fair_share import get_in_flight, plan_admissions, queue_positions
+from api.services.progress import LATE_EVENT_ERROR, apply_progress_events, coalesce_events, resolve_status
+from api.services.retry_scheduler import retry_delay, retry_due_jobs, schedule_retries
+from api.services.queue_backends import InMemoryQueueBackend, QueueBackend, set_queue_backend
+from api.services.sharding import derive_job_status, plan_shards, rollup_jobs
+from api.views.job_viewset import JobViewSet, filter_job_queryset
+from benchmarks.stubs import StubJWKS
+from core.log import BackgroundQueueHandler, CorrelationIdFilter, SamplingFilter, correlation_scope
+
+
+def make_job(user=None, **fields):
+    user = user or User.objects.create(email=f"{uuid.uuid4()}@example.com")
+    conn = Connection.objects.create(user=user, name="c", bucket_name="bucket", aws_role_arn="arn:aws:iam::1:role/r")
+    return Job.objects.create(user=user, connection=conn, **fields)
+
+
+def send_results(*errors):
+    """
+    A stand-in for send_messages_batch that records each batch and returns errors in order
+    (None means sent), padded with successes.
+    """
+    batches = []
+
+    def send(payloads):
+        batches.append([payload["seq"] for payload in payloads])
+        results = list(errors[:len(payloads)])
+        return results + [None] * (len(payloads) - len(results))
+
+    return send, batches
+
+
+@override_settings(JOB_PRESCAN_ENABLED=False, JOB_FAIR_SHARE_ENABLED=False)
+class DispatchOutboxBatchTests(TestCase):
+    def setUp(self):
+        self.job = make_job()
+        self.other_job = make_job()
+
+    def add(self, job, seq):
+        return add_to_outbox(job, {"jobId": str(job.id), "seq": seq})
+
+    def dispatch(self, send, **kwargs):
+        with mock.patch("api.services.outbox.send_messages_batch", side_effect=send):
+            return dispatch_outbox_batch(**kwargs)
+
+    def test_sends_due_messages_in_id_order(self):
+        self.add(self.job, 1)
+        self.add(self.other_job, 2)
+        send, batches = send_results()
+
+        result = self.dispatch(send)
+
+        self.assertEqual(batches, [[1, 2]])
+        self.assertEqual(result["dispatched"], 2)
+        self.assertFalse(JobOutbox.objects.filter(status="PENDING").exists())
+        self.assertTrue(JobOutbox.objects.exclude(dispatched_at=None).exists())
+
+    def test_later_message_for_a_job_waits_for_the_earlier_one(self):
+        self.add(self.job, 1)
+        self.add(self.job, 2)
+        self.add(self.other_job, 3)
+        send, batches = send_results()
+
+        self.dispatch(send)
+        self.dispatch(send)
+
+        self.assertEqual(batches, [[1, 3], [2]])
+
+    def test_failed_message_blocks_later_messages_for_its_job(self):
+        self.add(self.job, 1)
+        self.add(self.job, 2)
+        send, batches = send_results("throttled")
+
+        self.dispatch(send)
+        self.dispatch(send)
+
+        # The retry is not due yet, and message 2 may not overtake it
+        self.assertEqual(batches, [[1]])
+        self.assertEqual(list(JobOutbox.objects.order_by('id').values_list('status', flat=True)), ["PENDING", "PENDING"])
+
+    def test_failure_backs_off_exponentially(self):
+        message = self.add(self.job, 1)
+        message.attempts = 2
+        message.save()
+        send, _ = send_results("throttled")
+
+        before = timezone.now()
+        result = self.dispatch(send)
+
+        message.refresh_from_db()
+        self.assertEqual(result["retried"], 1)
+        self.assertEqual(message.status, "PENDING")
+        self.assertEqual(message.attempts, 3)
+        self.assertEqual(message.last_error, "throttled")
+        delay = (message.available_at - before).total_seconds()
+        self.assertGreaterEqual(delay, OUTBOX_BACKOFF_BASE_SECONDS ** 3)
+        self.assertLess(delay, OUTBOX_BACKOFF_BASE_SECONDS ** 3 + 5)
+
+    def test_retry_is_sent_once_due(self):
+        message = self.add(self.job, 1)
+        send, _ = send_results("throttled")
+        self.dispatch(send)
+
+        JobOutbox.objects.filter(id=message.id).update(available_at=timezone.now() - timedelta(seconds=1))
+        send, batches = send_results()
+        result = self.dispatch(send)
+
+        self.assertEqual(batches, [[1]])
+        self.assertEqual(result["dispatched"], 1)
+
+    def test_max_attempts_fails_the_message_and_its_job(self):
+        message = self.add(self.job, 1)
+        message.attempts = 2
+        message.save()
+        send, _ = send_results("access denied")
+
+        result = self.dispatch(send, max_attempts=3)
+
+        message.refresh_from_db()
+        self.job.refresh_from_db()
+        self.assertEqual(result["failed"], 1)
+        self.assertEqual(message.status, "FAILED")
+        self.assertEqual(self.job.status, "FAILED_PERMANENT")
+        self.assertIn("access denied", self.job.error_message)
+
+
+@skipUnlessDBFeature("has_select_for_update_skip_locked")
+@override_settings(JOB_PRESCAN_ENABLED=False, JOB_FAIR_SHARE_ENABLED=False)
+class DispatchOutboxClaimTests(TransactionTestCase):
+    def test_skips_messages_claimed_by_another_dispatcher(self):
+        locked = add_to_outbox(make_job(), {"seq": 1})
+        add_to_outbox(make_job(), {"seq": 2})
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(JobOutbox.objects.select_for_update().filter(id=locked.id))
+                    claimed.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(claimed.wait(10))
+            send, batches = send_results()
+            with mock.patch("api.services.outbox.send_messages_batch", side_effect=send):
+                result = dispatch_outbox_batch()
+        finally:
+            release.set()
+            holder.join()
+
+        # The locked row is skipped rather than waited on or sent twice
+        self.assertEqual(batches, [[2]])
+        self.assertEqual(result["dispatched"], 1)
+        self.assertEqual(JobOutbox.objects.get(id=locked.id).status, "PENDING")
+
+
+@override_settings(JOB_RETRY_BASE_SECONDS=10, JOB_RETRY_MAX_SECONDS=300)
+class RetryDelayTests(TestCase):
+    def test_half_fixed_half_jittered(self):
+        for retry_count, delay in ((0, 10), (1, 20), (3, 80), (5, 300), (20, 300)):
+            with self.subTest(retry_count=retry_count):
+                with mock.patch("api.services.retry_scheduler.random.uniform", side_effect=lambda low, high: low):
+                    self.assertEqual(retry_delay(retry_count), timedelta(seconds=delay / 2))
+                with mock.patch("api.services.retry_scheduler.random.uniform", side_effect=lambda low, high: high):
+                    self.assertEqual(retry_delay(retry_count), timedelta(seconds=delay))
+
+
+@override_settings(JOB_RETRY_BASE_SECONDS=10, JOB_RETRY_MAX_SECONDS=300, JOB_RETRY_MAX_ATTEMPTS=3)
+class RetrySchedulerTests(TestCase):
+    def failed_job(self, **fields):
+        fields.setdefault("completed_at", timezone.now() - timedelta(minutes=10))
+        job = make_job(status="FAILED_RETRYABLE", error_message="worker crashed", files_processed=4, **fields)
+        add_to_outbox(job, {"jobId": str(job.id)})
+        JobOutbox.objects.filter(job=job).update(status="DISPATCHED")
+        return job
+
+    def test_schedules_each_failure_once(self):
+        job = self.failed_job(retry_count=2)
+        self.assertEqual(schedule_retries(), 1)
+        self.assertEqual(schedule_retries(), 0)
+        job.refresh_from_db()
+        delay = job.next_retry_at - job.completed_at
+        self.assertTrue(timedelta(seconds=20) <= delay <= timedelta(seconds=40))
+
+    def test_requeues_due_jobs(self):
+        job = self.failed_job(retry_count=1, next_retry_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(retry_due_jobs(), {"retried": 1, "exhausted": 0})
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.retry_count, job.files_processed), ("PENDING", 2, 0))
+        self.assertIsNone(job.next_retry_at)
+        self.assertIsNone(job.admitted_at)
+        self.assertEqual(JobOutbox.objects.get(job=job, status="PENDING").payload, {"jobId": str(job.id)})
+
+    def test_jobs_not_yet_due_are_left_alone(self):
+        self.failed_job(next_retry_at=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(retry_due_jobs(), {"retried": 0, "exhausted": 0})
+
+    def test_out_of_attempts_fails_permanently(self):
+        job = self.failed_job(retry_count=3, next_retry_at=timezone.now() - timedelta(seconds=1))
+        almost = self.failed_job(retry_count=2, next_retry_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(retry_due_jobs(), {"retried": 1, "exhausted": 1})
+
+        job.refresh_from_db()
+        almost.refresh_from_db()
+        self.assertEqual(job.status, "FAILED_PERMANENT")
+        self.assertEqual(job.error_message, "Gave up after 3 retries: worker crashed")
+        self.assertFalse(JobOutbox.objects.filter(job=job, status="PENDING").exists())
+        self.assertEqual(almost.status, "PENDING")
+
+    def test_stale_retry_time_from_an_earlier_failure_is_ignored(self):
+        # Failed again after its last retry was scheduled: the old next_retry_at does not count
+        completed_at = timezone.now() - timedelta(seconds=5)
+        job = self.failed_job(completed_at=completed_at, next_retry_at=completed_at - timedelta(minutes=1))
+
+        self.assertEqual(retry_due_jobs(), {"retried": 0, "exhausted": 0})
+        self.assertEqual(schedule_retries(), 1)
+        job.refresh_from_db()
+        self.assertGreater(job.next_retry_at, completed_at)
+
+    def test_sharded_jobs_requeue_only_failed_shards(self):
+        job = self.failed_job(next_retry_at=timezone.now() - timedelta(seconds=1), admitted_at=timezone.now())
+        failed, done = make_shards(job, "FAILED_RETRYABLE", "COMPLETED", files_processed=2)
+        for shard in (failed, done):
+            JobOutbox.objects.create(job=job, shard=shard, payload={"shard": shard.index}, status="DISPATCHED")
+
+        self.assertEqual(retry_due_jobs(), {"retried": 1, "exhausted": 0})
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.retry_count, job.files_processed), ("PROCESSING", 1, 2))
+        self.assertIsNone(job.admitted_at)
+        self.assertEqual(list(JobOutbox.objects.filter(status="PENDING").values_list('shard_id', flat=True)), [failed.id])
+
+
+@skipUnlessDBFeature("has_select_for_update_skip_locked")
+@override_settings(JOB_RETRY_MAX_ATTEMPTS=3)
+class RetrySchedulerClaimTests(TransactionTestCase):
+    def test_skips_jobs_claimed_by_another_scheduler(self):
+        due = timezone.now() - timedelta(seconds=1)
+        locked = make_job(status="FAILED_RETRYABLE", next_retry_at=due)
+        free = make_job(status="FAILED_RETRYABLE", next_retry_at=due)
+        claimed = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    list(Job.objects.select_for_update().filter(id=locked.id))
+                    claimed.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(claimed.wait(10))
+            result = retry_due_jobs()
+        finally:
+            release.set()
+            holder.join()
+
+        # The locked job is skipped rather than waited on or re-queued twice
+        self.assertEqual(result, {"retried": 1, "exhausted": 0})
+        self.assertEqual(Job.objects.get(id=locked.id).status, "FAILED_RETRYABLE")
+        self.assertEqual(Job.objects.get(id=free.id).status, "PENDING")
+        self.assertEqual(JobOutbox.objects.filter(status="PENDING").count(), 1)
+
+
+class FilterJobQuerysetTests(TestCase):
+    def test_rejects_dates_that_do_not_exist(self):
+        for value in ("2024-02-30", "2024-02-30T10:00:00", "2024-13-01", "yesterday"):
+            with self.subTest(value=value), self.assertRaises(ValidationError) as raised:
+                filter_job_queryset(Job.objects.all(), {"created_after": value})
+            self.assertIn("created_after", raised.exception.detail)
+
+    def test_accepts_dates_and_datetimes(self):
+        job = make_job()
+        queryset = filter_job_queryset(Job.objects.all(), {"created_after": "2000-01-01", "created_before": "2999-01-01T00:00:00Z"})
+        self.assertEqual(list(queryset), [job])
+
+
+class StubS3:
+    """
+    A stand-in S3 client serving ListObjectsV2 pages (page_size entries each) over a
+    fixed {key: size} listing, recording each (prefix, delimiter) listed.
+    """
+
+    def __init__(self, sizes, page_size=2):
+        self.sizes = dict(sorted(sizes.items()))
+        self.page_size = page_size
+        self.listed = []
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix, Delimiter=None, PaginationConfig=None):
+        self.listed.append((Prefix, Delimiter))
+        entries = []
+        for key, size in self.sizes.items():
+            if not key.startswith(Prefix):
+                continue
+            rest = key[len(Prefix):]
+            if Delimiter and Delimiter in rest:
+                common = {"Prefix": Prefix + rest.split(Delimiter)[0] + Delimiter}
+                if common not in entries:
+                    entries.append(common)
+            else:
+                entries.append({"Key": key, "Size": size, "ETag": f'"etag-{key}"'})
+        for start in range(0, len(entries), self.page_size):
+            page = entries[start:start + self.page_size]
+            yield {
+                "Contents": [entry for entry in page if "Key" in entry],
+                "CommonPrefixes": [entry for entry in page if "Prefix" in entry],
+            }
+
+
+STUDY_OBJECTS = {
+    "in/readme.txt": 1,
+    "in/a/1.dcm": 10, "in/a/2.dcm": 20, "in/a/3.dcm": 30,
+    "in/b/1.dcm": 40, "in/b/x/2.dcm": 50,
+    "in/c/": 0,
+    "in/c/1.dcm": 60,
+    "other/1.dcm": 70,
+}
+
+
+def listing(sizes, prefix="in/"):
+    return sorted((key, size, f"etag-{key}") for key, size in sizes.items() if key.startswith(prefix) and not key.endswith("/"))
+
+
+class PrescanTests(TestCase):
+    def test_split_prefix_lists_one_level_per_pass(self):
+        s3 = StubS3(STUDY_OBJECTS)
+        direct, partitions = s3_prescan._split_prefix(s3, "bucket", "in/", target_partitions=3)
+        self.assertEqual(direct, [("in/readme.txt", 1, "etag-in/readme.txt")])
+        self.assertEqual(partitions, ["in/a/", "in/b/", "in/c/"])
+        self.assertEqual(s3.listed, [("in/", "/")])
+
+    def test_split_prefix_goes_deeper_for_more_partitions(self):
+        s3 = StubS3(STUDY_OBJECTS)
+        direct, partitions = s3_prescan._split_prefix(s3, "bucket", "in/", target_partitions=4)
+        self.assertEqual(partitions, ["in/b/x/"])
+        self.assertEqual(sorted(key for key, _, _ in direct), [
+            "in/a/1.dcm", "in/a/2.dcm", "in/a/3.dcm", "in/b/1.dcm", "in/c/1.dcm", "in/readme.txt",
+        ])
+
+    def test_scan_prefix_pages_through_every_partition(self):
+        s3 = StubS3(STUDY_OBJECTS, page_size=1)
+        objects = s3_prescan.scan_prefix(s3, "bucket", "in/", workers=3)
+        self.assertEqual(objects, listing(STUDY_OBJECTS))
+        # Each sub-prefix is listed recursively once, by the thread pool
+        self.assertEqual(sorted(prefix for prefix, delimiter in s3.listed if delimiter is None), ["in/a/", "in/b/", "in/c/"])
+
+    def test_manifest_round_trip(self):
+        objects = listing(STUDY_OBJECTS) + [("in/ünïcode \"quoted\".dcm", 5, "e")]
+        self.assertEqual(s3_prescan.decode_manifest(s3_prescan.encode_manifest(objects)), objects)
+        self.assertEqual(s3_prescan.decode_manifest(s3_prescan.encode_manifest([])), [])
+        self.assertEqual(s3_prescan.decode_manifest(None), [])
+
+    def prescan(self, job, sizes=STUDY_OBJECTS):
+        JobManifest.objects.create(job=job)
+        return s3_prescan.build_manifest(job, client_factory=lambda connection: StubS3(sizes))
+
+    def test_build_manifest_sets_totals(self):
+        job = make_job(source_prefix="in/")
+        objects = self.prescan(job)
+
+        job.refresh_from_db()
+        manifest = JobManifest.objects.get(job=job)
+        self.assertEqual(objects, listing(STUDY_OBJECTS))
+        self.assertEqual((job.total_files, job.total_bytes, job.files_skipped), (7, 211, 0))
+        self.assertEqual((manifest.status, manifest.file_count, manifest.total_bytes), ("READY", 7, 211))
+        self.assertEqual(s3_prescan.decode_manifest(manifest.data), objects)
+
+    def test_build_manifest_skips_processed_objects_unless_force_full(self):
+        for force_full, expected in ((False, (5, 200, 2)), (True, (7, 211, 0))):
+            with self.subTest(force_full=force_full):
+                job = make_job(source_prefix="in/", force_full=force_full)
+                record_processed(job.connection_id, job.destination_prefix, option_set(False, False, False), [
+                    ("in/a/1.dcm", 10, "etag-in/a/1.dcm"),
+                    ("in/readme.txt", 1, "etag-in/readme.txt"),
+                    ("in/b/1.dcm", 40, "stale-etag"),
+                ])
+                self.prescan(job)
+                job.refresh_from_db()
+                self.assertEqual((job.total_files, job.total_bytes, job.files_skipped), expected)
+
+    def test_failure_after_the_scan_fails_the_manifest(self):
+        job = make_job(source_prefix="in/")
+        with mock.patch("api.services.s3_prescan.shard_job", side_effect=RuntimeError("sharding broke")):
+            self.assertIsNone(self.prescan(job))
+
+        job.refresh_from_db()
+        manifest = JobManifest.objects.get(job=job)
+        self.assertEqual((manifest.status, manifest.error_message), ("FAILED", "sharding broke"))
+        self.assertEqual((job.total_files, job.total_bytes), (0, 0))
+
+    @override_settings(JOB_PRESCAN_ENABLED=True, JOB_FAIR_SHARE_ENABLED=False)
+    def test_prescanner_continues_after_a_failed_job(self):
+        jobs = [make_job(source_prefix="in/") for _ in range(2)]
+        for job in jobs:
+            add_to_outbox(job, {"jobId": str(job.id)})
+
+        def shard_job(job, objects):
+            if job.id == jobs[0].id:
+                raise RuntimeError("sharding broke")
+            return []
+
+        with mock.patch("api.services.s3_prescan.get_connection_s3_client", return_value=StubS3(STUDY_OBJECTS)), \
+                mock.patch("api.services.s3_prescan.shard_job", side_effect=shard_job):
+            call_command("prescan_jobs", "--once", stdout=mock.Mock())
+
+        statuses = dict(JobManifest.objects.values_list('job_id', 'status'))
+        self.assertEqual(statuses, {jobs[0].id: "FAILED", jobs[1].id: "READY"})
+        # Both messages may go out; the failed job's workers list the prefix themselves
+        self.assertEqual(ready_messages().count(), 2)
+
+
+class ProcessedIndexTests(TestCase):
+    def setUp(self):
+        self.job = make_job(destination_prefix="out/")
+        self.options = option_set(False, False, False)
+
+    def objects(self, count, etag="v1"):
+        return [(f"in/{i:04d}.dcm", 10, etag) for i in range(count)]
+
+    def test_option_set_is_a_bitmask(self):
+        self.assertEqual(option_set(False, False, False), 0)
+        self.assertEqual(option_set(True, False, True), 5)
+        self.assertEqual(option_set(True, True, True), 7)
+
+    def test_only_new_or_changed_objects_remain(self):
+        objects = self.objects(4)
+        record_processed(self.job.connection_id, "out/", self.options, objects[:3])
+        changed = objects[2][0], 10, "v2"
+        remaining, skipped = filter_unprocessed(self.job, objects[:2] + [changed, objects[3]])
+        self.assertEqual(remaining, [changed, objects[3]])
+        self.assertEqual(skipped, 2)
+
+    def test_lookups_are_chunked(self):
+        objects = self.objects(5)
+        record_processed(self.job.connection_id, "out/", self.options, objects)
+        with mock.patch.object(processed_index, "LOOKUP_CHUNK_SIZE", 2), CaptureQueriesContext(connection) as queries:
+            remaining, skipped = filter_unprocessed(self.job, objects + [("in/new.dcm", 1, "v1")])
+        self.assertEqual((remaining, skipped), ([("in/new.dcm", 1, "v1")], 5))
+        self.assertEqual(len(queries), 3)
+
+    def test_index_is_separate_per_options_destination_and_connection(self):
+        objects = self.objects(2)
+        record_processed(self.job.connection_id, "out/", option_set(True, False, False), objects)
+        record_processed(self.job.connection_id, "elsewhere/", self.options, objects)
+        record_processed(make_job().connection_id, "out/", self.options, objects)
+        self.assertEqual(filter_unprocessed(self.job, objects), (objects, 0))
+
+        ocr_job = make_job(user=self.job.user, destination_prefix="out/", ocr_requested=True)
+        Job.objects.filter(id=ocr_job.id).update(connection=self.job.connection)
+        ocr_job.refresh_from_db()
+        self.assertEqual(filter_unprocessed(ocr_job, objects), ([], 2))
+
+    def test_record_processed_upserts(self):
+        first = make_job()
+        record_processed(self.job.connection_id, "out/", self.options, self.objects(2), job_id=first.id)
+        record_processed(self.job.connection_id, "out/", self.options, self.objects(3, etag="v2"), job_id=self.job.id)
+
+        rows = ProcessedObject.objects.filter(connection=self.job.connection).order_by('source_key')
+        self.assertEqual([(row.source_key, row.etag, row.job_id) for row in rows], [
+            (key, "v2", self.job.id) for key, _, _ in self.objects(3)
+        ])
+
+    def test_complete_unchanged_job(self):
+        record_jobs_created([self.job])
+        add_to_outbox(self.job, {"jobId": str(self.job.id)})
+
+        self.assertTrue(complete_unchanged_job(self.job))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "COMPLETED")
+        self.assertIsNotNone(self.job.completed_at)
+        self.assertEqual(JobOutbox.objects.get(job=self.job).status, "SUPERSEDED")
+        self.assertEqual(JobStatsDaily.objects.get(user=self.job.user).completed, 1)
+        # Only a PENDING job can be completed this way
+        self.assertFalse(complete_unchanged_job(self.job))
+
+
+def make_shards(job, *statuses, files_processed=0):
+    return [
+        JobShard.objects.create(
+            job=job, index=index, status=status, file_count=10, files_processed=files_processed,
+            first_key=f"k{index}0", last_key=f"k{index}9",
+        )
+        for index, status in enumerate(statuses)
+    ]
+
+
+class PlanShardsTests(TestCase):
+    def objects(self, *sizes):
+        return [(f"key{i:03d}", size, "etag") for i, size in enumerate(sizes)]
+
+    def test_job_within_both_budgets_is_not_split(self):
+        self.assertEqual(plan_shards(self.objects(1, 1, 1), max_files=3, max_bytes=3), [])
+
+    def test_splits_on_file_count(self):
+        objects = self.objects(*[1] * 7)
+        self.assertEqual([len(shard) for shard in plan_shards(objects, max_files=3, max_bytes=100)], [3, 3, 1])
+
+    def test_splits_on_bytes_keeping_key_order(self):
+        objects = self.objects(4, 4, 4, 1)
+        shards = plan_shards(objects, max_files=100, max_bytes=8)
+        self.assertEqual([[size for _, size, _ in shard] for shard in shards], [[4, 4], [4, 1]])
+        self.assertEqual([obj for shard in shards for obj in shard], objects)
+
+    def test_oversized_object_gets_its_own_shard(self):
+        shards = plan_shards(self.objects(1, 50, 1), max_files=100, max_bytes=10)
+        self.assertEqual([[size for _, size, _ in shard] for shard in shards], [[1], [50], [1]])
+
+
+class DeriveJobStatusTests(TestCase):
+    def test_statuses(self):
+        cases = [
+            ({"PENDING": 3}, "PENDING"),
+            ({"PENDING": 2, "PROCESSING": 1}, "PROCESSING"),
+            ({"PENDING": 1, "COMPLETED": 2}, "PROCESSING"),
+            ({"PROCESSING": 1, "FAILED_PERMANENT": 2}, "PROCESSING"),
+            ({"COMPLETED": 3}, "COMPLETED"),
+            ({"COMPLETED": 2, "FAILED_PERMANENT": 1}, "FAILED_PERMANENT"),
+            ({"FAILED_RETRYABLE": 1, "FAILED_PERMANENT": 1, "COMPLETED": 1}, "FAILED_RETRYABLE"),
+        ]
+        for counts, expected in cases:
+            with self.subTest(counts=counts):
+                self.assertEqual(derive_job_status(Counter(counts)), expected)
+
+
+class RollupJobsTests(TestCase):
+    def rollup(self, job):
+        stats = StatsDelta()
+        changed = rollup_jobs([job.id], stats, timezone.now())
+        stats.apply()
+        job.refresh_from_db()
+        return changed
+
+    def test_first_running_shard_starts_the_job(self):
+        job = make_job()
+        make_shards(job, "PROCESSING", "PENDING")
+        self.assertEqual(self.rollup(job), 1)
+        self.assertEqual(job.status, "PROCESSING")
+        self.assertIsNotNone(job.started_at)
+        self.assertEqual(self.rollup(job), 0)
+
+    def test_job_finishes_with_its_last_shard(self):
+        job = make_job(status="PROCESSING", started_at=timezone.now() - timedelta(minutes=5))
+        record_jobs_created([job])
+        make_shards(job, "COMPLETED", "COMPLETED")
+        self.rollup(job)
+        self.assertEqual(job.status, "COMPLETED")
+        self.assertIsNotNone(job.completed_at)
+        self.assertIsNone(job.error_message)
+        self.assertEqual(JobStatsDaily.objects.get(user=job.user).completed, 1)
+
+    def test_failed_shards_are_reported_on_the_job(self):
+        job = make_job(status="PROCESSING")
+        make_shards(job, "COMPLETED", "FAILED_RETRYABLE", "FAILED_PERMANENT")
+        self.rollup(job)
+        self.assertEqual(job.status, "FAILED_RETRYABLE")
+        self.assertEqual(job.error_message, "2 of 3 shards failed")
+
+
+@override_settings(THROTTLE_ENABLED=False, JOB_PRESCAN_ENABLED=False)
+class RetryShardTests(TestCase):
+    def setUp(self):
+        self.admitted_at = timezone.now() - timedelta(minutes=1)
+        self.job = make_job(status="PROCESSING", admitted_at=self.admitted_at, total_files=20, files_processed=7)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.job.user.user_id}")
+        patcher = mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def retry(self, index):
+        return self.client.post(f"/api/jobs/{self.job.id}/shards/{index}/retry/")
+
+    def add_shards(self, *statuses):
+        shards = make_shards(self.job, *statuses)
+        JobShard.objects.filter(id=shards[0].id).update(files_processed=3)
+        for shard in shards:
+            JobOutbox.objects.create(job=self.job, shard=shard, payload={"shard": {"index": shard.index}}, status="DISPATCHED")
+        return shards
+
+    def test_retry_one_shard_while_siblings_run(self):
+        failed, _ = self.add_shards("FAILED_RETRYABLE", "PROCESSING")
+
+        response = self.retry(0)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "PENDING")
+        self.assertEqual(response.data["retry_count"], 1)
+        self.job.refresh_from_db()
+        # Still in flight: the job keeps its admission and keeps counting against the user's limits
+        self.assertEqual(self.job.admitted_at, self.admitted_at)
+        self.assertEqual(self.job.status, "PROCESSING")
+        self.assertEqual(self.job.files_processed, 4)
+        self.assertEqual(get_in_flight([self.job.user_id]), {self.job.user_id: (1, 20)})
+        message = JobOutbox.objects.get(shard=failed, status="PENDING")
+        self.assertEqual(message.payload, {"shard": {"index": 0}})
+
+    def test_retry_of_a_finished_job_waits_for_admission(self):
+        Job.objects.filter(id=self.job.id).update(status="FAILED_RETRYABLE")
+        self.add_shards("FAILED_RETRYABLE", "COMPLETED")
+
+        self.assertEqual(self.retry(0).status_code, 202)
+
+        self.job.refresh_from_db()
+        self.assertIsNone(self.job.admitted_at)
+        self.assertEqual(self.job.status, "PROCESSING")
+
+    def test_only_failed_shards_can_be_retried(self):
+        self.add_shards("FAILED_RETRYABLE", "PROCESSING")
+        self.assertEqual(self.retry(1).status_code, 409)
+        self.assertEqual(self.retry(5).status_code, 404)
+        self.assertEqual(JobOutbox.objects.filter(status="PENDING").count(), 0)
+
+
+@override_settings(
+    JOB_PRESCAN_ENABLED=False,
+    JOB_FAIR_SHARE_POLICIES={
+        "RADIOLOGIST": {"weight": 2, "max_jobs": 10, "max_files": 1000},
+        "DEFAULT": {"weight": 1, "max_jobs": 10, "max_files": 1000},
+    },
+)
+class FairShareTests(TestCase):
+    def user(self, role="OTHER", **fields):
+        return User.objects.create(email=f"{uuid.uuid4()}@example.com", role=role, **fields)
+
+    def waiting(self, user, count, total_files=10):
+        jobs = []
+        for _ in range(count):
+            job = make_job(user=user, total_files=total_files)
+            add_to_outbox(job, {"jobId": str(job.id)})
+            jobs.append(job.id)
+        return jobs
+
+    def running(self, user, total_files=10):
+        return make_job(user=user, status="PROCESSING", admitted_at=timezone.now(), total_files=total_files)
+
+    def ready(self):
+        return ready_messages().filter(job__admitted_at__isnull=True)
+
+    def test_admits_by_in_flight_jobs_per_weight(self):
+        heavy = self.waiting(self.user("RADIOLOGIST"), 4)
+        light = self.waiting(self.user(), 4)
+
+        admitted = plan_admissions(self.ready(), 6)
+
+        self.assertEqual(admitted, [heavy[0], light[0], heavy[1], heavy[2], light[1], heavy[3]])
+
+    def test_work_in_flight_counts_against_the_share(self):
+        busy_user = self.user()
+        self.running(busy_user)
+        busy = self.waiting(busy_user, 1)
+        idle = self.waiting(self.user(), 2)
+        self.assertEqual(plan_admissions(self.ready(), 3), [idle[0], busy[0], idle[1]])
+
+    def test_job_limit(self):
+        capped_user = self.user(max_inflight_jobs=2)
+        self.running(capped_user)
+        capped = self.waiting(capped_user, 3)
+        other = self.waiting(self.user(), 1)
+        self.assertEqual(plan_admissions(self.ready(), 10), [other[0], capped[0]])
+
+    def test_file_limit(self):
+        capped_user = self.user(max_inflight_files=100)
+        self.running(capped_user, total_files=80)
+        self.waiting(capped_user, 1, total_files=30)
+        self.waiting(capped_user, 1, total_files=10)
+        # The user's oldest job does not fit, so nothing behind it overtakes it
+        self.assertEqual(plan_admissions(self.ready(), 10), [])
+
+        idle_user = self.user(max_inflight_files=100)
+        huge = self.waiting(idle_user, 2, total_files=5000)
+        # With nothing in flight a user may always run one job, however large
+        self.assertEqual(plan_admissions(self.ready(), 10), [huge[0]])
+
+    def test_slots_bound_the_admissions(self):
+        self.waiting(self.user(), 3)
+        self.assertEqual(len(plan_admissions(self.ready(), 2)), 2)
+        self.assertEqual(plan_admissions(self.ready(), 0), [])
+
+    def test_queue_positions_follow_the_admission_order(self):
+        heavy = self.user("RADIOLOGIST")
+        light = self.user()
+        self.waiting(heavy, 4)
+        light_jobs = self.waiting(light, 2)
+
+        queue = queue_positions(light, self.ready())
+
+        self.assertEqual(
+            [(entry["job_id"], entry["position"]) for entry in queue["waiting"]],
+            [(str(light_jobs[0]), 2), (str(light_jobs[1]), 5)],
+        )
+        self.assertEqual(queue["limits"], {"jobs": 10, "files": 1000, "weight": 1})
+        self.assertFalse(queue["at_limit"])
+
+    def test_queue_positions_at_the_limit(self):
+        user = self.user(max_inflight_jobs=1)
+        self.running(user)
+        self.waiting(user, 1)
+
+        queue = queue_positions(user, self.ready())
+
+        self.assertTrue(queue["at_limit"])
+        self.assertEqual(queue["in_flight"], {"jobs": 1, "files": 10})
+        self.assertIsNone(queue["waiting"][0]["position"])
+
+
+class ResolveStatusTests(TestCase):
+    def test_walks_valid_transitions(self):
+        self.assertEqual(resolve_status("PENDING", ["PROCESSING", "COMPLETED"]), ("COMPLETED", None))
+
+    def test_repeated_status_is_not_a_transition(self):
+        self.assertEqual(resolve_status("PROCESSING", ["PROCESSING", "PROCESSING"]), ("PROCESSING", None))
+
+    def test_stops_at_the_first_invalid_transition(self):
+        status, error = resolve_status("PENDING", ["PROCESSING", "COMPLETED", "PROCESSING"])
+        self.assertEqual(status, "COMPLETED")
+        self.assertEqual(error, "Invalid status transition COMPLETED -> PROCESSING")
+
+
+class CoalesceEventsTests(TestCase):
+    def test_merges_events_per_job(self):
+        merged = coalesce_events([
+            {"job_id": "a", "files_processed": 3, "status": "PROCESSING"},
+            {"job_id": "b", "files_processed": 1},
+            {"job_id": "a", "files_processed": 4, "total_files": 10},
+            {"job_id": "a", "total_files": 12, "status": "COMPLETED", "error_message": "warning"},
+        ])
+        self.assertEqual(merged["a"], {
+            "files_delta": 7,
+            "total_files": 12,
+            "statuses": ["PROCESSING", "COMPLETED"],
+            "error_message": "warning",
+        })
+        self.assertEqual(merged["b"]["files_delta"], 1)
+        self.assertIsNone(merged["b"]["total_files"])
+
+    def test_custom_key(self):
+        merged = coalesce_events(
+            [{"job_id": "a", "shard_index": 0, "files_processed": 1}, {"job_id": "a", "shard_index": 1, "files_processed": 2}],
+            key=lambda event: (event["job_id"], event["shard_index"]),
+        )
+        self.assertEqual(set(merged), {("a", 0), ("a", 1)})
+
+
+class ApplyProgressEventsTests(TestCase):
+    def job_files(self, job):
+        job.refresh_from_db()
+        return job.files_processed, job.total_files
+
+    def stats_files(self, job):
+        return sum(JobStatsDaily.objects.filter(user=job.user).values_list('files_processed', flat=True))
+
+    def test_progress_only_updates_are_applied(self):
+        job = make_job(status="PROCESSING")
+        result = apply_progress_events([
+            {"job_id": job.id, "files_processed": 5, "total_files": 20},
+            {"job_id": job.id, "files_processed": 2},
+        ])
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(result["rejected"], [])
+        self.assertEqual(self.job_files(job), (7, 20))
+        self.assertEqual(self.stats_files(job), 7)
+
+    def test_invalid_transition_applies_nothing(self):
+        job = make_job(status="PENDING", total_files=3)
+        event = {"job_id": job.id, "files_processed": 5, "total_files": 20, "status": "PENDING"}
+        bad = {"job_id": job.id, "status": "COMPLETED"}
+        for _ in range(2):
+            # Resending the rejected callback must not count its files again
+            result = apply_progress_events([event, {**bad, "status": "PROCESSING"}, bad, {**bad, "status": "PENDING"}])
+            self.assertEqual(result["updated"], 0)
+            self.assertEqual(len(result["rejected"]), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, "PENDING")
+        self.assertEqual(self.job_files(job), (0, 3))
+        self.assertEqual(self.stats_files(job), 0)
+
+    def test_late_progress_on_finished_jobs_is_rejected(self):
+        for status in ("COMPLETED", "FAILED_PERMANENT"):
+            with self.subTest(status=status):
+                job = make_job(status=status, files_processed=10)
+                result = apply_progress_events([{"job_id": job.id, "files_processed": 3}])
+                self.assertEqual(result["updated"], 0)
+                self.assertEqual(result["rejected"], [{"job_id": str(job.id), "error": LATE_EVENT_ERROR}])
+                self.assertEqual(self.job_files(job), (10, 0))
+
+    def test_late_progress_on_finished_shards_is_rejected(self):
+        job = make_job(status="PROCESSING")
+        JobShard.objects.create(job=job, index=0, status="COMPLETED", files_processed=4, first_key="a", last_key="b")
+        result = apply_progress_events([{"job_id": job.id, "shard_index": 0, "files_processed": 2}])
+        self.assertEqual(result["updated"], 0)
+        self.assertEqual(result["rejected"], [{"job_id": str(job.id), "shard_index": 0, "error": LATE_EVENT_ERROR}])
+        self.assertEqual(JobShard.objects.get(job=job).files_processed, 4)
+        self.assertEqual(self.job_files(job), (0, 0))
+
+    def test_job_finishing_after_the_read_is_not_incremented(self):
+        job = make_job(status="PROCESSING", files_processed=10)
+        other = make_job(status="PROCESSING")
+
+        real_now = timezone.now
+
+        def finish_job_then_now():
+            # Runs right after the batch has read job statuses: the job completes in between
+            Job.objects.filter(id=job.id).update(status="COMPLETED")
+            return real_now()
+
+        with mock.patch("api.services.progress.timezone.now", side_effect=finish_job_then_now):
+            result = apply_progress_events([
+                {"job_id": job.id, "files_processed": 3},
+                {"job_id": other.id, "files_processed": 3},
+            ])
+
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(result["rejected"], [{"job_id": str(job.id), "error": LATE_EVENT_ERROR}])
+        self.assertEqual(self.job_files(job), (10, 0))
+        self.assertEqual(self.job_files(other), (3, 0))
+        self.assertEqual(self.stats_files(job), 0)
+        self.assertEqual(self.stats_files(other), 3)
+
+
+class JobStreamTests(TestCase):
+    def row(self, created_at, **fields):
+        return {
+            "id": "job-1", "user_id": "user-1", "created_at": created_at, "updated_at": created_at,
+            "status": "PENDING", "files_processed": 0, "completed_at": None, **fields,
+        }
+
+    def test_jobs_created_after_the_stream_opened_are_announced(self):
+        opened = timezone.now()
+        subscriber = Subscriber("user-1", since=opened)
+        row = self.row(opened + timedelta(seconds=1))
+
+        _, data, event = subscriber.diff(row)
+        self.assertEqual(event, "created")
+        self.assertEqual(data["id"], "job-1")
+        self.assertIsNone(subscriber.diff(row))
+        _, data, event = subscriber.diff({**row, "status": "PROCESSING"})
+        self.assertEqual((event, data), ("job", {"status": "PROCESSING", "id": "job-1"}))
+
+    def test_older_jobs_are_updated_in_place(self):
+        opened = timezone.now()
+        subscriber = Subscriber("user-1", since=opened)
+        _, data, event = subscriber.diff(self.row(opened - timedelta(hours=1), status="PROCESSING"))
+        self.assertEqual(event, "job")
+        self.assertEqual(data["status"], "PROCESSING")
+
+    @override_settings(
+        THROTTLE_ENABLED=True,
+        THROTTLE_READ_STORE="local",
+        THROTTLE_BUCKETS={"stream.read": {"capacity": 2, "per_second": 0.001}},
+    )
+    async def test_connects_are_throttled_before_verification(self):
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+        client = AsyncClient(REMOTE_ADDR="203.0.113.9")
+        with mock.patch("api.services.auth_service._verify_token", return_value=None) as verify:
+            statuses = [
+                (await client.get("/api/jobs/stream/", headers={"Authorization": "Bearer nope"})).status_code
+                for _ in range(4)
+            ]
+        self.assertEqual(statuses, [401, 401, 429, 429])
+        self.assertEqual(verify.call_count, 2)
+
+    @override_settings(THROTTLE_ENABLED=False, JOB_STREAM_MAX_PER_USER=2)
+    async def test_open_streams_per_user_are_capped(self):
+        subscribers = get_broadcaster().subscribers
+        subscribers["user-1"] = {Subscriber("user-1"), Subscriber("user-1")}
+        self.addCleanup(subscribers.clear)
+        with mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token):
+            response = await AsyncClient().get("/api/jobs/stream/", headers={"Authorization": "Bearer user-1"})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    async def test_rejects_invalid_tokens(self):
+        client = AsyncClient()
+        with mock.patch("api.services.auth_service._verify_token", return_value=None) as verify:
+            self.assertEqual((await client.get("/api/jobs/stream/")).status_code, 401)
+            response = await client.get("/api/jobs/stream/", headers={"Authorization": "Bearer nope"})
+        self.assertEqual(response.status_code, 401)
+        verify.assert_called_once_with("nope")
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class DashboardBootstrapTests(TestCase):
+    def setUp(self):
+        self.job = make_job()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.job.user.user_id}")
+        patcher = mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, path="/api/dashboard/bootstrap/", etag=None):
+        return self.client.get(path, **({"HTTP_IF_NONE_MATCH": etag} if etag else {}))
+
+    def test_unchanged_dashboard_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get(etag=response["ETag"]).status_code, 304)
+
+    def test_validators_are_scoped_to_the_sections(self):
+        etag = self.get()["ETag"]
+        self.assertEqual(self.get("/api/dashboard/bootstrap/?include=counts", etag=etag).status_code, 200)
+
+    def test_changes_in_any_section_bust_the_validators(self):
+        for change in (
+            lambda: make_job(user=self.job.user),
+            lambda: Job.objects.filter(id=self.job.id).update(status="PROCESSING", updated_at=timezone.now()),
+            lambda: Connection.objects.filter(user=self.job.user).update(name="renamed", updated_at=timezone.now()),
+            lambda: User.objects.filter(user_id=self.job.user_id).update(display_name="Dr X", updated_at=timezone.now()),
+        ):
+            etag = self.get("/api/dashboard/bootstrap/?include=user,connections,jobs,counts")["ETag"]
+            change()
+            with self.subTest(change=change):
+                self.assertEqual(self.get("/api/dashboard/bootstrap/?include=user,connections,jobs,counts", etag=etag).status_code, 200)
+
+
+@override_settings(THROTTLE_ENABLED=False, JOB_PRESCAN_ENABLED=False)
+class JobBatchTests(TestCase):
+    def setUp(self):
+        self.job = make_job()
+        self.user = self.job.user
+        self.connection = self.job.connection
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.user_id}")
+        patcher = mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, jobs):
+        return self.client.post("/api/jobs/batch/", {"jobs": jobs}, format="json")
+
+    def test_all_items_created(self):
+        response = self.post([{"connection": str(self.connection.id), "source_prefix": f"in/{i}/"} for i in range(3)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["succeeded"], response.data["failed"]), (3, 0))
+        self.assertEqual(Job.objects.filter(user=self.user).count(), 4)
+
+    def test_partial_success_reports_each_item(self):
+        foreign = make_job().connection
+        response = self.post([
+            {"connection": str(self.connection.id)},
+            {"connection": str(foreign.id)},
+            {"connection": str(uuid.uuid4())},
+            {"connection": "not-a-uuid"},
+            {"connection": str(self.connection.id), "ocr_requested": True},
+        ])
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data["succeeded"], response.data["failed"]), (2, 3))
+        results = response.data["results"]
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3, 4])
+        self.assertEqual([r["status"] for r in results], ["created", "failed", "failed", "failed", "created"])
+        for result in results[1:3]:
+            self.assertEqual(result["error"], "Invalid connection ID or unauthorized access.")
+        self.assertIn("connection", results[3]["error"])
+        self.assertTrue(results[4]["job"]["ocr_requested"])
+        self.assertFalse(Job.objects.filter(connection=foreign).exclude(user=foreign.user).exists())
+
+    def test_connections_are_checked_in_one_query(self):
+        other = Connection.objects.create(user=self.user, name="d", bucket_name="b2", aws_role_arn="arn:aws:iam::1:role/r")
+        jobs = [{"connection": str(c.id)} for c in (self.connection, other, self.connection, other)]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.post(jobs).status_code, 201)
+        self.assertEqual(sum('FROM "api_connection"' in query["sql"] for query in queries), 1)
+
+    def test_one_outbox_row_per_created_job(self):
+        response = self.post([
+            {"connection": str(self.connection.id)},
+            {"connection": str(uuid.uuid4())},
+            {"connection": str(self.connection.id)},
+        ])
+        created = [r["job"]["id"] for r in response.data["results"] if r["status"] == "created"]
+        self.assertEqual(len(created), 2)
+        outbox = list(JobOutbox.objects.filter(job__user=self.user).values_list('job_id', flat=True))
+        self.assertEqual(sorted(str(job_id) for job_id in outbox), sorted(created))
+
+    def test_rejects_empty_and_oversized_batches(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        with override_settings(JOB_BATCH_MAX_SIZE=2):
+            self.assertEqual(self.post([{"connection": str(self.connection.id)}] * 3).status_code, 400)
+        self.assertFalse(JobOutbox.objects.exists())
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class ConditionalJobListTests(TestCase):
+    def setUp(self):
+        self.job = make_job()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.job.user.user_id}")
+        patcher = mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_only_the_etag_validates(self):
+        response = self.client.get("/api/jobs/")
+        self.assertNotIn("Last-Modified", response)
+        self.assertEqual(self.client.get("/api/jobs/", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        # A far-future If-Modified-Since alone must never produce a 304
+        self.assertEqual(self.client.get("/api/jobs/", HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT").status_code, 200)
+
+    def test_changes_within_the_same_second_bust_the_etag(self):
+        make_job(user=self.job.user)
+        second = timezone.now().replace(microsecond=0)
+        Job.objects.filter(user=self.job.user).update(updated_at=second)
+        etag = self.client.get("/api/jobs/")["ETag"]
+
+        for change in (
+            # Last-Modified (whole seconds) would not move
+            lambda: Job.objects.filter(id=self.job.id).update(updated_at=second + timedelta(milliseconds=500)),
+            # Leaves the other job's timestamp as the newest again
+            lambda: Job.objects.filter(id=self.job.id).delete(),
+        ):
+            change()
+            response = self.client.get("/api/jobs/", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class JobArchiveTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.cutoff = archive_cutoff(days=30, now=self.now)
+        patcher = mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def finished_job(self, user=None, status="COMPLETED", days_ago=40):
+        return make_job(user=user, status=status, completed_at=self.now - timedelta(days=days_ago))
+
+    def test_moves_only_finished_jobs_past_the_cutoff(self):
+        completed = self.finished_job()
+        failed = self.finished_job(status="FAILED_PERMANENT")
+        # Finished before completed_at existed: updated_at decides
+        legacy = make_job(status="COMPLETED")
+        recent = self.finished_job(days_ago=1)
+        running = make_job(status="PROCESSING")
+        Job.objects.filter(id__in=[legacy.id, running.id]).update(updated_at=self.now - timedelta(days=40))
+
+        self.assertEqual(archive_jobs(self.cutoff, batch_size=2), 2)
+        self.assertEqual(archive_jobs(self.cutoff), 1)
+        self.assertEqual(archive_jobs(self.cutoff), 0)
+
+        self.assertEqual(set(Job.objects.values_list("id", flat=True)), {recent.id, running.id})
+        archived = dict(ArchivedJob.objects.values_list("id", "status"))
+        self.assertEqual(archived, {completed.id: "COMPLETED", failed.id: "FAILED_PERMANENT", legacy.id: "COMPLETED"})
+
+    def test_archived_job_keeps_its_representation_in_both_detail_views(self):
+        job = self.finished_job()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {job.user.user_id}"}
+        expected = self.client.get(f"/api/jobs/{job.id}/", **auth).json()
+        archive_jobs(self.cutoff)
+        self.assertFalse(Job.objects.filter(id=job.id).exists())
+
+        self.assertEqual(get_archived_job(job.user.user_id, job.id), expected)
+        # The async job_detail view owns the route
+        self.assertEqual(self.client.get(f"/api/jobs/{job.id}/", **auth).json(), expected)
+
+        retrieve = JobViewSet.as_view({"get": "retrieve"})
+        request = APIRequestFactory().get(f"/api/jobs/{job.id}/", **auth)
+        response = retrieve(request, pk=str(job.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, expected)
+
+        stranger = User.objects.create(email=f"{uuid.uuid4()}@example.com")
+        other = {"HTTP_AUTHORIZATION": f"Bearer {stranger.user_id}"}
+        self.assertEqual(self.client.get(f"/api/jobs/{job.id}/", **other).status_code, 404)
+        request = APIRequestFactory().get(f"/api/jobs/{job.id}/", **other)
+        self.assertEqual(retrieve(request, pk=str(job.id)).status_code, 404)
+
+    def test_export_writes_ndjson_and_purges_what_it_wrote(self):
+        jobs = [self.finished_job(), self.finished_job()]
+        archive_jobs(self.cutoff)
+        expected = {str(job.id): get_archived_job(job.user.user_id, job.id) for job in jobs}
+        out_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(out_dir.cleanup)
+
+        kept = os.path.join(out_dir.name, "kept.ndjson.gz")
+        self.assertEqual(export_archived_jobs(kept, user_ids=[jobs[0].user.user_id]), 1)
+        self.assertEqual(ArchivedJob.objects.count(), 2)
+
+        purged = os.path.join(out_dir.name, "purged.ndjson.gz")
+        self.assertEqual(export_archived_jobs(purged, purge=True, batch_size=1), 2)
+        with gzip.open(purged, "rt") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual({line["id"]: line for line in lines}, expected)
+        self.assertFalse(ArchivedJob.objects.exists())
+
+
+@override_settings(THROTTLE_ENABLED=False, JOB_PRESCAN_ENABLED=False)
+class AsyncJobCreateTests(TestCase):
+    def setUp(self):
+        self.job = make_job()
+        patcher = mock.patch("api.services.auth_service.cognito_token_verification", side_effect=lambda token: token)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def post(self, connection_id):
+        return await AsyncClient().post(
+            "/api/jobs/", {"connection": str(connection_id)}, content_type="application/json",
+            headers={"Authorization": f"Bearer {self.job.user_id}"},
+        )
+
+    def test_connection_is_loaded_once(self):
+        # Captured from sync code: the view's ORM calls run back on this thread
+        with CaptureQueriesContext(connection) as queries:
+            response = async_to_sync(self.post)(self.job.connection_id)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum('FROM "api_connection"' in query["sql"] for query in queries), 1)
+
+    async def test_foreign_and_unknown_connections_are_rejected(self):
+        foreign = await sync_to_async(make_job)()
+        for connection_id in (foreign.connection_id, uuid.uuid4()):
+            with self.subTest(connection_id=connection_id):
+                self.assertEqual((await self.post(connection_id)).status_code, 400)
+        self.assertEqual(await Job.objects.filter(user_id=self.job.user_id).acount(), 1)
+
+
+class JobStatsConsistencyTests(TestCase):
+    def snapshot(self, user):
+        stats = list(JobStatsDaily.objects.filter(user=user).values('day', 'completed', 'duration_count', 'files_processed'))
+        histogram = list(JobDurationHistogram.objects.filter(user=user).values_list('bucket', 'count'))
+        return stats, histogram
+
+    def test_incremental_stats_match_a_rebuild(self):
+        user = make_job().user
+        Job.objects.filter(user=user).delete()
+        never_started = make_job(user=user)
+        started = make_job(user=user, status="PROCESSING", started_at=timezone.now() - timedelta(seconds=90))
+        one_callback = make_job(user=user)
+        record_jobs_created([never_started, started, one_callback])
+
+        apply_progress_events([
+            {"job_id": never_started.id, "files_processed": 1, "status": "COMPLETED"},
+            {"job_id": started.id, "files_processed": 2, "status": "COMPLETED"},
+            {"job_id": one_callback.id, "files_processed": 3, "status": "PROCESSING"},
+            {"job_id": one_callback.id, "status": "COMPLETED"},
+        ])
+        incremental = self.snapshot(user)
+        rebuild_job_stats(user_ids=[user.user_id])
+
+        self.assertEqual(incremental[0][0]['duration_count'], 2)
+        self.assertEqual(self.snapshot(user), incremental)
+
+
+@override_settings(JOB_PRESCAN_ENABLED=False, JOB_FAIR_SHARE_ENABLED=False)
+class InMemoryQueueBackendTests(TestCase):
+    def test_dispatch_and_claim_in_one_process(self):
+        backend = InMemoryQueueBackend()
+        set_queue_backend(backend)
+        self.addCleanup(set_queue_backend, None)
+        job = make_job()
+        add_to_outbox(job, {"jobId": str(job.id)})
+
+        self.assertEqual(dispatch_outbox_batch()["dispatched"], 1)
+        [message] = backend.claim(max_messages=10, visibility_timeout=30)
+        self.assertEqual(message.body["jobId"], str(job.id))
+        self.assertEqual(backend.claim(), [])
+        self.assertTrue(backend.ack(message.receipt))
+        self.assertEqual(backend.depth(), 0)
+
+    def test_backends_must_implement_the_interface(self):
+        class Incomplete(QueueBackend):
+            def enqueue_batch(self, payloads):
+                return [None] * len(payloads)
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class VerifiedTokenCacheTests(TestCase):
+    def at(self, now):
+        return mock.patch("api.services.token_cache.time.time", return_value=now)
+
+    def test_entry_expires_at_the_token_exp(self):
+        cache = VerifiedTokenCache(ttl=300)
+        with self.at(1000.0):
+            cache.set("token", "user-1", exp=1060)
+        with self.at(1059.9):
+            self.assertEqual(cache.get("token"), "user-1")
+        with self.at(1060.0):
+            self.assertIsNone(cache.get("token"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_entry_expires_after_the_ttl_when_exp_is_later(self):
+        cache = VerifiedTokenCache(ttl=300)
+        with self.at(1000.0):
+            cache.set("token", "user-1", exp=5000)
+        with self.at(1300.0):
+            self.assertIsNone(cache.get("token"))
+
+    def test_expired_tokens_are_not_cached(self):
+        cache = VerifiedTokenCache()
+        with self.at(1000.0):
+            cache.set("token", "user-1", exp=999)
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_evicts_least_recently_used_at_the_bound(self):
+        cache = VerifiedTokenCache(maxsize=2)
+        cache.set("a", "user-a")
+        cache.set("b", "user-b")
+        cache.get("a")
+        cache.set("c", "user-c")
+        self.assertEqual([cache.peek(token) for token in ("a", "b", "c")], ["user-a", None, "user-c"])
+        stats = cache.stats()
+        self.assertEqual((stats["size"], stats["evictions"], stats["hits"]), (2, 1, 1))
+
+    @override_settings(METRICS_TOKEN="scrape-secret", METRICS_MULTIPROC_DIR=None)
+    def test_stats_are_exported_as_metrics(self):
+        cache = get_token_cache()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        cache.set("token", "user-1")
+        cache.get("token")
+        with mock.patch("api.services.health_check.MONITOR", HealthMonitor({})):
+            body = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret").content.decode()
+        self.assertIn("token_cache_entries 1\n", body)
+        self.assertIn('token_cache_events_total{event="hit"}', body)
+        self.assertIn("# TYPE jwks_keys gauge", body)
+
+
+class JWKSKeyStoreTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub = StubJWKS.from_settings().start()
+        cls.addClassCleanup(cls.stub.stop)
+
+    def setUp(self):
+        self.stub.status = 200
+        self.stub.latency = 0.0
+        self.stub.fetches = 0
+        self.clock = [1000.0]
+
+    def store(self, **kwargs):
+        store = JWKSKeyStore(self.stub.url, timeout=2, **kwargs)
+        # Only the store's clock is faked; the stub server keeps real time
+        patcher = mock.patch("api.services.jwks_store.time", monotonic=lambda: self.clock[0], perf_counter=time.perf_counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return store
+
+    def test_unknown_kid_triggers_a_refresh(self):
+        store = self.store(min_refresh_interval=30)
+        old_kid = self.stub.kid
+        self.assertIsNotNone(store.get_public_key(old_kid))
+
+        self.stub.rotate("rotated-key")
+        self.clock[0] += 30
+        self.assertIsNotNone(store.get_public_key("rotated-key"))
+        self.assertIsNone(store.get_public_key(old_kid))
+        self.assertEqual(self.stub.fetches, 2)
+
+    def test_unknown_kid_refreshes_are_rate_limited(self):
+        store = self.store(min_refresh_interval=30)
+        store.warm()
+        for fetches in (1, 1, 1, 2, 2):
+            self.assertIsNone(store.get_public_key("forged-kid"))
+            # At most one refresh per 30 seconds, however many forged kids arrive
+            self.assertEqual(self.stub.fetches, fetches)
+            self.clock[0] += 10
+
+    def test_concurrent_refreshes_share_one_fetch(self):
+        self.stub.latency = 0.2
+        store = self.store()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.refresh())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [True] * 5)
+        self.assertEqual(self.stub.fetches, 1)
+
+    def test_failed_fetches_are_negatively_cached_with_backoff(self):
+        self.stub.status = 503
+        store = self.store(backoff_base=1, backoff_max=3)
+
+        self.assertFalse(store.refresh())
+        self.assertFalse(store.refresh())
+        self.assertEqual(self.stub.fetches, 1)
+        self.assertEqual(store.stats()["backoff_remaining"], 1)
+
+        for expected_backoff in (2, 3, 3):
+            self.clock[0] += store.stats()["backoff_remaining"]
+            self.assertFalse(store.refresh())
+            self.assertEqual(store.stats()["backoff_remaining"], expected_backoff)
+        self.assertEqual(self.stub.fetches, 4)
+
+        self.stub.status = 200
+        self.clock[0] += 3
+        self.assertTrue(store.refresh())
+        self.assertEqual(store.stats()["failures"], 4)
+        self.assertIsNone(store.stats()["last_error"])
+
+    def test_stale_keys_are_kept_while_refreshes_fail(self):
+        store = self.store(ttl=60)
+        store.warm()
+        self.stub.status = 503
+        self.clock[0] += 60
+        self.assertIsNotNone(store.get_public_key(self.stub.kid))
+        self.assertEqual(self.stub.fetches, 2)
+
+    def test_warm_at_boot_leaves_verification_offline(self):
+        with override_settings(COGNITO_JWKS_URL=self.stub.url):
+            auth_service.reset_auth_state()
+            self.addCleanup(auth_service.reset_auth_state)
+            self.assertTrue(auth_service.warm_jwks())
+            self.stub.status = 503
+            token = self.stub.mint_token("user-1")
+            self.assertEqual(auth_service.cognito_token_verification(token), "user-1")
+        self.assertEqual(self.stub.fetches, 1)
+
+
+class TokenBucketTests(TestCase):
+    def test_take_from_refills_up_to_capacity(self):
+        self.assertEqual(throttling.take_from(0.0, 0.0, 100.0, capacity=5, rate=1), (True, 4.0, 0.0))
+        self.assertEqual(throttling.take_from(1.0, 10.0, 11.5, capacity=5, rate=2), (True, 3.0, 0.0))
+
+    def test_take_from_denies_with_time_to_next_token(self):
+        allowed, tokens, retry_after = throttling.take_from(0.25, 10.0, 10.0, capacity=5, rate=0.5)
+        self.assertFalse(allowed)
+        self.assertEqual(tokens, 0.25)
+        self.assertEqual(retry_after, 1.5)
+
+    def drain(self, store, clock, key="k"):
+        results = []
+        for now in clock:
+            with mock.patch("api.throttling.time.time", return_value=now), \
+                    mock.patch("api.throttling.time.monotonic", return_value=now):
+                results.append(store.take(key, 2, 0.5))
+        return results
+
+    def assert_bucket(self, store):
+        # Capacity 2, one token every 2 seconds
+        results = self.drain(store, [1000.0, 1000.0, 1000.0, 1001.0, 1002.0, 1002.0])
+        self.assertEqual([allowed for allowed, _ in results], [True, True, False, False, True, False])
+        self.assertAlmostEqual(results[2][1], 2.0)
+        self.assertAlmostEqual(results[3][1], 1.0)
+        self.assertAlmostEqual(results[5][1], 2.0)
+
+    def test_local_store(self):
+        self.assert_bucket(throttling.LocalBucketStore())
+
+    def test_local_store_drops_least_recently_used_buckets(self):
+        store = throttling.LocalBucketStore(maxsize=2)
+        for key in ("a", "b", "a", "c"):
+            store.take(key, 2, 0.5)
+        self.assertEqual(list(store._buckets), ["a", "c"])
+
+    def test_cache_store(self):
+        store = throttling.CacheBucketStore()
+        store.cache.clear()
+        self.assert_bucket(store)
+
+    def test_database_store_upsert(self):
+        store = throttling.DatabaseBucketStore()
+        self.assert_bucket(store)
+        bucket = RateLimitBucket.objects.get(key="k")
+        # The last (denied) take leaves the row as the last allowed one wrote it
+        self.assertAlmostEqual(bucket.tokens, 0.0)
+        self.assertEqual(bucket.updated_at, 1002.0)
+
+    def test_database_store_keeps_buckets_apart(self):
+        store = throttling.DatabaseBucketStore()
+        self.drain(store, [1000.0, 1000.0, 1000.0], key="a")
+        self.assertEqual(self.drain(store, [1000.0], key="b"), [(True, 0.0)])
+        self.assertEqual(RateLimitBucket.objects.count(), 2)
+
+
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_READ_STORE="local",
+    THROTTLE_BUCKETS={
+        "default.read": {"capacity": 2, "per_second": 0.001},
+        "default.write": {"capacity": 2, "per_second": 0.001},
+        "jobs.read": {"capacity": 2, "per_second": 0.001},
+        "jobs.write": {"capacity": 2, "per_second": 0.001},
+    },
+)
+class ThrottleBeforeAuthenticationTests(TestCase):
+    def setUp(self):
+        throttling._stores.clear()
+        self.addCleanup(throttling._stores.clear)
+        get_token_cache().clear()
+        self.addCleanup(get_token_cache().clear)
+        patcher = mock.patch("api.services.auth_service._verify_token", return_value=None)
+        self.verify = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalid_tokens_are_throttled_before_verification(self):
+        for path in ("/api/users/me/", "/api/jobs/", "/api/dashboard/bootstrap/"):
+            with self.subTest(path=path):
+                throttling._stores.clear()
+                self.verify.reset_mock()
+                client = APIClient(REMOTE_ADDR="203.0.113.9")
+                client.credentials(HTTP_AUTHORIZATION="Bearer not-a-valid-token")
+                statuses = [client.get(path).status_code for _ in range(4)]
+                self.assertNotIn(429, statuses[:2])
+                self.assertEqual(statuses[2:], [429, 429])
+                self.assertEqual(self.verify.call_count, 2)
+
+    def test_ident_is_the_user_of_a_verified_token_else_the_ip(self):
+        get_token_cache().set("verified-token", "user-1")
+        request = mock.Mock(headers={"Authorization": "Bearer verified-token"}, META={"REMOTE_ADDR": "203.0.113.9"})
+        self.assertEqual(throttling.throttle_ident(request), "user:user-1")
+        request.headers = {"Authorization": "Bearer unknown-token"}
+        self.assertEqual(throttling.throttle_ident(request), "ip:203.0.113.9")
+
+    def test_client_ip_comes_from_the_load_balancer(self):
+        request = mock.Mock(headers={}, META={"REMOTE_ADDR": "10.0.0.5", "HTTP_X_FORWARDED_FOR": "1.2.3.4, 203.0.113.9"})
+        # The caller can prepend anything; the ALB appends the address it saw
+        self.assertEqual(throttling.throttle_ident(request), "ip:203.0.113.9")
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        # Probes run only when a test calls run_probe, never from threads
+        self.monitor = HealthMonitor({})
+        self.monitor.ensure_started = lambda: None
+        patcher = mock.patch("api.services.health_check.MONITOR", self.monitor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scrape(self):
+        return self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret").content.decode()
+
+    def test_hidden_without_a_token(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get("/api/metrics/").status_code, 404)
+
+    @override_settings(METRICS_TOKEN="scrape-secret")
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+        self.assertEqual(self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        response = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+
+    @override_settings(METRICS_TOKEN="scrape-secret", METRICS_MULTIPROC_DIR=None)
+    def test_queue_depth_comes_from_the_probe(self):
+        depth = {"value": 7}
+        self.monitor.probes["queue"] = lambda: {"backend": "sqs", "depth": depth["value"]}
+        self.monitor.run_probe("queue")
+        with mock.patch("api.services.queue_backends.get_queue_backend") as get_backend:
+            depth["value"] = 9
+            self.assertIn('job_queue_depth{backend="sqs"} 7\n', self.scrape())
+            self.monitor.run_probe("queue")
+            self.assertIn('job_queue_depth{backend="sqs"} 9\n', self.scrape())
+        get_backend.assert_not_called()
+
+    @override_settings(METRICS_TOKEN="scrape-secret", METRICS_MULTIPROC_DIR=None, HEALTH_PROBE_STALE_AFTER=30)
+    def test_queue_depth_is_dropped_when_the_probe_fails_or_goes_stale(self):
+        def failing_probe():
+            raise ConnectionError("no credentials")
+
+        self.monitor.probes["queue"] = lambda: {"backend": "sqs", "depth": 7}
+        self.monitor.run_probe("queue")
+        with mock.patch("api.services.health_check.time.time", return_value=time.time() + 31):
+            self.assertNotIn("job_queue_depth{", self.scrape())
+
+        self.monitor.probes["queue"] = failing_probe
+        with self.assertLogs("api.services.health_check", "WARNING"):
+            self.monitor.run_probe("queue")
+        body = self.scrape()
+        self.assertIn("# TYPE job_queue_depth gauge", body)
+        self.assertNotIn("job_queue_depth{", body)
+
+
+class ReadinessTests(TestCase):
+    def test_hides_probe_errors(self):
+        def failing_probe():
+            raise ConnectionError("could not connect to db.internal.example:5432")
+
+        monitor = HealthMonitor({"database": failing_probe})
+        monitor.ensure_started = lambda: None
+        with self.assertLogs("api.services.health_check", "WARNING") as logs:
+            monitor.run_probe("database")
+        self.assertIn("db.internal.example", logs.output[0])
+
+        with mock.patch("api.services.health_check.MONITOR", monitor), \
+                override_settings(HEALTH_REQUIRED_CHECKS=["database"]):
+            response = self.client.get("/api/health/ready/")
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn(b"db.internal.example", response.content)
+        self.assertEqual(set(response.json()["checks"]["database"]), {"ok", "latency_ms", "age_seconds"})
+
+
+class BackgroundQueueHandlerTests(TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = BackgroundQueueHandler(stream=self.stream)
+        self.handler.addFilter(CorrelationIdFilter())
+        self.addCleanup(self.handler.close)
+        self.logger = logging.getLogger("tests.background_queue")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def lines(self):
+        self.handler.flush()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_flush_drains_without_stopping_the_listener(self):
+        with mock.patch("core.log.atexit.register") as register:
+            self.logger.info("first")
+            listener = self.handler._listener
+            self.assertEqual([line["message"] for line in self.lines()], ["first"])
+            self.logger.info("second")
+            self.assertEqual([line["message"] for line in self.lines()], ["first", "second"])
+        self.assertIs(self.handler._listener, listener)
+        self.assertTrue(listener._thread.is_alive())
+        register.assert_called_once_with(self.handler.stop)
+
+    def test_close_writes_what_is_queued(self):
+        self.logger.info("last words")
+        self.handler.close()
+        self.assertIsNone(self.handler._listener)
+        self.assertIn("last words", self.stream.getvalue())
+
+    def test_redacts_role_arns_buckets_and_sensitive_keys(self):
+        self.logger.info(
+            "Assuming arn:aws:iam::123456789012:role/customer-role for s3://customer-bucket/key",
+            extra={"bucket_name": "customer-bucket", "details": {"aws_role_arn": "arn:aws:iam::123456789012:role/x"}},
+        )
+        [line] = self.lines()
+        self.assertNotIn("123456789012", json.dumps(line))
+        self.assertNotIn("customer-bucket", json.dumps(line))
+        self.assertEqual(line["message"], "Assuming arn:aws:iam::[redacted] for s3://[redacted]/key")
+        self.assertEqual(line["bucket_name"], "[redacted]")
+        self.assertEqual(line["details"], {"aws_role_arn": "[redacted]"})
+
+    def test_records_carry_the_correlation_id_of_their_scope(self):
+        with correlation_scope("req-1"):
+            self.logger.info("inside")
+        self.logger.info("outside")
+        inside, outside = self.lines()
+        self.assertEqual(inside["correlation_id"], "req-1")
+        self.assertNotIn("correlation_id", outside)
+
+
+class SamplingFilterTests(TestCase):
+    def record(self, name, level=logging.INFO):
+        return logging.LogRecord(name, level, __file__, 0, "message", None, None)
+
+    def test_longest_prefix_wins(self):
+        sampling = SamplingFilter({"api": 0.5, "api.services": 0, "api.services.auth_service": 1})
+        self.assertEqual(sampling.rate_for("api.views.job_async"), 0.5)
+        self.assertEqual(sampling.rate_for("api.services.outbox"), 0)
+        self.assertEqual(sampling.rate_for("api.services.auth_service"), 1)
+        self.assertEqual(sampling.rate_for("api.servicesx"), 0.5)
+        self.assertEqual(sampling.rate_for("django.request"), 1.0)
+
+    def test_samples_info_and_keeps_warnings(self):
+        sampling = SamplingFilter({"api": 0.25})
+        with mock.patch("core.log.random.random", side_effect=[0.1, 0.3]):
+            self.assertTrue(sampling.filter(self.record("api.views")))
+            self.assertFalse(sampling.filter(self.record("api.views")))
+        self.assertTrue(SamplingFilter({"api": 0}).filter(self.record("api.views", logging.WARNING)))
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class CorrelationIdMiddlewareTests(TestCase):
+    def test_echoes_a_valid_request_id_and_replaces_an_invalid_one(self):
+        response = self.client.get("/api/health/live/", HTTP_X_REQUEST_ID="job-42:attempt.1")
+        self.assertEqual(response["X-Request-ID"], "job-42:attempt.1")
+        response = self.client.get("/api/health/live/", HTTP_X_REQUEST_ID="not valid\nid")
+        self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
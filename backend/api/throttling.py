@@ -0,0 +1,235 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+from api.models import RateLimitBucket
+from api.services.auth_service import cached_token_user_id
+
+logger = logging.getLogger(__name__)
+
+
+def refill(tokens, updated_at, now, capacity, rate):
+    """
+    Tokens in a bucket last left at tokens at updated_at, refilled at rate per second up to capacity.
+    """
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+def take_from(tokens, updated_at, now, capacity, rate):
+    """
+    Refill, then take one token if there is one. Returns (allowed, tokens left, retry_after seconds).
+    """
+    tokens = refill(tokens, updated_at, now, capacity, rate)
+    if tokens < 1:
+        return False, tokens, (1 - tokens) / rate
+    return True, tokens - 1, 0.0
+
+
+class DatabaseBucketStore:
+    """
+    Token buckets in the app database, shared by every process.
+    Refill, check and take happen in one INSERT ... ON CONFLICT DO UPDATE ... WHERE
+    statement, so concurrent requests cannot overspend a bucket; only a rejected
+    request costs a second query (to compute Retry-After).
+    """
+    blocking = True
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        table = connection.ops.quote_name(RateLimitBucket._meta.db_table)
+        key_column = connection.ops.quote_name("key")
+        # Tokens after refilling for the time since the last take, capped at capacity
+        refilled = f"{table}.tokens + (%s - {table}.updated_at) * %s"
+        available = f"CASE WHEN {refilled} > %s THEN %s ELSE {refilled} END"
+        sql = (
+            f"INSERT INTO {table} ({key_column}, tokens, updated_at) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({key_column}) DO UPDATE SET tokens = {available} - 1, updated_at = %s "
+            f"WHERE {available} >= 1 "
+            f"RETURNING tokens"
+        )
+        params = [
+            key, capacity - 1, now,
+            now, rate, capacity, capacity, now, rate, now,
+            now, rate, capacity, capacity, now, rate,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            if cursor.fetchone() is not None:
+                return True, 0.0
+            cursor.execute(f"SELECT tokens, updated_at FROM {table} WHERE {key_column} = %s", [key])
+            tokens, updated_at = cursor.fetchone()
+
+        return False, (1 - refill(tokens, updated_at, now, capacity, rate)) / rate
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a Django cache. Shared across processes when the cache is
+    (Redis, Memcached, database cache); per process with the default local-memory cache.
+    Read-modify-write is not atomic, so concurrent bursts can slightly overspend.
+    """
+    blocking = True
+
+    def __init__(self, alias="default"):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        tokens, updated_at = self.cache.get(key) or (capacity, now)
+        allowed, tokens, retry_after = take_from(tokens, updated_at, now, capacity, rate)
+        # Idle buckets expire once they would have refilled anyway
+        self.cache.set(key, (tokens, now), int(capacity / rate) + 1)
+        return allowed, retry_after
+
+
+class LocalBucketStore:
+    """
+    Token buckets in process memory: exact and free of I/O, but per process, so with
+    N workers a client can spend up to N times a bucket. The least recently used
+    buckets are dropped beyond maxsize (they would be full again soon anyway).
+    """
+    blocking = False
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            allowed, tokens, retry_after = take_from(tokens, updated_at, now, capacity, rate)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+BUCKET_STORES = {"database": DatabaseBucketStore, "cache": CacheBucketStore, "local": LocalBucketStore}
+
+_stores = {}
+
+
+def get_bucket_store(kind="write"):
+    """
+    The store for "read" or "write" buckets (THROTTLE_READ_STORE / THROTTLE_STORE).
+    """
+    backend = settings.THROTTLE_READ_STORE if kind == "read" else settings.THROTTLE_STORE
+    if backend not in _stores:
+        _stores[backend] = BUCKET_STORES[backend]()
+    return _stores[backend]
+
+
+def get_bucket(method, throttle_scope='default'):
+    """
+    (scope, bucket settings) for a request method against a view's throttle_scope.
+    """
+    kind = "read" if method in ("GET", "HEAD", "OPTIONS") else "write"
+    scope = f"{throttle_scope}.{kind}"
+    buckets = settings.THROTTLE_BUCKETS
+    return scope, buckets.get(scope) or buckets[f"default.{kind}"]
+
+
+def _store_for(scope):
+    return get_bucket_store(scope.rsplit(".", 1)[1])
+
+
+def take_token(scope, bucket, ident):
+    """
+    Take a token from ident's bucket for scope. Returns (allowed, retry_after seconds).
+    """
+    allowed, retry_after = _store_for(scope).take(
+        f"throttle:{scope}:{ident}", bucket["capacity"], bucket["per_second"]
+    )
+    if not allowed:
+        logger.warning("Throttled %s for %s, retry after %.1fs", scope, ident, retry_after)
+    return allowed, retry_after
+
+
+_ip_throttle = BaseThrottle()
+
+
+def throttle_ident(request):
+    """
+    Bucket owner, known before authentication: the user of a bearer token that was
+    already verified (from the token cache, no verification), else the client IP.
+    So unverified and invalid tokens are limited per IP before they cost a verification.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        user_id = cached_token_user_id(auth_header[len("Bearer "):])
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{_ip_throttle.get_ident(request)}"
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per caller per endpoint class.
+    The class is the view's throttle_scope plus "read" for safe methods or "write" otherwise
+    (e.g. "jobs.write"); capacity and refill rate come from settings.THROTTLE_BUCKETS, falling
+    back to "default.read" / "default.write". The caller is the user of an already verified
+    token, else the client IP (see throttle_ident). Rejections get a 429 with Retry-After.
+    Views run it before authentication through ThrottleFirstMixin.
+    """
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        scope, bucket = get_bucket(request.method, getattr(view, 'throttle_scope', 'default'))
+        allowed, self.retry_after = take_token(scope, bucket, throttle_ident(request))
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class ThrottleFirstMixin:
+    """
+    Runs the view's throttles before its permission checks, which is where TokenRequired
+    verifies the token and looks the user up. DRF's default order is the reverse, so
+    rejected and badly authenticated requests would still pay for a verification.
+    """
+
+    def check_permissions(self, request):
+        super().check_throttles(request)
+        super().check_permissions(request)
+
+    def check_throttles(self, request):
+        # Already run by check_permissions
+        pass
+
+
+async def athrottle(request, throttle_scope):
+    """
+    TokenBucketThrottle for async views, to be awaited before authentication.
+    Returns a 429 response, or None if the request may proceed.
+    """
+    if not settings.THROTTLE_ENABLED:
+        return None
+
+    scope, bucket = get_bucket(request.method, throttle_scope)
+    ident = throttle_ident(request)
+    if _store_for(scope).blocking:
+        allowed, retry_after = await sync_to_async(take_token)(scope, bucket, ident)
+    else:
+        allowed, retry_after = take_token(scope, bucket, ident)
+    if allowed:
+        return None
+
+    wait = math.ceil(retry_after)
+    response = JsonResponse({"detail": f"Request was throttled. Expected available in {wait} seconds."}, status=429)
+    response["Retry-After"] = str(wait)
+    return response
@@ -1,14 +1,34 @@
 from rest_framework.routers import DefaultRouter
+from django.conf import settings
 from django.urls import path, include
-from api.views import UserViewSet, JobViewSet, ConnectionViewSet
-from api.services.health_check import health_check
+from api.views import UserViewSet, JobViewSet, ConnectionViewSet, WorkerProgressViewSet, WorkerManifestViewSet, WorkerQueueViewSet, DashboardViewSet
+from api.services.health_check import health_check, liveness, readiness
+from api.views.job_async import job_detail, jobs_collection
+from api.views.job_stream import job_status_stream
+from api.views.metrics import metrics
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'jobs', JobViewSet, basename='job')
 router.register(r'connections', ConnectionViewSet, basename='connection')
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
+router.register(r'worker/progress', WorkerProgressViewSet, basename='worker-progress')
+router.register(r'worker/manifests', WorkerManifestViewSet, basename='worker-manifest')
+router.register(r'worker/queue', WorkerQueueViewSet, basename='worker-queue')
 
 urlpatterns = [
+    # Must precede the router, which would otherwise treat "stream" as a job ID
+    path('jobs/stream/', job_status_stream, name='job-stream'),
     path('', include(router.urls)),
-    path('health/', health_check)
-]
\ No newline at end of file
+    path('health/', health_check),
+    path('health/live/', liveness, name='health-live'),
+    path('health/ready/', readiness, name='health-ready'),
+    path('metrics/', metrics, name='metrics'),
+]
+
+if settings.JOB_API_ASYNC:
+    # Async list / create / status views take over these two routes from the router
+    urlpatterns[1:1] = [
+        path('jobs/', jobs_collection, name='job-list-async'),
+        path('jobs/<uuid:pk>/', job_detail, name='job-detail-async'),
+    ]
\ No newline at end of file
@@ -1,4 +1,6 @@
 from .user_viewset import UserViewSet
 from .job_viewset import JobViewSet
 # from .credittransaction_viewset import CreditTransactionViewSet
-from .connection_viewset import ConnectionViewSet
\ No newline at end of file
+from .connection_viewset import ConnectionViewSet
+from .worker_viewset import WorkerProgressViewSet, WorkerManifestViewSet, WorkerQueueViewSet
+from .dashboard_viewset import DashboardViewSet
\ No newline at end of file
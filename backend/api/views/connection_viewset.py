@@ -3,8 +3,10 @@ from rest_framework import serializers
 from api.models import Connection, User
 from api.serializers import ConnectionSerializer
 from api.permission import TokenRequired
+from api.throttling import ThrottleFirstMixin
+from api.services.conditional import compute_validators, conditional_response, scope_key, set_validators
 
-class ConnectionViewSet(viewsets.ModelViewSet):
+class ConnectionViewSet(ThrottleFirstMixin, viewsets.ModelViewSet):
     serializer_class = ConnectionSerializer
     permission_classes = [TokenRequired]
 
@@ -12,7 +14,22 @@ class ConnectionViewSet(viewsets.ModelViewSet):
         """
         Only return connections owned by the authenticated user.
         """
-        return Connection.objects.filter(user__user_id=self.request.token_user_id)
+        return Connection.objects.filter(user__user_id=self.request.token_user_id).select_related('user')
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET /connections/ — Honours If-None-Match with a 304.
+        """
+        etag = compute_validators(
+            self.get_queryset(), scope_key(request),
+            timestamp_fields=('updated_at', 'user__updated_at'),
+        )
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag)
 
     def perform_create(self, serializer):
         """
@@ -0,0 +1,125 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from django.db.models import Count
+
+from api.models import Connection, Job, User
+from api.pagination import JobKeysetPagination
+from api.permission import TokenRequired
+from api.serializers import ConnectionSerializer, JobRowSerializer, UserSerializer
+from api.services.conditional import (
+    combine_validators,
+    compute_validators,
+    conditional_response,
+    scope_key,
+    set_validators,
+)
+from api.throttling import ThrottleFirstMixin
+from api.views.job_viewset import filter_job_queryset
+
+
+class DashboardViewSet(ThrottleFirstMixin, viewsets.ViewSet):
+    """
+    Aggregated reads for the dashboard shell.
+    """
+    permission_classes = [TokenRequired]
+
+    SECTIONS = {'user', 'connections', 'jobs', 'counts'}
+    DEFAULT_SECTIONS = {'user', 'connections', 'jobs'}
+
+    @action(detail=False, methods=['get'])
+    def bootstrap(self, request):
+        """
+        GET /dashboard/bootstrap/ — The user, their connections and the first page of jobs
+        in one authenticated request, instead of three.
+        ?include=user,connections,jobs,counts selects sections (default: user,connections,jobs);
+        e.g. the sidebar can ask for ?include=counts only.
+        ?page_size= and the /jobs/ filters apply to the jobs section.
+        Honours If-None-Match with a 304. The validators combine one
+        aggregate per data source behind the selected sections (at most 4 queries), so an
+        unchanged refresh loads and serializes nothing.
+        Full response query budget: the validators, plus one query per selected section
+        and one more for counts (user 1, connections 1, jobs 1, counts 2 — at most 5).
+        """
+        include = request.query_params.get('include')
+        sections = {s.strip() for s in include.split(',') if s.strip()} if include else self.DEFAULT_SECTIONS
+        unknown = sections - self.SECTIONS
+        if unknown:
+            return Response(
+                {"error": f"Unknown section(s): {', '.join(sorted(unknown))}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        user_id = request.token_user_id
+        etag = self._validators(request, user_id, sections)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = {}
+
+        user = None
+        if 'user' in sections or 'connections' in sections:
+            try:
+                user = User.objects.get(user_id=user_id)
+            except User.DoesNotExist:
+                return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+        if 'user' in sections:
+            data['user'] = UserSerializer(user).data
+
+        if 'connections' in sections:
+            connections = list(Connection.objects.filter(user=user).order_by('name'))
+            for connection in connections:
+                # Already loaded; avoids a join or a query per connection for user_email
+                connection.user = user
+            data['connections'] = ConnectionSerializer(connections, many=True).data
+
+        if 'jobs' in sections:
+            paginator = JobKeysetPagination()
+            jobs = filter_job_queryset(Job.objects.filter(user_id=user_id), request.query_params)
+            rows = JobRowSerializer.with_list_values(jobs)
+            page = paginator.paginate_queryset(rows, request)
+            data['jobs'] = {
+                'next': paginator.get_next_link(),
+                'next_cursor': paginator.next_cursor,
+                'results': JobRowSerializer.many(page),
+            }
+            if paginator.total is not None:
+                data['jobs']['count'] = paginator.total
+
+        if 'counts' in sections:
+            by_status = dict(
+                Job.objects.filter(user_id=user_id)
+                .order_by()
+                .values_list('status')
+                .annotate(n=Count('id'))
+            )
+            data['counts'] = {
+                'connections': Connection.objects.filter(user_id=user_id).count(),
+                'jobs': sum(by_status.values()),
+                'jobs_by_status': {choice: by_status.get(choice, 0) for choice, _ in Job.STATUS_CHOICES},
+            }
+
+        return set_validators(Response(data), etag)
+
+    def _validators(self, request, user_id, sections):
+        """
+        Validators over every row the selected sections are built from. The scope key
+        carries ?include= and the job filters, so each combination validates separately.
+        """
+        scopes = []
+        if 'user' in sections:
+            scopes.append((User.objects.filter(user_id=user_id), ('updated_at',)))
+        if 'connections' in sections or 'counts' in sections:
+            scopes.append((Connection.objects.filter(user_id=user_id), ('updated_at', 'user__updated_at')))
+        if 'jobs' in sections:
+            jobs = filter_job_queryset(Job.objects.filter(user_id=user_id), request.query_params)
+            scopes.append((jobs, ('updated_at', 'connection__updated_at', 'user__updated_at')))
+        if 'counts' in sections:
+            scopes.append((Job.objects.filter(user_id=user_id), ('updated_at',)))
+
+        scope = scope_key(request)
+        return combine_validators(scope, [
+            compute_validators(queryset, scope, timestamp_fields=fields) for queryset, fields in scopes
+        ])
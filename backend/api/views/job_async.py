@@ -0,0 +1,162 @@
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.models import Job, User
+from api.pagination import JobKeysetPagination
+from api.serializers import JobRowSerializer, JobSerializer
+from api.services.auth_service import aget_user_id_from_request_token
+from api.services.conditional import acompute_validators, conditional_response, scope_key, set_validators
+from api.services.job_archive import aget_archived_job
+from api.services.job_submission import create_job
+from api.throttling import athrottle
+from api.views.job_viewset import JobViewSet, filter_job_queryset
+
+logger = logging.getLogger(__name__)
+
+# Served by these views when JOB_API_ASYNC is on; everything else under /jobs/ stays on JobViewSet
+COLLECTION_METHODS = ("GET", "HEAD", "POST", "OPTIONS")
+DETAIL_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def _error(detail, status):
+    # ValidationError details may be a dict or a list
+    return JsonResponse(detail, status=status, safe=False)
+
+
+def _json(data, status=200):
+    # DRF's encoder, so durations and decimals render exactly as they do from JobViewSet
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+def _options(allowed):
+    response = HttpResponse()
+    response["Allow"] = ", ".join(allowed)
+    return response
+
+
+async def _authenticate(request):
+    """
+    Take a token from the caller's "jobs" bucket, then verify the bearer token.
+    Returns an error response, or None with request.token_user_id set.
+    """
+    # Throttled first, so rejected and invalid tokens never cost a verification
+    error_response = await athrottle(request, JobViewSet.throttle_scope)
+    if error_response:
+        return error_response
+    user_id, error_response = await aget_user_id_from_request_token(request)
+    if error_response:
+        return error_response
+    request.token_user_id = user_id
+    return None
+
+
+async def _list_jobs(request, user_id):
+    queryset = Job.objects.filter(user__user_id=user_id).order_by('-created_at')
+    try:
+        queryset = filter_job_queryset(queryset, request.GET)
+
+        etag = await acompute_validators(
+            queryset, scope_key(request),
+            timestamp_fields=('updated_at', 'connection__updated_at', 'user__updated_at'),
+        )
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        paginator = JobKeysetPagination()
+        page = await paginator.apaginate_queryset(JobRowSerializer.with_list_values(queryset), request)
+    except ValidationError as e:
+        return _error(e.detail, 400)
+
+    response = _json(paginator.get_paginated_payload(JobRowSerializer.many(page)))
+    return set_validators(response, etag)
+
+
+def _save_job(serializer, user, connection, data):
+    create_job(serializer, user, connection, data)
+    return serializer.data
+
+
+async def _create_job(request, user_id):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError as e:
+        return _error({"detail": f"JSON parse error - {e}"}, 400)
+    if not isinstance(data, dict):
+        return _error({"non_field_errors": ["Invalid data. Expected a dictionary."]}, 400)
+
+    logger.info("Creating job", extra={"user_id": user_id, "connection_id": data.get("connection")})
+
+    # Field validation looks the connection up, so it runs off the event loop
+    serializer = JobSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return _error(serializer.errors, 400)
+
+    # Loaded by the field validation above; only ownership is left to check
+    connection = serializer.validated_data.get("connection")
+    if connection is None or str(connection.user_id) != str(user_id):
+        logger.info("Invalid connection ID or unauthorized access", extra={"user_id": user_id})
+        return _error(["Invalid connection ID or unauthorized access."], 400)
+
+    user = await User.objects.filter(user_id=user_id).afirst()
+    if user is None:
+        return _error(["Invalid user."], 400)
+
+    return _json(await sync_to_async(_save_job)(serializer, user, connection, data), status=201)
+
+
+@csrf_exempt
+async def jobs_collection(request):
+    """
+    /jobs/ on the ASGI path — GET lists the caller's jobs and POST creates one,
+    with the same filters, pagination, validators and responses as JobViewSet.
+    """
+    error_response = await _authenticate(request)
+    if error_response:
+        return error_response
+
+    if request.method not in COLLECTION_METHODS:
+        return _error({"detail": f'Method "{request.method}" not allowed.'}, 405)
+    if request.method == "OPTIONS":
+        return _options(COLLECTION_METHODS)
+    if request.method == "POST":
+        return await _create_job(request, request.token_user_id)
+    return await _list_jobs(request, request.token_user_id)
+
+
+@csrf_exempt
+async def job_detail(request, pk):
+    """
+    GET /jobs/{id}/ on the ASGI path — one of the caller's jobs, e.g. to poll its status.
+    """
+    error_response = await _authenticate(request)
+    if error_response:
+        return error_response
+
+    if request.method in ("PUT", "PATCH"):
+        return _error({"error": "Updates are not allowed."}, 405)
+    if request.method == "DELETE":
+        return _error({"error": "Deletes are not allowed."}, 405)
+    if request.method not in DETAIL_METHODS:
+        return _error({"detail": f'Method "{request.method}" not allowed.'}, 405)
+    if request.method == "OPTIONS":
+        return _options(DETAIL_METHODS)
+
+    job = await (
+        Job.objects
+        .filter(id=pk, user__user_id=request.token_user_id)
+        .select_related('user', 'connection')
+        .afirst()
+    )
+    if job is None:
+        archived = await aget_archived_job(request.token_user_id, pk)
+        if archived is None:
+            return _error({"detail": "No Job matches the given query."}, 404)
+        return _json(archived)
+    return _json(JobSerializer(job).data)
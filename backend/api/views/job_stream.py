@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from api.services.auth_service import aget_user_id_from_request_token
+from api.services.job_events import (
+    CATCH_UP_LIMIT,
+    Subscriber,
+    decode_cursor,
+    fetch_catch_up,
+    get_broadcaster,
+)
+from api.throttling import athrottle
+
+THROTTLE_SCOPE = "stream"
+
+
+def _format_event(event_id, data, event="job"):
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def _event_stream(user_id, cursor):
+    broadcaster = get_broadcaster()
+    since = decode_cursor(cursor) if cursor else None
+    subscriber = Subscriber(user_id, since=since)
+    # Subscribe before catching up so nothing committed in between is missed
+    broadcaster.subscribe(subscriber)
+    try:
+        yield "retry: 3000\n\n"
+
+        if since is not None:
+            rows = await sync_to_async(fetch_catch_up)(user_id, since)
+            if len(rows) > CATCH_UP_LIMIT:
+                # Too far behind to replay; the client should reload the job list
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                for row in rows:
+                    change = subscriber.diff(row)
+                    if change is not None:
+                        yield _format_event(*change)
+
+        while not subscriber.overflowed:
+            try:
+                event_id, data, event = await asyncio.wait_for(
+                    subscriber.queue.get(), timeout=settings.JOB_STREAM_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # Comment line keeps idle connections open through the load balancer
+                yield ": keepalive\n\n"
+                continue
+            yield _format_event(event_id, data, event)
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+async def job_status_stream(request):
+    """
+    GET /jobs/stream/ — Server-Sent Events stream of the caller's job changes.
+    Each "job" event carries only the changed fields among status, files_processed and
+    completed_at. A job created after the stream opened (or after the resume cursor) is
+    announced once with a "created" event, for the client to fetch and add to its list.
+    Reconnecting clients resume from the Last-Event-ID header (or ?cursor=).
+    The token is only accepted in the Authorization header, never in the URL, where it
+    would be written to server, load balancer and proxy access logs.
+    Connects take a token from the caller's "stream" bucket before the token is verified,
+    and a user may hold at most JOB_STREAM_MAX_PER_USER streams open per server process.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed."}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Job streaming requires the ASGI server."}, status=501)
+
+    # Throttled first, so reconnect storms and invalid tokens never cost a verification
+    error_response = await athrottle(request, THROTTLE_SCOPE)
+    if error_response:
+        return error_response
+    user_id, error_response = await aget_user_id_from_request_token(request)
+    if error_response:
+        return error_response
+
+    open_streams = len(get_broadcaster().subscribers.get(str(user_id), ()))
+    if open_streams >= settings.JOB_STREAM_MAX_PER_USER:
+        response = JsonResponse({"error": "Too many open job streams."}, status=429)
+        # A dropped stream is noticed, and its slot freed, at its next keepalive
+        response["Retry-After"] = str(int(settings.JOB_STREAM_HEARTBEAT_SECONDS))
+        return response
+
+    cursor = request.headers.get("Last-Event-ID") or request.GET.get("cursor")
+    response = StreamingHttpResponse(_event_stream(user_id, cursor), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -4,47 +4,137 @@ from rest_framework import serializers
 from rest_framework.decorators import action
 
 from django.conf import settings
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from api.models import Job, Connection, User
-from api.serializers import JobSerializer
+from api.models import Job, Connection, User, JobShard
+from api.serializers import JobSerializer, JobBatchItemSerializer, JobRowSerializer, JobShardSerializer
+from api.pagination import JobKeysetPagination
 from api.permission import TokenRequired
+from api.throttling import ThrottleFirstMixin
+from api.services.conditional import compute_validators, conditional_response, scope_key, set_validators
+from api.services.job_queue import build_job_payload
+from api.services.job_stats import WINDOWS, get_job_stats, record_jobs_created
+from api.services.fair_share import queue_positions
+from api.services.job_archive import get_archived_job
+from api.services.job_submission import create_job
+from api.services.outbox import bulk_add_to_outbox, ready_messages
+from api.services.sharding import retry_shard
 
-import boto3
-import json
+from datetime import datetime, time
 import logging
+import uuid
 
-class JobViewSet(viewsets.ModelViewSet):
+logger = logging.getLogger(__name__)
+
+
+def filter_job_queryset(queryset, params):
+    """
+    Apply the GET /jobs/ list filters (status, connection, created_after, created_before).
+    """
+    valid_statuses = {choice for choice, _ in Job.STATUS_CHOICES}
+
+    statuses = [s for s in params.get('status', '').split(',') if s]
+    if statuses:
+        invalid = [s for s in statuses if s not in valid_statuses]
+        if invalid:
+            raise serializers.ValidationError({"status": f"Unknown status: {', '.join(invalid)}"})
+        queryset = queryset.filter(status__in=statuses)
+
+    connection_id = params.get('connection')
+    if connection_id:
+        try:
+            queryset = queryset.filter(connection_id=uuid.UUID(connection_id))
+        except ValueError:
+            raise serializers.ValidationError({"connection": "Must be a valid UUID."})
+
+    for param, lookup in (('created_after', 'created_at__gte'), ('created_before', 'created_at__lt')):
+        value = params.get(param)
+        if not value:
+            continue
+        try:
+            # Well-formed but impossible values (2024-02-30) raise instead of returning None
+            parsed = parse_datetime(value)
+            if parsed is None:
+                parsed_date = parse_date(value)
+                parsed = datetime.combine(parsed_date, time.min) if parsed_date is not None else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise serializers.ValidationError({param: "Must be an ISO 8601 date or datetime."})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        queryset = queryset.filter(**{lookup: parsed})
+
+    return queryset
+
+
+class JobViewSet(ThrottleFirstMixin, viewsets.ModelViewSet):
     """
     Secure viewset for user jobs.
     - Authenticated users can list, view, and create jobs.
     """
     serializer_class = JobSerializer
     permission_classes = [TokenRequired]
+    pagination_class = JobKeysetPagination
+    throttle_scope = 'jobs'
 
     def get_queryset(self):
         """
         GET /jobs/ — List only the authenticated user's jobs.
+        Supports ?status=A,B, ?connection=<id>, ?created_after= and ?created_before= (ISO 8601).
+        """
+        queryset = (
+            Job.objects
+            .filter(user__user_id=self.request.token_user_id)
+            .select_related('user', 'connection')
+            .order_by('-created_at')
+        )
+        if self.action == 'list':
+            queryset = filter_job_queryset(queryset, self.request.query_params)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        GET /jobs/ — One query per page: rows are read with values() and serialized
+        by JobRowSerializer instead of building model instances.
+        Honours If-None-Match with a 304.
         """
-        return Job.objects.filter(user__user_id=self.request.token_user_id).order_by('-created_at')
+        queryset = self.get_queryset()
+
+        # Validators cover the whole filtered scope, so any change, insert or delete busts them
+        etag = compute_validators(
+            queryset, scope_key(request),
+            timestamp_fields=('updated_at', 'connection__updated_at', 'user__updated_at'),
+        )
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
 
+        rows = JobRowSerializer.with_list_values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            response = self.get_paginated_response(JobRowSerializer.many(page))
+        else:
+            response = Response(JobRowSerializer.many(rows))
+        return set_validators(response, etag)
 
     def perform_create(self, serializer):
         """
-        POST /jobs/ — Create a new job and enqueue it for processing.
+        POST /jobs/ — Create a new job and record its queue message in the outbox.
+        The outbox dispatcher delivers it to SQS once the transaction commits.
         """
         user_id = self.request.token_user_id
         data = self.request.data
 
-        print(f"Creating a new job for user ID: {user_id}")
-        print(f"Data: {data}")
+        logger.info("Creating job", extra={"user_id": user_id, "connection_id": data.get("connection")})
 
-        # Validate connection belongs to user
-        try:
-            print(f"Connection: {data.get('connection')}")
-            connection = Connection.objects.get(id=data.get("connection"), user__user_id=user_id)
-            print(f"Connection validated for user ID: {user_id}, connection ID: {connection.id}")
-        except Connection.DoesNotExist:
-            print(f"Invalid connection ID or unauthorized access for user ID: {user_id}")
+        # Validate connection belongs to user; the serializer has already loaded it
+        connection = serializer.validated_data.get("connection")
+        if connection is None or str(connection.user_id) != str(user_id):
+            logger.info("Invalid connection ID or unauthorized access", extra={"user_id": user_id})
             raise serializers.ValidationError("Invalid connection ID or unauthorized access.")
         
         try:
@@ -52,51 +142,165 @@ class JobViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             raise serializers.ValidationError("Invalid user.")
 
-        # Create Job
-        job = serializer.save(
-            user=user,
-            connection=connection,
-            status="PENDING"
-        )
-        print(f"Job created with ID: {job.id}")
-
-        # Build payload for SQS (new schema)
-        payload = {
-            "jobId": str(job.id),
-            "userBucket": data.get('user_bucket'),
-            "uploadPrefix": data.get('upload_prefix'),
-            "resultPrefix": data.get('result_prefix'),
-            "userRoleArn": data.get('user_role_arn'),
-            "ocrRequested": bool(data.get("ocr_requested", False)),
-            "ocrRenderBoxes": bool(data.get("ocr_render_boxes", False)),  # Always true for now
-            "tagRemovalRequested": bool(data.get("tag_removal_requested", False)),
-            "aiInferenceRequested": bool(data.get("ai_inference_requested", False)),
-            "sagemakerEndpoint": data.get('model_endpoint', 'yolov5-inference-endpoint-v4'),
+        create_job(serializer, user, connection, data)
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        POST /jobs/batch/ — Create and enqueue many jobs in one request.
+        Expects {"jobs": [...]} where each item has the same fields as POST /jobs/.
+        Responds with a per-item result; 207 if some items failed.
+        """
+        items = request.data.get("jobs") if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty 'jobs' list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.JOB_BATCH_MAX_SIZE:
+            return Response(
+                {"error": f"A batch may contain at most {settings.JOB_BATCH_MAX_SIZE} jobs."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            user = User.objects.get(user_id=request.token_user_id)
+        except User.DoesNotExist:
+            return Response({"error": "Invalid user."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        validated = []
+        for index, item in enumerate(items):
+            item_serializer = JobBatchItemSerializer(data=item)
+            if item_serializer.is_valid():
+                validated.append((index, item, item_serializer.validated_data))
+            else:
+                results[index] = {"index": index, "status": "failed", "error": item_serializer.errors}
+
+        # Validate every referenced connection belongs to the user in one query
+        connection_ids = {fields["connection"] for _, _, fields in validated}
+        connections = {
+            c.id: c for c in Connection.objects.filter(id__in=connection_ids, user=user)
         }
 
-        print(f"Payload for SQS: {payload}")
+        jobs, outbox_entries = [], []
+        for index, item, fields in validated:
+            connection = connections.get(fields["connection"])
+            if connection is None:
+                results[index] = {
+                    "index": index,
+                    "status": "failed",
+                    "error": "Invalid connection ID or unauthorized access.",
+                }
+                continue
+
+            job = Job(
+                user=user,
+                connection=connection,
+                source_prefix=fields.get("source_prefix"),
+                destination_prefix=fields.get("destination_prefix"),
+                ocr_requested=fields["ocr_requested"],
+                tag_removal_requested=fields["tag_removal_requested"],
+                ai_inference_requested=fields["ai_inference_requested"],
+                force_full=fields["force_full"],
+                status="PENDING",
+            )
+            jobs.append((index, job))
+            outbox_entries.append((job, build_job_payload(job, item)))
+
+        with transaction.atomic():
+            Job.objects.bulk_create([job for _, job in jobs])
+            bulk_add_to_outbox(outbox_entries)
+            record_jobs_created([job for _, job in jobs])
+
+        for index, job in jobs:
+            results[index] = {"index": index, "status": "created", "job": JobSerializer(job).data}
+
+        succeeded = len(jobs)
+        logger.info(
+            "Batch job submission",
+            extra={"user_id": str(user.user_id), "jobs_created": succeeded, "jobs_failed": len(results) - succeeded},
+        )
+
+        return Response(
+            {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results},
+            status=status.HTTP_201_CREATED if succeeded == len(results) else status.HTTP_207_MULTI_STATUS
+        )
 
-        # ENQUEUE TO SQS HERE (stubbed)
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        GET /jobs/stats/ — Per-status counts, success rate, files processed and
+        average / p95 duration, served from the incrementally maintained summary tables.
+        ?window=1d,7d,30d,90d,all selects windows (default: 7d,30d,all).
+        """
+        windows = [w for w in request.query_params.get('window', '7d,30d,all').split(',') if w]
+        unknown = [w for w in windows if w not in WINDOWS]
+        if unknown:
+            return Response(
+                {"error": f"Unknown window(s): {', '.join(unknown)}. Use {', '.join(WINDOWS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(get_job_stats(request.token_user_id, windows))
+
+    @action(detail=False, methods=['get'])
+    def queue(self, request):
+        """
+        GET /jobs/queue/ — The user's jobs waiting for fair-share admission with their
+        estimated admission position among every user's waiting jobs, plus in-flight
+        usage and limits.
+        """
         try:
-            sqs = boto3.client("sqs", region_name="us-east-1")
-            sqs.send_message(
-                QueueUrl=f"https://sqs.us-east-1.amazonaws.com/{settings.AWS_ACCOUNT_ID}/{settings.SQS_QUEUE_NAME}",
-                MessageBody=json.dumps(payload)
+            user = User.objects.get(user_id=request.token_user_id)
+        except User.DoesNotExist:
+            return Response({"error": "Invalid user."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(queue_positions(user, ready_messages().filter(job__admitted_at__isnull=True)))
+
+    @action(detail=True, methods=['get'])
+    def shards(self, request, pk=None):
+        """
+        GET /jobs/{id}/shards/ — Per-shard status and progress of a sharded job.
+        """
+        job = self.get_object()
+        if str(job.user.user_id) != str(request.token_user_id):
+            return Response({"error": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+        shards = JobShard.objects.filter(job=job).defer('data')
+        return Response(JobShardSerializer(shards, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path=r'shards/(?P<shard_index>\d+)/retry')
+    def retry_failed_shard(self, request, pk=None, shard_index=None):
+        """
+        POST /jobs/{id}/shards/{index}/retry/ — Re-queue one failed shard without redoing the rest of the job.
+        """
+        job = self.get_object()
+        if str(job.user.user_id) != str(request.token_user_id):
+            return Response({"error": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
+
+        shard = JobShard.objects.filter(job=job, index=int(shard_index)).defer('data').first()
+        if shard is None:
+            return Response({"error": "Shard not found."}, status=status.HTTP_404_NOT_FOUND)
+        if shard.status not in ("FAILED_RETRYABLE", "FAILED_PERMANENT"):
+            return Response(
+                {"error": f"Only failed shards can be retried (shard is {shard.status})."},
+                status=status.HTTP_409_CONFLICT
             )
-            print(f"Job with ID: {job.id} enqueued successfully")
-        except Exception as e:
-            print(f"Failed to enqueue job with ID: {job.id}. Error: {str(e)}")
-            job.status = "FAILED_PERMANENT"
-            job.error_message = str(e)
-            job.save()
-            raise serializers.ValidationError("Failed to enqueue job: " + str(e))
+        if not retry_shard(shard):
+            return Response({"error": "Shard status changed; try again."}, status=status.HTTP_409_CONFLICT)
+
+        shard.refresh_from_db(fields=['status', 'files_processed', 'retry_count', 'error_message', 'started_at', 'completed_at', 'updated_at'])
+        return Response(JobShardSerializer(shard).data, status=status.HTTP_202_ACCEPTED)
 
     def retrieve(self, request, *args, **kwargs):
         """
         GET /jobs/{id}/ — View individual job (only if owned).
+        Jobs moved to the archive are looked up there once the hot table misses.
         """
-        instance = self.get_object()
-        if instance.user.user_id != request.token_user_id:
+        try:
+            instance = self.get_object()
+        except Http404:
+            archived = get_archived_job(request.token_user_id, kwargs['pk'])
+            if archived is None:
+                raise
+            return Response(archived)
+        if str(instance.user.user_id) != str(request.token_user_id):
             return Response({"error": "Not authorized."}, status=status.HTTP_403_FORBIDDEN)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -0,0 +1,28 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from api.services.metrics import REGISTRY
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics(request):
+    """
+    GET /metrics/ — Prometheus text format. Scrapers must send "Authorization: Bearer
+    <METRICS_TOKEN>"; without a METRICS_TOKEN configured the endpoint does not exist (404),
+    since route names, latencies and queue backlogs should not be public.
+    """
+    expected = settings.METRICS_TOKEN
+    if not expected:
+        return JsonResponse({"error": "Not found."}, status=404)
+    if request.method != "GET":
+        return JsonResponse({"error": "Method not allowed."}, status=405)
+
+    auth_header = request.headers.get("Authorization", "")
+    token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else ""
+    if not hmac.compare_digest(token.encode(), expected.encode()):
+        return JsonResponse({"error": "Invalid metrics token."}, status=401)
+
+    return HttpResponse(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -4,8 +4,10 @@ from rest_framework.response import Response
 from api.models import User
 from api.serializers import UserSerializer
 from api.permission import TokenRequired
+from api.throttling import ThrottleFirstMixin
+from api.services.conditional import compute_validators, conditional_response, scope_key, set_validators
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ThrottleFirstMixin, viewsets.ModelViewSet):
     """
     Handles user creation, self-retrieval, and self-update securely.
     """
@@ -28,10 +30,16 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def me(self, request):
         user_id = request.token_user_id
+
+        etag = compute_validators(User.objects.filter(user_id=user_id), scope_key(request))
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         try:
             user_obj = User.objects.get(user_id=user_id)
             serializer = self.get_serializer(user_obj)
-            return Response(serializer.data)
+            return set_validators(Response(serializer.data), etag)
         except User.DoesNotExist:
             return Response(
                 {"error": "User not found."},
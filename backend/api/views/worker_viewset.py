@@ -0,0 +1,135 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from api.models import JobManifest, JobShard
+from api.permission import WorkerTokenRequired
+from api.serializers import JobProgressEventSerializer
+from api.services.progress import apply_progress_events
+from api.services.queue_backends import SQS_MAX_BATCH_SIZE, get_queue_backend
+
+
+class WorkerProgressViewSet(viewsets.ViewSet):
+    """
+    Callback endpoint for the anonymization workers.
+    """
+    permission_classes = [WorkerTokenRequired]
+    authentication_classes = []
+    throttle_classes = []
+
+    def create(self, request):
+        """
+        POST /worker/progress/ — Apply a batch of progress events.
+        Expects {"events": [{"job_id", "files_processed", "total_files", "status", "error_message"}, ...]}.
+        """
+        events = request.data.get("events") if isinstance(request.data, dict) else None
+        if not isinstance(events, list) or not events:
+            return Response({"error": "Expected a non-empty 'events' list."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > settings.WORKER_PROGRESS_MAX_EVENTS:
+            return Response(
+                {"error": f"A callback may contain at most {settings.WORKER_PROGRESS_MAX_EVENTS} events."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = JobProgressEventSerializer(data=events, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        result = apply_progress_events(serializer.validated_data)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class WorkerManifestViewSet(viewsets.ViewSet):
+    """
+    Lets workers fetch a job's pre-scan manifest instead of listing the prefix again.
+    """
+    permission_classes = [WorkerTokenRequired]
+    authentication_classes = []
+    throttle_classes = []
+
+    def retrieve(self, request, pk=None):
+        """
+        GET /worker/manifests/{job_id}/ — gzip-encoded NDJSON, one [key, size, etag] per line.
+        ?shard={index} returns only that shard's slice.
+        """
+        shard_index = request.query_params.get("shard")
+        if shard_index is not None:
+            if not shard_index.isdigit():
+                return Response({"error": "shard must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+            manifest = JobShard.objects.filter(job_id=pk, index=int(shard_index)).values_list('data', 'file_count').first()
+        else:
+            manifest = JobManifest.objects.filter(job_id=pk, status="READY").values_list('data', 'file_count').first()
+        if manifest is None:
+            return Response({"error": "Manifest not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        data, file_count = manifest
+        response = HttpResponse(bytes(data or b""), content_type="application/x-ndjson")
+        response["Content-Encoding"] = "gzip"
+        response["X-Manifest-File-Count"] = str(file_count)
+        return response
+
+
+class WorkerQueueViewSet(viewsets.ViewSet):
+    """
+    Lets workers consume the job queue through the API, whichever backend is configured.
+    """
+    permission_classes = [WorkerTokenRequired]
+    authentication_classes = []
+    throttle_classes = []
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """
+        POST /worker/queue/claim/ — {"max_messages": 1-10, "visibility_timeout": seconds}.
+        Returns {"messages": [{"message_id", "receipt", "body", "receive_count"}, ...]}.
+        """
+        try:
+            max_messages = int(request.data.get("max_messages", 1))
+            visibility_timeout = int(request.data.get("visibility_timeout") or settings.JOB_QUEUE_VISIBILITY_TIMEOUT)
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "max_messages and visibility_timeout must be integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        messages = get_queue_backend().claim(
+            max_messages=max(1, min(max_messages, SQS_MAX_BATCH_SIZE)),
+            visibility_timeout=max(1, visibility_timeout),
+        )
+        return Response({"messages": [message.to_dict() for message in messages]})
+
+    @action(detail=False, methods=['post'])
+    def ack(self, request):
+        """
+        POST /worker/queue/ack/ — {"receipts": [...]}. Deletes finished messages.
+        """
+        receipts = request.data.get("receipts")
+        if not isinstance(receipts, list) or not receipts:
+            return Response({"error": "Expected a non-empty 'receipts' list."}, status=status.HTTP_400_BAD_REQUEST)
+
+        backend = get_queue_backend()
+        unknown = [receipt for receipt in receipts if not backend.ack(str(receipt))]
+        return Response({"acked": len(receipts) - len(unknown), "unknown": unknown})
+
+    @action(detail=False, methods=['post'])
+    def visibility(self, request):
+        """
+        POST /worker/queue/visibility/ — {"receipt", "visibility_timeout"}. Extends a claim
+        while a long message is still being processed; 0 releases it immediately.
+        """
+        receipt = request.data.get("receipt")
+        try:
+            visibility_timeout = int(request.data.get("visibility_timeout"))
+        except (TypeError, ValueError):
+            return Response({"error": "visibility_timeout must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not receipt or visibility_timeout < 0:
+            return Response(
+                {"error": "Expected a receipt and a non-negative visibility_timeout."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not get_queue_backend().change_visibility(str(receipt), visibility_timeout):
+            return Response({"error": "Unknown or expired receipt."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"receipt": receipt, "visibility_timeout": visibility_timeout})
@@ -0,0 +1,11 @@
+# Performance benchmarks for the backend. Each module is runnable with
+# `python -m benchmarks.<name>` from the backend directory and uses the
+# database configured by DJANGO_SETTINGS_MODULE (core.settings by default).
+
+import os
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+    django.setup()
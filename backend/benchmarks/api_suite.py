@@ -0,0 +1,223 @@
+"""
+Load and latency suite for the user-facing API, checked against a baseline.
+
+    python -m benchmarks.api_suite                                # run and compare with the baseline
+    python -m benchmarks.api_suite --concurrency 1,16,64 --duration 10
+    python -m benchmarks.api_suite --write-baseline               # record this machine's numbers
+
+Scenarios: jobs.list, jobs.create, jobs.batch, connections.list and users.me, each
+run alone at every --concurrency level against a gunicorn server started for the
+run (--mode sync|async) or an existing one (--url, which must use the same
+database). Tokens are signed by a local JWKS stub and the server uses the in-memory
+queue backend with throttling off, so nothing leaves the machine. Queries per
+request are counted in-process through the Django test client.
+
+Each scenario reports throughput, p50/p95/p99 latency, errors and queries per
+request. The run fails (exit status 1) when any request errors, a scenario issues
+more queries than its baseline, or throughput / p95 / p99 are worse than the
+baseline by more than --tolerance. Latency baselines are machine-specific: record
+them with --write-baseline on the machine that runs the comparison.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+from pathlib import Path
+
+from benchmarks import setup_django
+from benchmarks.harness import cleanup, free_port, seed, server_env, start_server, stop_server
+from benchmarks.load import Operation, run_load, wait_for_port
+from benchmarks.stubs import StubJWKS
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "api_suite.json"
+
+
+def scenarios(fixtures, batch_size):
+    def connection_id(index):
+        return str(fixtures[index % len(fixtures)][1].id)
+
+    def job_fields(index):
+        return {
+            "connection": connection_id(index),
+            "source_prefix": f"in/{random.randrange(10_000)}/",
+            "destination_prefix": "out/",
+        }
+
+    return [
+        Operation("jobs.list", 1, lambda i: ("GET", "/api/jobs/?page_size=50", None)),
+        Operation("jobs.create", 1, lambda i: ("POST", "/api/jobs/", job_fields(i)), expect=(201,)),
+        Operation(
+            "jobs.batch", 1,
+            lambda i: ("POST", "/api/jobs/batch/", {"jobs": [job_fields(i) for _ in range(batch_size)]}),
+            expect=(201,),
+        ),
+        Operation("connections.list", 1, lambda i: ("GET", "/api/connections/", None)),
+        Operation("users.me", 1, lambda i: ("GET", "/api/users/me/", None)),
+    ]
+
+
+def count_queries(operation, token, repeat=5):
+    """
+    Median number of queries one request of operation issues, via the Django test client.
+    """
+    from django.conf import settings
+    from django.db import connection
+    from django.test import Client
+
+    settings.THROTTLE_ENABLED = False
+    client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+    counts = []
+    for attempt in range(repeat + 1):
+        method, path, body = operation.build(0)
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            if method == "GET":
+                response = client.get(path)
+            else:
+                response = client.generic(method, path, json.dumps(body), content_type="application/json")
+        if response.status_code not in operation.expect:
+            raise RuntimeError(f"{operation.name}: unexpected {response.status_code} {response.content[:200]!r}")
+        # The first request warms caches (token, JWKS), so it is not counted
+        if attempt:
+            counts.append(len(queries))
+    return int(statistics.median(counts))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regression messages for results against a baseline (both as written by --write-baseline).
+    """
+    failures = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if "queries" in expected and result["queries"] > expected["queries"]:
+            failures.append(f"{name}: {result['queries']} queries per request, baseline {expected['queries']}")
+
+        for level, summary in result["concurrency"].items():
+            reference = expected.get("concurrency", {}).get(level)
+            if not reference:
+                continue
+            label = f"{name} @ {level} clients"
+            if "rps" in reference and summary["rps"] < reference["rps"] * (1 - tolerance):
+                failures.append(f"{label}: {summary['rps']:.1f} req/s, baseline {reference['rps']:.1f}")
+            for key in ("p95_ms", "p99_ms"):
+                if key in reference and summary[key] > reference[key] * (1 + tolerance):
+                    failures.append(f"{label}: {key} {summary[key]:.1f}, baseline {reference[key]:.1f}")
+    return failures
+
+
+def run(args, stub):
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    cleanup()
+    fixtures = seed(args.users, args.jobs)
+    tokens = [stub.mint_token(user.user_id) for user, _, _ in fixtures]
+    operations = [op for op in scenarios(fixtures, args.batch_size) if not args.only or op.name in args.only.split(",")]
+
+    def headers(index):
+        return {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+
+    results = {op.name: {"queries": count_queries(op, tokens[0]), "concurrency": {}} for op in operations}
+
+    server = None
+    base_url = args.url
+    try:
+        if base_url is None:
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(args.mode, args.workers, port, server_env(stub), args.verbose)
+        wait_for_port(base_url)
+
+        for op in operations:
+            # Warm every worker's token cache and DB connection
+            run_load(base_url, [op], headers, args.workers * 2, 1)
+            for concurrency in levels:
+                result = run_load(base_url, [op], headers, concurrency, args.duration)
+                results[op.name]["concurrency"][str(concurrency)] = {
+                    key: round(value, 2) for key, value in result.summary().items()
+                }
+    finally:
+        if server is not None:
+            stop_server(server)
+        cleanup()
+    return results
+
+
+def report(results):
+    print(f"{'scenario':18} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'queries':>8}")
+    for name, result in results.items():
+        for level, summary in result["concurrency"].items():
+            print(
+                f"{name:18} {int(level):5d} {summary['rps']:9.1f} {summary['p50_ms']:8.1f} "
+                f"{summary['p95_ms']:8.1f} {summary['p99_ms']:8.1f} {summary['errors']:7d} {result['queries']:8d}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("sync", "async"), default="async", help="Deployment to start")
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", default="1,16", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per scenario and concurrency level")
+    parser.add_argument("--only", help="Comma-separated scenarios to run")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--jobs", type=int, default=500, help="Fixture jobs per user")
+    parser.add_argument("--batch-size", type=int, default=10, help="Jobs per jobs.batch request")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput / latency slack (0.2 = 20%%)")
+    parser.add_argument("--write-baseline", action="store_true", help="Save the results as the new baseline")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    args = parser.parse_args()
+
+    # The in-process query counts verify tokens too, so the stub's URL must be known before Django loads
+    jwks_port = free_port()
+    os.environ["COGNITO_JWKS_URL"] = f"http://127.0.0.1:{jwks_port}/.well-known/jwks.json"
+    os.environ["JOB_QUEUE_BACKEND"] = "memory"
+    setup_django()
+    stub = StubJWKS.from_settings().start(jwks_port)
+    try:
+        results = run(args, stub)
+    finally:
+        stub.stop()
+
+    report(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n")
+    if args.write_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    failures = [
+        f"{name} @ {level} clients: {summary['errors']} failed requests"
+        for name, result in results.items()
+        for level, summary in result["concurrency"].items() if summary["errors"]
+    ]
+    if args.baseline.exists():
+        failures += compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    else:
+        print(f"No baseline at {args.baseline}; run with --write-baseline to create one")
+
+    if failures:
+        print("\nREGRESSIONS:", file=sys.stderr)
+        for failure in failures:
+            print(f"  ✗ {failure}", file=sys.stderr)
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Concurrent request capacity of the job API on the sync deployment (gunicorn sync
+workers, WSGI, JobViewSet) versus the async one (uvicorn workers, ASGI, the async
+job views), with the same worker count against the same database.
+
+    python -m benchmarks.async_capacity --workers 4 --concurrency 1,8,32,128 --duration 10
+    python -m benchmarks.async_capacity --jwks-latency 0.5 --jwks-ttl 2   # slow, frequent key refreshes
+
+Both servers run as subprocesses. Requests mix job list, job status and job create
+(--mix). Tokens are signed by a local JWKS stub (benchmarks.stubs), so no Cognito
+is needed; --jwks-latency and --jwks-ttl model a slow identity provider, whose
+fetch blocks a sync worker outright but not the event loop. Fixture users,
+connections and jobs are committed for the run and deleted afterwards.
+"""
+
+import argparse
+import random
+
+from benchmarks import setup_django
+from benchmarks.harness import cleanup, free_port, seed, server_env, start_server, stop_server
+from benchmarks.load import Operation, run_load, wait_for_port
+from benchmarks.stubs import StubJWKS
+
+
+def workload(fixtures, mix):
+    def fixture(index):
+        return fixtures[index % len(fixtures)]
+
+    builders = {
+        "list": lambda i: ("GET", "/api/jobs/?page_size=20", None),
+        "status": lambda i: ("GET", f"/api/jobs/{random.choice(fixture(i)[2])}/", None),
+        "create": lambda i: ("POST", "/api/jobs/", {
+            "connection": str(fixture(i)[1].id), "source_prefix": "in/", "destination_prefix": "out/",
+        }),
+    }
+    expected = {"create": (201,)}
+    return [
+        Operation(name, weight, builders[name], expected.get(name, (200,)))
+        for name, weight in mix.items() if weight
+    ]
+
+
+def run(args):
+    mix = {name: int(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    stub = StubJWKS.from_settings(latency=args.jwks_latency).start()
+    env = server_env(stub, JWKS_CACHE_TTL=str(args.jwks_ttl), JWKS_MIN_REFRESH_INTERVAL="0")
+
+    cleanup()
+    fixtures = seed(args.users, args.jobs)
+    tokens = [stub.mint_token(user.user_id) for user, _, _ in fixtures]
+    operations = workload(fixtures, mix)
+
+    def headers(index):
+        return {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+
+    rows = []
+    try:
+        for mode in args.modes.split(","):
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = start_server(mode, args.workers, port, env, args.verbose)
+            try:
+                wait_for_port(base_url)
+                # Warm each worker's JWKS, token cache and DB connection
+                run_load(base_url, operations, headers, args.workers * 2, 1)
+                for concurrency in levels:
+                    result = run_load(base_url, operations, headers, concurrency, args.duration)
+                    rows.append((mode, concurrency, result.summary()))
+            finally:
+                stop_server(server)
+    finally:
+        stub.stop()
+        cleanup()
+
+    print(f"{args.workers} workers, mix {args.mix}, JWKS latency {args.jwks_latency}s, TTL {args.jwks_ttl}s")
+    print(f"{'mode':6} {'conc':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode, concurrency, summary in rows:
+        print(
+            f"{mode:6} {concurrency:5d} {summary['rps']:9.1f} {summary['p50_ms']:8.1f} "
+            f"{summary['p95_ms']:8.1f} {summary['p99_ms']:8.1f} {summary['errors']:7d}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--mix", default="list=6,status=3,create=1", help="Relative operation weights")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--jobs", type=int, default=200, help="Fixture jobs per user")
+    parser.add_argument("--jwks-latency", type=float, default=0.0, help="Seconds the stub JWKS endpoint takes to answer")
+    parser.add_argument("--jwks-ttl", type=int, default=3600, help="JWKS_CACHE_TTL for the servers under test")
+    parser.add_argument("--verbose", action="store_true", help="Show server output")
+    args = parser.parse_args()
+
+    setup_django()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
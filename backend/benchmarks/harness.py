@@ -0,0 +1,114 @@
+"""
+Fixtures and server processes shared by the HTTP benchmarks.
+
+Fixture users are recognisable by their email domain, so cleanup() removes
+them (and, by cascade, their connections and jobs) even after an aborted run.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FIXTURE_EMAIL_DOMAIN = "benchmark.invalid"
+
+DEPLOYMENTS = {
+    "sync": {
+        "app": "core.wsgi:application",
+        "args": [],
+        "env": {"JOB_API_ASYNC": "false"},
+    },
+    "async": {
+        "app": "core.asgi:application",
+        "args": ["--worker-class", "uvicorn_worker.UvicornWorker"],
+        "env": {"JOB_API_ASYNC": "true"},
+    },
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(users, jobs_per_user):
+    """
+    Create fixture users, one connection each and their jobs. Returns [(user, connection, [job ids])].
+    """
+    from api.models import Connection, Job, User
+    from api.services.job_stats import record_jobs_created
+
+    fixtures = []
+    for i in range(users):
+        user = User.objects.create(email=f"user{i}@{FIXTURE_EMAIL_DOMAIN}")
+        connection = Connection.objects.create(
+            user=user, name="bench", bucket_name="benchmark", aws_role_arn="arn:aws:iam::000000000000:role/bench"
+        )
+        jobs = Job.objects.bulk_create([
+            Job(user=user, connection=connection, source_prefix=f"in/{n}/", destination_prefix=f"out/{n}/",
+                status="COMPLETED" if n % 3 else "PROCESSING", files_processed=n % 50, total_files=50)
+            for n in range(jobs_per_user)
+        ])
+        record_jobs_created(jobs)
+        fixtures.append((user, connection, [str(job.id) for job in jobs]))
+    return fixtures
+
+
+def cleanup():
+    from api.models import User
+
+    User.objects.filter(email__endswith=f"@{FIXTURE_EMAIL_DOMAIN}").delete()
+
+
+def server_env(stub, **overrides):
+    """
+    Environment for a server under test: tokens verified against the JWKS stub, the
+    in-memory queue backend so nothing can reach SQS (no dispatcher runs, so job
+    submission is measured up to the outbox write), and no throttling.
+    """
+    from django.conf import settings
+
+    env = {
+        "COGNITO_JWKS_URL": stub.url,
+        "THROTTLE_ENABLED": "false",
+        "JOB_QUEUE_BACKEND": "memory",
+    }
+    for name in ("COGNITO_REGION", "COGNITO_USER_POOL_ID", "COGNITO_APP_CLIENT_ID"):
+        env[name] = getattr(settings, name) or ""
+    env.update(overrides)
+    return env
+
+
+def start_server(mode, workers, port, extra_env, verbose=False):
+    """
+    Start gunicorn for a DEPLOYMENTS mode on 127.0.0.1:port. Returns the Popen.
+    """
+    deployment = DEPLOYMENTS[mode]
+    env = {**os.environ, **extra_env, **deployment["env"]}
+    command = [
+        sys.executable, "-m", "gunicorn", deployment["app"],
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning",
+        *deployment["args"],
+    ]
+    output = None if verbose else subprocess.DEVNULL
+    # Own process group, so stop_server can take the workers down with the master
+    return subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env, stdout=output, stderr=output, start_new_session=True
+    )
+
+
+def stop_server(server, timeout=30):
+    """
+    Stop gunicorn gracefully, or kill its process group after timeout seconds
+    (a worker signalled while still booting can miss the SIGTERM).
+    """
+    server.terminate()
+    try:
+        server.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
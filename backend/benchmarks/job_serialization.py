@@ -0,0 +1,81 @@
+"""
+Rows per second and queries per page for serializing a user's job list:
+the original JobSerializer over a plain queryset, the same with
+select_related, and the values()-based JobRowSerializer fast path.
+
+    python -m benchmarks.job_serialization --rows 5000 --repeat 5
+
+Fixture rows are created inside a transaction that is rolled back at the end.
+"""
+
+import argparse
+import time
+
+from benchmarks import setup_django
+
+
+def run(rows, repeat):
+    from django.db import connection, transaction
+
+    from api.models import Connection, Job, User
+    from api.serializers import JobRowSerializer, JobSerializer
+
+    with transaction.atomic():
+        user = User.objects.create(email="benchmark@example.com")
+        connections = [
+            Connection.objects.create(user=user, name=f"conn-{i}", bucket_name="bench", aws_role_arn="arn:bench")
+            for i in range(5)
+        ]
+        Job.objects.bulk_create([
+            Job(
+                user=user,
+                connection=connections[i % len(connections)],
+                source_prefix=f"in/{i}/",
+                destination_prefix=f"out/{i}/",
+                status="COMPLETED" if i % 2 else "PROCESSING",
+                files_processed=i % 100,
+                total_files=100,
+            )
+            for i in range(rows)
+        ])
+
+        base = Job.objects.filter(user=user).order_by('-created_at')
+        variants = [
+            ("JobSerializer (no select_related)", lambda: JobSerializer(base.all(), many=True).data),
+            ("JobSerializer + select_related", lambda: JobSerializer(base.select_related('user', 'connection'), many=True).data),
+            ("JobRowSerializer (values fast path)", lambda: JobRowSerializer.many(JobRowSerializer.with_list_values(base))),
+        ]
+
+        print(f"{'variant':40} {'rows/s':>12} {'queries':>8}")
+        for label, serialize in variants:
+            best = None
+            for _ in range(repeat):
+                queries = []
+
+                def count_query(execute, sql, params, many, context):
+                    queries.append(sql)
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(count_query):
+                    started = time.perf_counter()
+                    data = serialize()
+                    elapsed = time.perf_counter() - started
+                assert len(data) == rows
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:40} {rows / best:12.0f} {len(queries):8d}")
+
+        transaction.set_rollback(True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    run(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Closed-loop HTTP load driver shared by the server benchmarks.
+
+Each of `concurrency` threads keeps one keep-alive connection open and sends the
+next request as soon as the previous one answers, for `duration` seconds.
+"""
+
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class Operation:
+    """
+    One kind of request in a workload. build(worker_index) returns (method, path, body or None)
+    and is called for every request, so paths and bodies may vary per request and per worker.
+    """
+
+    def __init__(self, name, weight, build, expect=(200,)):
+        self.name = name
+        self.weight = weight
+        self.build = build
+        self.expect = expect
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoadResult:
+    def __init__(self, elapsed, samples):
+        self.elapsed = elapsed
+        # name -> list of (latency seconds, ok)
+        self.samples = samples
+
+    def summary(self, names=None):
+        """
+        Requests, errors, throughput and latency percentiles (ms) for the given operations (default: all).
+        """
+        names = names or list(self.samples)
+        latencies = sorted(latency for name in names for latency, _ in self.samples.get(name, []))
+        errors = sum(1 for name in names for _, ok in self.samples.get(name, []) if not ok)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": len(latencies) / self.elapsed if self.elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+
+
+def run_load(base_url, operations, headers, concurrency, duration, timeout=30):
+    """
+    Drive the weighted operations against base_url and return a LoadResult.
+    headers is a dict, or a callable taking the worker index (e.g. one token per simulated user).
+    """
+    parts = urlsplit(base_url)
+    weights = [op.weight for op in operations]
+    samples = {op.name: [] for op in operations}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        request_headers = {"Content-Type": "application/json"}
+        request_headers.update(headers(index) if callable(headers) else headers)
+        rng = random.Random(index)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        local = {op.name: [] for op in operations}
+
+        while time.perf_counter() < deadline:
+            op = rng.choices(operations, weights)[0]
+            method, path, body = op.build(index)
+            started = time.perf_counter()
+            try:
+                conn.request(method, path, json.dumps(body) if body is not None else None, request_headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status in op.expect
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+            local[op.name].append((time.perf_counter() - started, ok))
+
+        conn.close()
+        with lock:
+            for name, values in local.items():
+                samples[name].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return LoadResult(time.perf_counter() - started, samples)
+
+
+def wait_for_port(base_url, timeout=30):
+    """
+    Block until something accepts connections at base_url. Raises RuntimeError on timeout.
+    """
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            conn.request("GET", "/api/health/")
+            conn.getresponse().read()
+            conn.close()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.2)
+    raise RuntimeError(f"Nothing listening at {base_url} after {timeout}s")
@@ -0,0 +1,189 @@
+"""
+Worker cold start: what a process imports before it can serve, and how long a
+fresh server takes to answer its first request with and without preload.
+
+    python -m benchmarks.startup                      # import profile and both preload modes
+    python -m benchmarks.startup --workers 4 --repeat 5 --top 25
+
+The import profile runs `python -X importtime` on what a worker loads at boot
+(django.setup(), the ASGI application and the URL conf) and lists the slowest
+packages and modules. Modules the app defers until first use
+(worker_startup.PRELOAD_MODULES) are imported afterwards and listed separately.
+
+Time to first request starts gunicorn (--mode, --workers, GUNICORN_PRELOAD off and
+on) against a local JWKS stub and times, from process start, the first 200 from
+/api/health/live/ and the first authenticated 200 from /api/users/me/. Each
+figure is the median of --repeat runs.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks import setup_django
+from benchmarks.harness import BACKEND_DIR, cleanup, free_port, seed, server_env, start_server, stop_server
+from benchmarks.stubs import StubJWKS
+
+BOOT_CODE = """
+import json
+import time
+started = time.perf_counter()
+import django
+django.setup()
+import core.asgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+booted = time.perf_counter()
+{deferred_imports}
+print(json.dumps({{"boot": booted - started, "deferred": time.perf_counter() - booted}}))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    [(module, self µs, cumulative µs, nesting depth)] in the order -X importtime reports them.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def import_profile():
+    from api.services.worker_startup import PRELOAD_MODULES
+
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings")}
+    result = subprocess.run(
+        # Import statements rather than importlib, which -X importtime does not report at the top level
+        [sys.executable, "-X", "importtime", "-c", BOOT_CODE.format(
+            deferred_imports="\n".join(f"import {name}" for name in PRELOAD_MODULES)
+        )],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+
+    # Deferred modules are imported last; everything before the first of them is boot
+    first_deferred = next(
+        (i for i, (name, _, _, depth) in enumerate(rows) if depth == 0 and name in PRELOAD_MODULES), len(rows)
+    )
+    # -X importtime reports a package after its submodules, so walk back over them too
+    while first_deferred > 0 and rows[first_deferred - 1][3] > 0:
+        first_deferred -= 1
+    return rows[:first_deferred], rows[first_deferred:], timings
+
+
+def report_imports(boot, deferred, timings, top):
+    from api.services.worker_startup import PRELOAD_MODULES
+
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in boot:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"Boot: {len(boot)} modules imported, {timings['boot'] * 1000:.0f} ms to setup Django, the app and URLs\n")
+    print(f"{'package':32} {'self ms':>9}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:32} {self_us / 1000:9.1f}")
+
+    print(f"\n{'module':48} {'self ms':>9} {'cumulative ms':>14}")
+    for name, self_us, cumulative_us, _ in sorted(boot, key=lambda row: -row[2])[:top]:
+        print(f"{name:48} {self_us / 1000:9.1f} {cumulative_us / 1000:14.1f}")
+
+    print(f"\nDeferred until first use: {timings['deferred'] * 1000:.0f} ms")
+    packages = {name.split(".")[0] for name in PRELOAD_MODULES}
+    for name, _, cumulative_us, depth in deferred:
+        if depth == 0 and name.split(".")[0] in packages:
+            print(f"  {name:46} {cumulative_us / 1000:9.1f}")
+
+
+def _status(base_url, path, headers=None):
+    host, port = base_url.split("://")[1].split(":")
+    try:
+        conn = http.client.HTTPConnection(host, int(port), timeout=2)
+        conn.request("GET", path, headers=headers or {})
+        response = conn.getresponse()
+        response.read()
+        conn.close()
+        return response.status
+    except (OSError, http.client.HTTPException):
+        return None
+
+
+def time_to_first_request(mode, workers, preload, stub, token, timeout=60):
+    """
+    Seconds from starting gunicorn to (first live 200, first authenticated 200).
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = server_env(stub, GUNICORN_PRELOAD="true" if preload else "false")
+    started = time.perf_counter()
+    server = start_server(mode, workers, port, env)
+    first_live = first_auth = None
+    try:
+        deadline = time.monotonic() + timeout
+        while first_auth is None and time.monotonic() < deadline:
+            if first_live is None and _status(base_url, "/api/health/live/") == 200:
+                first_live = time.perf_counter() - started
+            if first_live is not None and _status(base_url, "/api/users/me/", {"Authorization": f"Bearer {token}"}) == 200:
+                first_auth = time.perf_counter() - started
+            else:
+                time.sleep(0.01)
+    finally:
+        # Workers still booting when the first request is answered may miss the SIGTERM
+        stop_server(server, timeout=5)
+    if first_auth is None:
+        raise RuntimeError(f"{mode} server (preload={preload}) did not serve an authenticated request in {timeout}s")
+    return first_live, first_auth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("sync", "async"), default="async", help="Deployment to start")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Rows in the import tables")
+    parser.add_argument("--skip-imports", action="store_true", help="Only time the first request")
+    parser.add_argument("--json", help="Also write the first-request timings to this file")
+    args = parser.parse_args()
+
+    setup_django()
+    if not args.skip_imports:
+        report_imports(*import_profile(), args.top)
+
+    stub = StubJWKS.from_settings().start()
+    cleanup()
+    user = seed(1, 0)[0][0]
+    token = stub.mint_token(user.user_id)
+    results = {}
+    try:
+        for preload in (False, True):
+            runs = [time_to_first_request(args.mode, args.workers, preload, stub, token) for _ in range(args.repeat)]
+            results["preload" if preload else "no preload"] = {
+                "first_live_ms": round(statistics.median(run[0] for run in runs) * 1000, 1),
+                "first_authenticated_ms": round(statistics.median(run[1] for run in runs) * 1000, 1),
+            }
+    finally:
+        stub.stop()
+        cleanup()
+
+    print(f"\nTime to first request ({args.mode}, {args.workers} workers, median of {args.repeat})")
+    print(f"{'':12} {'live 200 ms':>12} {'authenticated 200 ms':>21}")
+    for label, result in results.items():
+        print(f"{label:12} {result['first_live_ms']:12.1f} {result['first_authenticated_ms']:21.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Local stand-ins for the external services the API calls, so load benchmarks run
+without Cognito or AWS.
+
+StubJWKS serves a freshly generated RSA key as a JWKS document (optionally with an
+artificial delay, to model a slow identity provider) and mints access tokens signed
+with it that pass cognito_token_verification. Point the server under test at it with
+COGNITO_JWKS_URL=stub.url. Set status to answer with an error, and rotate() to
+publish a new signing key, as when Cognito rotates keys.
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+
+class StubJWKS:
+    def __init__(self, region, user_pool_id, client_id, latency=0.0, kid="benchmark-key"):
+        self.issuer = f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}"
+        self.client_id = client_id
+        self.latency = latency
+        self.status = 200
+        self.fetches = 0
+        self._server = None
+        self._set_key(kid)
+
+    def _set_key(self, kid):
+        self.kid = kid
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = jwt.algorithms.RSAAlgorithm.to_jwk(self._private_key.public_key(), as_dict=True)
+        jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+        self._body = json.dumps({"keys": [jwk]}).encode()
+
+    def rotate(self, kid):
+        """
+        Sign new tokens with a fresh key published under kid (the old key is withdrawn).
+        """
+        self._set_key(kid)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/.well-known/jwks.json"
+
+    def start(self, port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.fetches += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = stub._body if stub.status == 200 else b'{"message": "unavailable"}'
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def mint_token(self, user_id, ttl=3600):
+        """
+        A Cognito-style access token for user_id, valid for ttl seconds.
+        """
+        now = int(time.time())
+        claims = {
+            "sub": str(user_id),
+            "iss": self.issuer,
+            "client_id": self.client_id,
+            "token_use": "access",
+            "iat": now,
+            "exp": now + ttl,
+            "jti": uuid.uuid4().hex,
+        }
+        return jwt.encode(claims, self._private_key, algorithm="RS256", headers={"kid": self.kid})
+
+    @classmethod
+    def from_settings(cls, **kwargs):
+        from django.conf import settings
+
+        return cls(settings.COGNITO_REGION, settings.COGNITO_USER_POOL_ID, settings.COGNITO_APP_CLIENT_ID, **kwargs)
@@ -0,0 +1,235 @@
+"""
+Structured JSON logging that stays off the request hot path.
+
+Records are filtered (sampling, correlation ID) in the calling thread, then put on an
+in-memory queue; a background listener thread per process formats them as one JSON
+object per line and writes them to stdout. When the queue is full, records are
+dropped and counted rather than blocking the request.
+
+Wired up by settings.LOGGING; see LOG_LEVEL, LOG_QUEUE_SIZE and LOG_SAMPLE_RATES.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Request / job correlation ID; follows the request into sync_to_async threads
+_correlation_id = ContextVar("correlation_id", default=None)
+
+# Client-supplied IDs are only trusted when they look like one
+CORRELATION_ID_PATTERN = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def correlation_scope(value):
+    """
+    Log with the given correlation ID inside the with block.
+    """
+    token = _correlation_id.set(value)
+    try:
+        yield value
+    finally:
+        _correlation_id.reset(token)
+
+
+def bind_correlation_id(value):
+    """
+    Set the correlation ID for the current context. Returns a token for unbind_correlation_id.
+    """
+    return _correlation_id.set(value)
+
+
+def unbind_correlation_id(token):
+    _correlation_id.reset(token)
+
+
+# Redaction
+
+REDACTED = "[redacted]"
+_ROLE_ARN = re.compile(r"arn:aws:iam::\d{12}:role/[\w+=,.@/-]+")
+_S3_URI = re.compile(r"s3://[a-z0-9][a-z0-9.-]{1,61}[a-z0-9]")
+# Keys whose values name a customer's bucket or role, in any of the casings the code uses
+SENSITIVE_KEYS = {
+    "bucket", "bucket_name", "user_bucket", "userbucket",
+    "aws_role_arn", "role_arn", "user_role_arn", "userrolearn",
+}
+
+
+def redact(value):
+    """
+    Replace role ARNs, S3 bucket names and sensitive keys in strings, dicts and lists.
+    """
+    if isinstance(value, str):
+        return _S3_URI.sub(f"s3://{REDACTED}", _ROLE_ARN.sub(f"arn:aws:iam::{REDACTED}", value))
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if str(key).lower() in SENSITIVE_KEYS and value[key] else redact(value[key])
+            for key in value
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+# Filters (run in the logging thread, before the record is queued)
+
+class CorrelationIdFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = _correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of INFO and DEBUG records for the configured loggers.
+    rates maps a logger name (or a parent, e.g. "api.services") to a fraction in [0, 1];
+    the longest matching prefix wins. Warnings and errors are always kept.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._cache = {}
+
+    def rate_for(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix in sorted(self.rates, key=len, reverse=True):
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = float(self.rates[prefix])
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+# Formatting (runs on the listener thread)
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "correlation_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        if getattr(record, "correlation_id", None):
+            entry["correlation_id"] = record.correlation_id
+        entry.update(redact({
+            key: value for key, value in vars(record).items()
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith("_")
+        }))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    QueueHandler with its own listener thread writing JSON lines to stdout.
+    The queue and thread are (re)created lazily in each process, so the handler
+    also works in gunicorn workers forked from a preloaded master. flush() waits
+    for the queue to drain and leaves the listener running; the listener is only
+    stopped by close() or at interpreter exit.
+    """
+
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(None)
+        self.maxsize = maxsize
+        self.stream = stream
+        self.dropped = 0
+        self._pid = None
+        self._atexit_pid = None
+        self._listener = None
+        self._target = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.maxsize)
+            self._target = logging.StreamHandler(self.stream or sys.stdout)
+            self._target.setFormatter(JsonFormatter())
+            self._listener = QueueListener(self.queue, self._target, respect_handler_level=False)
+            self._listener.start()
+            self._pid = os.getpid()
+            if self._atexit_pid != self._pid:
+                atexit.register(self.stop)
+                self._atexit_pid = self._pid
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only capture what cannot wait
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """
+        Wait until everything queued so far has been written. The listener marks each
+        record done after writing it, so this is a queue join; the thread keeps running.
+        """
+        if self._listener is not None and self._pid == os.getpid():
+            self.queue.join()
+            self._target.flush()
+
+    def stop(self):
+        """
+        Write what is queued and stop the listener thread (at shutdown). A later record
+        starts a new one.
+        """
+        with self._start_lock:
+            if self._listener is None or self._pid != os.getpid():
+                return
+            self._listener.stop()
+            self._listener, self._pid = None, None
+
+    def close(self):
+        self.stop()
+        super().close()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from dotenv import load_dotenv
+import json
 import os
 
 # Cognito Configuration
@@ -20,6 +21,111 @@ COGNITO_USER_POOL_ID = os.getenv("COGNITO_USER_POOL_ID")
 COGNITO_APP_CLIENT_ID = os.getenv("COGNITO_APP_CLIENT_ID")
 AWS_ACCOUNT_ID = os.getenv("AWS_ACCOUNT_ID")
 SQS_QUEUE_NAME = os.getenv("SQS_QUEUE_NAME")
+SQS_REGION = os.getenv("SQS_REGION", os.getenv("AWS_REGION", "us-east-1"))
+# Full queue URL; overrides the one built from AWS_ACCOUNT_ID, SQS_QUEUE_NAME and SQS_REGION
+SQS_QUEUE_URL = os.getenv("SQS_QUEUE_URL")
+
+# Job queue backend: "sqs", "postgres" (SKIP LOCKED on the app database) or
+# "memory" (a process-local test double; messages the separate dispatch_outbox
+# process enqueues are not visible to the API workers)
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "sqs")
+JOB_QUEUE_VISIBILITY_TIMEOUT = int(os.getenv("JOB_QUEUE_VISIBILITY_TIMEOUT", "300"))
+
+# Maximum number of jobs accepted by POST /api/jobs/batch/
+JOB_BATCH_MAX_SIZE = int(os.getenv("JOB_BATCH_MAX_SIZE", "500"))
+
+# Shared secret the anonymization workers use for progress callbacks
+WORKER_API_TOKEN = os.getenv("WORKER_API_TOKEN")
+WORKER_PROGRESS_MAX_EVENTS = int(os.getenv("WORKER_PROGRESS_MAX_EVENTS", "5000"))
+
+# Pre-scan of job source prefixes (S3 listing with the connection role) before dispatch.
+# When enabled, job messages wait for a manifest, so manage.py prescan_jobs must be running
+JOB_PRESCAN_ENABLED = os.getenv("JOB_PRESCAN_ENABLED", "false").lower() == "true"
+S3_PRESCAN_WORKERS = int(os.getenv("S3_PRESCAN_WORKERS", "16"))
+S3_PRESCAN_ASSUME_ROLE = os.getenv("S3_PRESCAN_ASSUME_ROLE", "true").lower() == "true"
+# Points S3 clients at a local stand-in (e.g. MinIO or moto_server) instead of AWS
+AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")
+
+# Jobs whose manifest exceeds either budget are split into shards of at most this size
+JOB_SHARD_MAX_FILES = int(os.getenv("JOB_SHARD_MAX_FILES", "5000"))
+JOB_SHARD_MAX_BYTES = int(os.getenv("JOB_SHARD_MAX_BYTES", str(20 * 1024 ** 3)))
+
+# Fair-share admission of jobs to the queue: per-role weight and in-flight limits.
+# Users without a listed role get DEFAULT; User.max_inflight_* override the limits per user.
+JOB_FAIR_SHARE_ENABLED = os.getenv("JOB_FAIR_SHARE_ENABLED", "true").lower() == "true"
+JOB_FAIR_SHARE_POLICIES = json.loads(os.getenv("JOB_FAIR_SHARE_POLICIES") or json.dumps({
+    "RADIOLOGIST": {"weight": 3, "max_jobs": 10, "max_files": 200000},
+    "RESEARCHER": {"weight": 2, "max_jobs": 5, "max_files": 100000},
+    "STUDENT": {"weight": 1, "max_jobs": 2, "max_files": 20000},
+    "DEFAULT": {"weight": 1, "max_jobs": 3, "max_files": 50000},
+}))
+
+# Token-bucket throttling per caller per endpoint class ("<view throttle_scope>.read|write"),
+# checked before the token is verified. Stores: "database" (shared by all workers, one write
+# per request), "cache" (the default Django cache) or "local" (process memory, no I/O, so
+# each worker has its own buckets). Writes use THROTTLE_STORE, reads THROTTLE_READ_STORE.
+# THROTTLE_NUM_PROXIES is the number of proxies (the ALB) in front of the app, so the client IP
+# is taken from X-Forwarded-For as the last proxy saw it
+THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "true").lower() == "true"
+THROTTLE_STORE = os.getenv("THROTTLE_STORE", "database")
+THROTTLE_READ_STORE = os.getenv("THROTTLE_READ_STORE", "local")
+THROTTLE_NUM_PROXIES = int(os.getenv("THROTTLE_NUM_PROXIES", "1"))
+THROTTLE_BUCKETS = json.loads(os.getenv("THROTTLE_BUCKETS") or json.dumps({
+    "jobs.read": {"capacity": 60, "per_second": 5},
+    "jobs.write": {"capacity": 20, "per_second": 0.5},
+    "stream.read": {"capacity": 10, "per_second": 0.1},
+    "default.read": {"capacity": 120, "per_second": 10},
+    "default.write": {"capacity": 30, "per_second": 1},
+}))
+
+# Automatic retries of FAILED_RETRYABLE jobs (manage.py retry_jobs)
+JOB_RETRY_MAX_ATTEMPTS = int(os.getenv("JOB_RETRY_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "60"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+
+# COMPLETED and FAILED_PERMANENT jobs finished longer ago than this move from Job to
+# ArchivedJob (manage.py archive_jobs); GET /api/jobs/ lists only the jobs still in Job
+JOB_ARCHIVE_AFTER_DAYS = int(os.getenv("JOB_ARCHIVE_AFTER_DAYS", "90"))
+
+# Job status stream (GET /api/jobs/stream/). Connects are throttled by the "stream" bucket;
+# JOB_STREAM_MAX_PER_USER caps the streams one user holds open per server process
+JOB_STREAM_POLL_INTERVAL = float(os.getenv("JOB_STREAM_POLL_INTERVAL", "1"))
+JOB_STREAM_HEARTBEAT_SECONDS = float(os.getenv("JOB_STREAM_HEARTBEAT_SECONDS", "15"))
+JOB_STREAM_MAX_PER_USER = int(os.getenv("JOB_STREAM_MAX_PER_USER", "5"))
+
+# Async (ASGI) views for GET/POST /api/jobs/ and GET /api/jobs/<id>/; false serves them from JobViewSet
+JOB_API_ASYNC = os.getenv("JOB_API_ASYNC", "true").lower() == "true"
+
+# Structured logging: JSON lines to stdout from a background queue (core/log.py).
+# LOG_SAMPLE_RATES keeps a fraction of INFO/DEBUG records per logger (prefix); warnings always pass
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = json.loads(os.getenv("LOG_SAMPLE_RATES", '{"api.services.auth_service": 0.01}'))
+
+# Prometheus metrics (GET /api/metrics/). Scrapers send METRICS_TOKEN as a bearer token, and the
+# endpoint answers 404 until it is set; METRICS_MULTIPROC_DIR lets a scrape add up the counters
+# of every gunicorn worker
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+# Readiness (GET /api/health/ready/) from background probes of "database", "jwks" and "queue";
+# only HEALTH_REQUIRED_CHECKS can make it fail, and results older than HEALTH_PROBE_STALE_AFTER count as failed
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+HEALTH_PROBE_STALE_AFTER = float(os.getenv("HEALTH_PROBE_STALE_AFTER", str(HEALTH_PROBE_INTERVAL * 3)))
+HEALTH_REQUIRED_CHECKS = [name.strip() for name in os.getenv("HEALTH_REQUIRED_CHECKS", "database,jwks").split(",") if name.strip()]
+
+# JWKS key store (COGNITO_JWKS_URL overrides the derived Cognito URL, e.g. for a local stand-in)
+COGNITO_JWKS_URL = os.getenv("COGNITO_JWKS_URL")
+JWKS_CACHE_TTL = int(os.getenv("JWKS_CACHE_TTL", "3600"))
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+JWKS_BACKOFF_MAX = int(os.getenv("JWKS_BACKOFF_MAX", "300"))
+
+# Verified-token cache (entries never outlive the token's own exp claim)
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "300"))
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -63,6 +169,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.CorrelationIdMiddleware',
+    'api.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -154,4 +262,29 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.TokenBucketThrottle',
+    ),
+    'NUM_PROXIES': THROTTLE_NUM_PROXIES,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "correlation_id": {"()": "core.log.CorrelationIdFilter"},
+        "sampling": {"()": "core.log.SamplingFilter", "rates": LOG_SAMPLE_RATES},
+    },
+    "handlers": {
+        "json_queue": {
+            "()": "core.log.BackgroundQueueHandler",
+            "maxsize": LOG_QUEUE_SIZE,
+            "filters": ["correlation_id", "sampling"],
+        },
+    },
+    "root": {"handlers": ["json_queue"], "level": LOG_LEVEL},
+    "loggers": {
+        # Django's own console handler would print the same records a second time
+        "django": {"handlers": ["json_queue"], "level": "INFO", "propagate": False},
+    },
 }
@@ -0,0 +1,67 @@
+# gunicorn.conf.py
+# Picked up automatically by gunicorn from the working directory.
+
+import os
+
+# GUNICORN_PRELOAD=true imports the app once in the master and forks warm workers
+# (see api/services/worker_startup.py). Code changes then need a full restart, not a HUP.
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+
+def when_ready(server):
+    """
+    Finish warming the preloaded app before the first worker is forked.
+    """
+    if server.cfg.preload_app:
+        from api.services.worker_startup import preload
+
+        preload()
+        server.log.info("Preloaded application modules")
+
+
+def post_fork(server, worker):
+    """
+    Drop per-process state a preloaded master handed down to this worker.
+    """
+    if server.cfg.preload_app:
+        from api.services.worker_startup import reinitialize_after_fork
+
+        reinitialize_after_fork()
+
+
+def post_worker_init(worker):
+    """
+    Warm the Cognito JWKS cache in each worker before it serves traffic,
+    so the first authenticated request does not pay for the fetch, then
+    start the readiness probes.
+    """
+    from api.services import start_health_monitor, warm_jwks
+
+    if warm_jwks():
+        worker.log.info("JWKS cache warmed")
+    else:
+        worker.log.warning("JWKS warm-up failed; keys will be fetched on demand")
+    start_health_monitor()
+
+
+def on_starting(server):
+    """
+    Start every run with an empty metrics snapshot directory, so counters
+    from a previous server do not leak into this one.
+    """
+    directory = os.getenv("METRICS_MULTIPROC_DIR")
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.startswith("metrics-"):
+            os.remove(os.path.join(directory, name))
+
+
+def worker_exit(server, worker):
+    """
+    Write the exiting worker's final metrics snapshot so its counts stay in the totals.
+    """
+    from api.services.metrics import REGISTRY
+
+    REGISTRY.flush()
@@ -2,6 +2,7 @@
 
 import React, { createContext, useContext, useState, useEffect, useCallback, ReactNode } from 'react';
 import { useAuth } from 'react-oidc-context';
+import { streamJobEvents } from './jobStream';
 
 // Example types
 interface User {
@@ -78,35 +79,19 @@ export function DashboardProvider({ children }: { children: ReactNode }) {
 
     try {
       const token = auth.user.access_token;
-      console.log(token)
-      // Parallel fetching
-      const [userRes, connectionsRes, jobsRes] = await Promise.all([
-        fetch(`${process.env.NEXT_PUBLIC_API_URL}/users/me/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${process.env.NEXT_PUBLIC_API_URL}/connections/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-        fetch(`${process.env.NEXT_PUBLIC_API_URL}/jobs/`, {
-          headers: { Authorization: `Bearer ${token}` },
-        }),
-      ]);
-
-      console.log(connectionsRes)
-
-      if (!userRes.ok) throw new Error('Failed to fetch user');
-      if (!connectionsRes.ok) throw new Error('Failed to fetch connections');
-      if (!jobsRes.ok) throw new Error('Failed to fetch jobs');
-
-      const userData = await userRes.json();
-      console.log('User fetched:', userData); // Debugging log
-      const connectionsData = await connectionsRes.json();
-      console.log('Connections fetched:', connectionsData); // Debugging log
-      const jobsData = await jobsRes.json();
-
-      setUser(userData);
-      setConnections(connectionsData);
-      setJobs(jobsData);
+      // One authenticated round trip for the user, their connections and the first page of jobs
+      const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/dashboard/bootstrap/`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (res.status === 404) throw new Error('Failed to fetch user');
+      if (!res.ok) throw new Error('Failed to load dashboard');
+
+      const data = await res.json();
+
+      setUser(data.user);
+      setConnections(data.connections);
+      setJobs(data.jobs.results ?? []);
     } catch (err: unknown) {
       console.error('DashboardContext error:', err);
       setError(err instanceof Error ? err.message : 'Unknown error');
@@ -119,6 +104,42 @@ export function DashboardProvider({ children }: { children: ReactNode }) {
     fetchData();
   }, [fetchData]);
 
+  // Live job updates pushed by the server; events carry only the fields that changed
+  useEffect(() => {
+    const token = auth?.user?.access_token;
+    if (!token) return;
+
+    const controller = new AbortController();
+    streamJobEvents({
+      url: `${process.env.NEXT_PUBLIC_API_URL}/jobs/stream/`,
+      token,
+      signal: controller.signal,
+      onEvent: ({ event, data }) => {
+        if (event === 'job') {
+          const change = JSON.parse(data);
+          setJobs((prev) => prev.map((job) => (job.id === change.id ? { ...job, ...change } : job)));
+        } else if (event === 'created') {
+          // Submitted elsewhere (another tab, the API); fetch the whole job and put it first
+          const { id } = JSON.parse(data);
+          fetch(`${process.env.NEXT_PUBLIC_API_URL}/jobs/${id}/`, {
+            headers: { Authorization: `Bearer ${token}` },
+            signal: controller.signal,
+          })
+            .then((res) => (res.ok ? res.json() : null))
+            .then((job: Job | null) => {
+              if (job) setJobs((prev) => (prev.some((j) => j.id === job.id) ? prev : [job, ...prev]));
+            })
+            .catch(() => {});
+        } else if (event === 'resync') {
+          // Too far behind to replay the missed changes; reload everything
+          fetchData();
+        }
+      },
+    });
+
+    return () => controller.abort();
+  }, [auth?.user?.access_token, fetchData]);
+
   const value: DashboardContextType = {
     user,
     connections,
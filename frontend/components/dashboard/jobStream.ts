@@ -0,0 +1,83 @@
+// Client for the job status stream (GET /jobs/stream/, Server-Sent Events).
+// EventSource cannot send an Authorization header, and a token in the URL ends up in
+// access logs, so the stream is read with fetch and parsed here. Reconnects after the
+// server's retry delay and resumes from the last event ID, like EventSource would.
+
+export interface StreamEvent {
+  event: string;
+  data: string;
+}
+
+interface StreamOptions {
+  url: string;
+  token: string;
+  onEvent: (event: StreamEvent) => void;
+  signal: AbortSignal;
+}
+
+const DEFAULT_RETRY_MS = 3000;
+
+function sleep(ms: number, signal: AbortSignal) {
+  return new Promise<void>((resolve) => {
+    const timer = setTimeout(resolve, ms);
+    signal.addEventListener('abort', () => { clearTimeout(timer); resolve(); }, { once: true });
+  });
+}
+
+export async function streamJobEvents({ url, token, onEvent, signal }: StreamOptions) {
+  let lastEventId = '';
+  let retryMs = DEFAULT_RETRY_MS;
+
+  // Applies one event block (the lines between blank lines); lines starting with ':' are comments
+  const dispatch = (block: string) => {
+    let event = 'message';
+    const data: string[] = [];
+    for (const line of block.split('\n')) {
+      if (!line || line.startsWith(':')) continue;
+      const colon = line.indexOf(':');
+      const field = colon === -1 ? line : line.slice(0, colon);
+      const value = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+      if (field === 'event') event = value;
+      else if (field === 'data') data.push(value);
+      else if (field === 'id') lastEventId = value;
+      else if (field === 'retry' && /^\d+$/.test(value)) retryMs = Number(value);
+    }
+    if (data.length) onEvent({ event, data: data.join('\n') });
+  };
+
+  while (!signal.aborted) {
+    try {
+      const headers: Record<string, string> = { Authorization: `Bearer ${token}`, Accept: 'text/event-stream' };
+      if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+      const res = await fetch(url, { headers, signal, cache: 'no-store' });
+      // Expired token or no ASGI server: reconnecting will not help
+      if (res.status === 401 || res.status === 501) return;
+      if (res.status === 429) {
+        // Throttled or too many open streams; wait as long as the server asks
+        const retryAfter = Number(res.headers.get('Retry-After'));
+        await sleep(Number.isFinite(retryAfter) && retryAfter > 0 ? retryAfter * 1000 : retryMs, signal);
+        continue;
+      }
+
+      if (res.ok && res.body) {
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true }).replace(/\r\n?/g, '\n');
+          let end;
+          while ((end = buffer.indexOf('\n\n')) !== -1) {
+            dispatch(buffer.slice(0, end));
+            buffer = buffer.slice(end + 2);
+          }
+        }
+      }
+    } catch (err) {
+      if (signal.aborted) return;
+      console.warn('Job stream disconnected:', err);
+    }
+    await sleep(retryMs, signal);
+  }
+}
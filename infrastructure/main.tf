@@ -136,7 +136,7 @@ resource "aws_lb_target_group" "backend" {
     unhealthy_threshold = 2
     timeout             = 5
     interval            = 30
-    path                = "/health/"
+    path                = "/api/health/ready/"
     matcher             = "200"
     port                = "traffic-port"
     protocol            = "HTTP"
@@ -424,6 +424,36 @@ resource "aws_ecr_repository" "frontend_repo" {
 }
 
 # ===== ECS TASK DEFINITIONS =====
+# Shared by the API task and the background job task, which run the same image
+locals {
+  backend_image = "${var.aws_account_id}.dkr.ecr.${var.aws_region}.amazonaws.com/medical-ai-backend-repo:latest"
+
+  backend_environment = [
+    {
+      name  = "DATABASE_URL"
+      value = "postgresql://${data.aws_db_instance.existing.master_username}:${var.db_password}@${data.aws_db_instance.existing.address}:${data.aws_db_instance.existing.port}/${data.aws_db_instance.existing.db_name}"
+    },
+    {
+      name  = "AWS_DEFAULT_REGION"
+      value = var.aws_region
+    },
+    {
+      # Job messages wait for a pre-scan manifest; the prescan container below builds them
+      name  = "JOB_PRESCAN_ENABLED"
+      value = "true"
+    }
+  ]
+
+  backend_log_configuration = {
+    logDriver = "awslogs"
+    options = {
+      "awslogs-group"         = aws_cloudwatch_log_group.backend.name
+      "awslogs-region"        = var.aws_region
+      "awslogs-stream-prefix" = "ecs"
+    }
+  }
+}
+
 resource "aws_ecs_task_definition" "backend" {
   family                   = "medical-ai-backend-td"
   network_mode             = "awsvpc"
@@ -436,7 +466,7 @@ resource "aws_ecs_task_definition" "backend" {
   container_definitions = jsonencode([
     {
       name  = "backend"
-      image = "${var.aws_account_id}.dkr.ecr.${var.aws_region}.amazonaws.com/medical-ai-backend-repo:latest"
+      image = local.backend_image
       
       portMappings = [
         {
@@ -445,31 +475,56 @@ resource "aws_ecs_task_definition" "backend" {
         }
       ]
       
-      environment = [
-        {
-          name  = "DATABASE_URL"
-          value = "postgresql://${data.aws_db_instance.existing.master_username}:${var.db_password}@${data.aws_db_instance.existing.address}:${data.aws_db_instance.existing.port}/${data.aws_db_instance.existing.db_name}"
-        },
-        {
-          name  = "AWS_DEFAULT_REGION"
-          value = var.aws_region
-        }
-      ]
+      environment = local.backend_environment
       
-      logConfiguration = {
-        logDriver = "awslogs"
-        options = {
-          "awslogs-group"         = aws_cloudwatch_log_group.backend.name
-          "awslogs-region"        = var.aws_region
-          "awslogs-stream-prefix" = "ecs"
-        }
-      }
+      logConfiguration = local.backend_log_configuration
       
       essential = true
     }
   ])
 }
 
+# Background job processes: the API only writes jobs to the outbox, and nothing
+# reaches the queue unless the dispatcher is running. With JOB_PRESCAN_ENABLED the
+# dispatcher also holds each message until the pre-scanner has built its manifest.
+# FAILED_RETRYABLE jobs are only retried while the retry scheduler is running.
+resource "aws_ecs_task_definition" "backend_jobs" {
+  family                   = "medical-ai-backend-jobs-td"
+  network_mode             = "awsvpc"
+  requires_compatibilities = ["FARGATE"]
+  cpu                      = "256"
+  memory                   = "1024"
+  execution_role_arn       = aws_iam_role.ecs_execution_role.arn
+  task_role_arn            = aws_iam_role.ecs_task_role.arn
+
+  container_definitions = jsonencode([
+    {
+      name             = "dispatcher"
+      image            = local.backend_image
+      command          = ["python", "manage.py", "dispatch_outbox"]
+      environment      = local.backend_environment
+      logConfiguration = local.backend_log_configuration
+      essential        = true
+    },
+    {
+      name             = "prescan"
+      image            = local.backend_image
+      command          = ["python", "manage.py", "prescan_jobs"]
+      environment      = local.backend_environment
+      logConfiguration = local.backend_log_configuration
+      essential        = true
+    },
+    {
+      name             = "retry-scheduler"
+      image            = local.backend_image
+      command          = ["python", "manage.py", "retry_jobs"]
+      environment      = local.backend_environment
+      logConfiguration = local.backend_log_configuration
+      essential        = true
+    }
+  ])
+}
+
 resource "aws_ecs_task_definition" "frontend" {
   family                   = "medical-ai-frontend-td"
   network_mode             = "awsvpc"
@@ -538,6 +593,25 @@ resource "aws_ecs_service" "backend" {
   }
 }
 
+# Claims use SKIP LOCKED, so running more than one dispatcher is safe
+resource "aws_ecs_service" "backend_jobs" {
+  name            = "medical-ai-backend-jobs-service"
+  cluster         = aws_ecs_cluster.main.id
+  task_definition = aws_ecs_task_definition.backend_jobs.arn
+  desired_count   = 1
+  launch_type     = "FARGATE"
+
+  network_configuration {
+    subnets          = data.aws_subnets.default.ids
+    security_groups  = [aws_security_group.ecs.id]
+    assign_public_ip = true  # Required for default VPC public subnets
+  }
+
+  tags = {
+    Name = "medical-ai-backend-jobs-service"
+  }
+}
+
 resource "aws_ecs_service" "frontend" {
   name            = "medical-ai-frontend-service"
   cluster         = aws_ecs_cluster.main.id